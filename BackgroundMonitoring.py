@@ -1,126 +1,119 @@
-import requests
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
+from monitoring.extractors import find_extractor, build_remote_extractor, extract_fields
+from monitoring.selector_cache import selector_cache
+
+
+SELECTOR_SERVICE_URL = 'https://cron-job-9njv.onrender.com/selector'
+
+# "inline" parses on the event loop, "process" hands parsing and field
+# extraction to a process pool sized to the host's cores
+SCRAPE_EXTRACT_EXECUTOR = os.getenv("SCRAPE_EXTRACT_EXECUTOR", "inline")
+SCRAPE_EXTRACT_WORKERS = int(os.getenv("SCRAPE_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
 
-async def fetch_selectors(website_name):
+_extract_pool = None
+_extract_slots = None
+
+
+async def _request_selectors(website_name, session=None):
+    # Reuse the caller's pooled session when scraping in bulk
+    owns_session = session is None
+    if owns_session:
+        session = aiohttp.ClientSession()
     try:
-        response = requests.post(
-            'https://cron-job-9njv.onrender.com/selector',
+        async with session.post(
+            SELECTOR_SERVICE_URL,
             headers={
                 'Content-Type': 'application/json'
             },
             json={'website_name': website_name}
-        )
+        ) as response:
+            if response.status == 404:
+                return None
+            if response.status != 200:
+                raise Exception(f"Failed to fetch: {response.status}")
 
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch: {response.status_code}")
+            return await response.json()
+    finally:
+        if owns_session:
+            await session.close()
+
+
+async def fetch_selectors(website_name, session=None):
+    return await selector_cache.get(
+        website_name, lambda: _request_selectors(website_name, session))
+
+
+async def prefetch_selectors(urls, session=None):
+    # One lookup per distinct host that has no built-in extractor
+    hostnames = {urlparse(url).hostname for url in urls}
+    hostnames = {hostname for hostname in hostnames
+                 if hostname and find_extractor(hostname) is None}
+    return await selector_cache.prefetch(
+        hostnames,
+        lambda hostname: lambda: _request_selectors(hostname, session))
+
+
+def get_extract_pool():
+    global _extract_pool
+    if _extract_pool is None:
+        _extract_pool = ProcessPoolExecutor(max_workers=SCRAPE_EXTRACT_WORKERS)
+    return _extract_pool
 
-        data = response.json()
-        return data
-    except Exception as error:
-        print(f"Error fetching selectors: {error}")
-        return None
 
+def shutdown_extract_pool():
+    global _extract_pool
+    if _extract_pool is not None:
+        _extract_pool.shutdown(wait=True)
+        _extract_pool = None
 
-def get_valid_data(selector, attr=None):
-    if selector:
-        if attr:
-            return selector.get(attr, None)
-        return selector.text.strip()
-    return None
 
+def _get_extract_slots():
+    # Bounds pages queued for the pool; a semaphore belongs to one event loop
+    global _extract_slots
+    loop = asyncio.get_running_loop()
+    if _extract_slots is None or _extract_slots[0] is not loop:
+        _extract_slots = (loop, asyncio.Semaphore(SCRAPE_EXTRACT_WORKERS * 2))
+    return _extract_slots[1]
 
-async def scrape_product_data(page_html, url):
+
+async def scrape_product_data(page_html, url, session=None, executor=None):
+    hostname = urlparse(url).hostname
+
+    selectors = None
+    if find_extractor(hostname) is None:
+        selectors = await fetch_selectors(hostname, session)
+        if not selectors:
+            print('No selectors found for this website')
+            return
+
+    if (executor or SCRAPE_EXTRACT_EXECUTOR) != "process":
+        return extract_product_data(page_html, url, selectors)
+
+    async with _get_extract_slots():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_extract_pool(), extract_product_data, page_html, url, selectors)
+
+
+def extract_product_data(page_html, url, selectors=None):
     try:
         soup = BeautifulSoup(page_html, 'html.parser')
     except Exception as e:
         print(f"Error parsing HTML: {e}")
         return None
 
-    parsed_url = urlparse(url)
-    hostname = parsed_url.hostname
-
-    product_title = ''
-    product_price = ''
-    mrp_price = ''
-    rating = ''
-    image_url = ''
-
-    if "amazon" in hostname:
-        product_title = soup.select_one('#productTitle').get_text(
-            strip=True) if soup.select_one('#productTitle') else 'Title not available'
-
-        price_whole = soup.select_one('.a-price .a-price-whole').get_text(
-            strip=True) if soup.select_one('.a-price .a-price-whole') else ''
-        price_fraction = soup.select_one('.a-price .a-price-fraction').get_text(
-            strip=True) if soup.select_one('.a-price .a-price-fraction') else '00'
-
-        if price_whole:
-            product_price = f"₹{price_whole}"
-        else:
-            product_price = 'Price not available'
-
-        mrp_price = soup.select_one('.a-price.a-text-price .a-offscreen').get_text(strip=True) or \
-            soup.select_one('.basisPrice .a-price .a-offscreen').get_text(strip=True) if soup.select_one(
-                '.basisPrice .a-price .a-offscreen') else 'MRP not available'
-
-        rating_text = soup.select_one('#acrPopover').get('title', '').strip(
-        ) if soup.select_one('#acrPopover') else 'Rating not available'
-        rating = rating_text.split(
-            ' ')[0] if 'out of' in rating_text else 'Rating not available'
-
-        # Fix for image URL extraction to handle multiple potential sources
-        image_element = soup.select_one('.a-dynamic-image.a-stretch-vertical')
-        if image_element:
-            image_url = image_element.get(
-                'data-old-hires') or image_element.get('src')
-        else:
-            image_element = soup.select_one(
-                'span.a-declarative[data-action="main-image-click"] img')
-            if image_element:
-                image_url = image_element.get(
-                    'data-old-hires') or image_element.get('src')
-            else:
-                image_url = 'Image not available'
-
-    elif "flipkart" in hostname:
-        product_title = soup.select_one(
-            '.VU-ZEz').get_text(strip=True) if soup.select_one('.VU-ZEz') else 'Title not available'
-        product_price = soup.select_one('.Nx9bqj').get_text(
-            strip=True) if soup.select_one('.Nx9bqj') else 'Price not available'
-        mrp_price = soup.select_one('.yRaY8j').get_text(
-            strip=True) if soup.select_one('.yRaY8j') else 'MRP not available'
-        rating = soup.select_one('.XQDdHH').get_text(
-            strip=True) if soup.select_one('.XQDdHH') else 'Rating not available'
-        image_url = soup.select_one('.DByuf4').get(
-            'src') if soup.select_one('.DByuf4') else 'Image not available'
-
-    else:
-        selectors = await fetch_selectors(hostname)
-        if not selectors:
-            print('No selectors found for this website')
-            return
-
-        product_title = get_valid_data(soup.select_one(
-            selectors.get('title'))) or "Title N/A"
-        product_price = get_valid_data(soup.select_one(
-            selectors.get('current'))) or "Price N/A"
-        mrp_price = get_valid_data(soup.select_one(
-            selectors.get('mrp'))) or "MRP N/A"
-        rating = get_valid_data(soup.select_one(
-            selectors.get('rating'))) or "Rating N/A"
-        image_url = get_valid_data(soup.select_one(
-            selectors.get('image')), 'src') or "Image N/A"
+    hostname = urlparse(url).hostname
+    extractor = find_extractor(hostname) or build_remote_extractor(selectors)
+    product = extract_fields(soup, extractor)
 
     product_url = url
-    website_name = "Amazon" if "amazon" in hostname else "Flipkart" if "flipkart" in hostname else "Unknown Website"
-
-    return {
-        "name": product_title,
-        "original_price": mrp_price,
-        "customer_rating": rating,
-        "price": product_price,
-        "product_tracking_url": product_url,
-        "slug": product_url,
-        "image": image_url}
+    product["product_tracking_url"] = product_url
+    product["slug"] = product_url
+    return product
@@ -1,10 +1,18 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import math
 import os
+import time
 from dotenv import load_dotenv
+from fastapi import Request
 import urllib.parse
 
+from DB.pool import PoolMetrics, TimedAsyncQueuePool, TimedQueuePool
+from DB.replicas import ReplicaSet
+
 # URL encode the password
 
 load_dotenv()
@@ -22,10 +30,95 @@ encoded_password = urllib.parse.quote(DB_PASSWORD)
 # mysql connection string
 DATABASE_URL = f"{DB_CONNECTION}://{DB_USERNAME}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
 
-engine = create_engine(DATABASE_URL)
+# Connection pool, per engine (the async engine gets its own of the same size)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before MySQL's wait_timeout drops them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **POOL_OPTIONS)
+PoolMetrics("primary").attach(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async drivers for the same database, used by the async request path
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+# Created on first use, so scripts and workers that never serve
+# requests don't open a second pool
+async_engine = None
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def get_async_engine():
+    global async_engine
+    if async_engine is None:
+        async_engine = create_async_engine(
+            async_database_url(DATABASE_URL), poolclass=TimedAsyncQueuePool, **POOL_OPTIONS)
+        PoolMetrics("primary_async").attach(async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+    return async_engine
+
+
+async def dispose_async_engine():
+    global async_engine
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    await replicas.dispose_async()
+
+
+# Comma-separated SQLAlchemy URLs of read replicas of the primary
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",")
+                   if url.strip()]
+DB_REPLICA_HEALTH_SECONDS = float(os.getenv("DB_REPLICA_HEALTH_SECONDS", "5"))
+# After a write, the same client reads from the primary this long, to
+# cover replication lag
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+READ_PRIMARY_COOKIE = "db_read_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+replicas = ReplicaSet(DB_REPLICA_URLS, POOL_OPTIONS, DB_REPLICA_HEALTH_SECONDS,
+                      async_database_url)
+
+
+def reads_from_primary(request: Request):
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def read_your_writes(request: Request, call_next):
+    """Middleware pinning a client's reads to the primary right after it writes."""
+    response = await call_next(request)
+    if (replicas.replicas and DB_READ_YOUR_WRITES_SECONDS > 0
+            and request.method not in SAFE_METHODS and response.status_code < 400):
+        response.set_cookie(
+            READ_PRIMARY_COOKIE, f"{time.time() + DB_READ_YOUR_WRITES_SECONDS:.3f}",
+            max_age=math.ceil(DB_READ_YOUR_WRITES_SECONDS), httponly=True, samesite="lax")
+    return response
+
 
 # Dependency
 def get_db():
@@ -34,3 +127,30 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Read-only dependencies: a replica when one is healthy, else the primary
+def get_read_db(request: Request):
+    replica = None if reads_from_primary(request) else replicas.pick()
+    db = replica.Session() if replica is not None else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    replica = None if reads_from_primary(request) else replicas.pick()
+    if replica is not None:
+        sessions = replica.async_sessions()
+    else:
+        get_async_engine()
+        sessions = AsyncSessionLocal
+    async with sessions() as db:
+        yield db
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text, Double, TIMESTAMP, BigInteger, Boolean
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Text, Double, TIMESTAMP, BigInteger, Boolean
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from DB.database import Base
@@ -20,8 +21,11 @@ class Product(Base):
     name = Column(String(255), nullable=False)
     original_price = Column(Double, nullable=True)
     customer_rating = Column(String(255), nullable=True)
-    price = Column(Double, nullable=True)
+    price = Column(Double, nullable=True, index=True)
+    currency = Column(String(3), nullable=True)  # ISO 4217 code of both prices
     product_tracking_url = Column(String(2500), nullable=True)
+    canonical_url = Column(String(2500), nullable=True)
+    canonical_url_hash = Column(String(64), unique=True, nullable=True)  # sha256 of canonical_url
     slug = Column(String(255), unique=True, nullable=False)
     added_by = Column(BigInteger, ForeignKey("users.id"), nullable=True)
 
@@ -55,6 +59,8 @@ class Product(Base):
     amazon_id = Column(String(255), nullable=True)
 
     product_images = relationship("ProductImage", back_populates="product")
+    scrape_state = relationship("ProductScrapeState", uselist=False,
+                                cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ProductImage(Base):
@@ -112,9 +118,127 @@ class CocartProduct(Base):
     is_bought = Column(Boolean, nullable=False, default=False)
     is_claimed = Column(Boolean, nullable=False, default=False)
     note = Column(Text, nullable=True) # Note for the product is not present
+    target_price = Column(Double, nullable=True)  # notify the owner at or below this price
 
     cocart = relationship("Cocart", back_populates="products")
     product = relationship("Product")
 
+    __table_args__ = (
+        # Watches are evaluated per changed product and price range
+        Index("ix_cocart_products_product_id_target_price", "product_id", "target_price"),
+    )
+
+
+class ProductScrapeState(Base):
+    __tablename__ = "product_scrape_states"
+
+    product_id = Column(BigInteger, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    page_digest = Column(String(64), nullable=True)  # sha256 of the normalized page
+    fields_digest = Column(String(64), nullable=True)  # sha256 of the extracted fields
+    last_price = Column(String(255), nullable=True)
+    change_rate = Column(Double, nullable=False, default=0.5)  # moving average of price changes per check
+    last_checked_at = Column(TIMESTAMP, nullable=True)
+    next_check_at = Column(TIMESTAMP, nullable=True, index=True)
+    lease_owner = Column(String(64), nullable=True)  # scrape worker holding the product
+    lease_expires_at = Column(TIMESTAMP, nullable=True)
+
+
+class ScraperCreditUsage(Base):
+    __tablename__ = "scraper_credit_usage"
+
+    period_start = Column(TIMESTAMP, primary_key=True)
+    credits_used = Column(Integer, nullable=False, default=0)
+
+
+# Credits all scrape workers together may spend in one paced window; the
+# first worker into a window writes it and the others read it back
+class ScrapeWorkerWindow(Base):
+    __tablename__ = "scrape_worker_windows"
+
+    window = Column(BigInteger, primary_key=True, autoincrement=False)  # epoch seconds // window length
+    allowance = Column(Integer, nullable=False)
+    remaining_at_start = Column(BigInteger, nullable=False)  # period credits left when it opened
+
+
+class Lease(Base):
+    __tablename__ = "leases"
+
+    name = Column(String(191), primary_key=True)
+    owner = Column(String(64), nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False)
+
+
+# Full-catalog scrape jobs started from /monitor-product; any API worker
+# can report on or cancel a job another one is running
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+
+    id = Column(String(64), primary_key=True)
+    status = Column(String(16), nullable=False, index=True)  # running, finished, failed, cancelled
+    total = Column(Integer, nullable=False, default=0)
+    fetched = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    deferred = Column(Integer, nullable=False, default=0)
+    summary = Column(Text, nullable=True)  # JSON run summary once finished
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    started_at = Column(TIMESTAMP, nullable=False, index=True)
+    updated_at = Column(TIMESTAMP, nullable=False)
+    finished_at = Column(TIMESTAMP, nullable=True)
+
+
+# Laravel's queue tables, shared with the PHP app
+class Job(Base):
+    __tablename__ = "jobs"
 
+    id = Column(BigInteger, primary_key=True, index=True)
+    queue = Column(String(255), nullable=False, index=True)
+    payload = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    reserved_at = Column(Integer, nullable=True)
+    available_at = Column(Integer, nullable=False)
+    created_at = Column(Integer, nullable=False)
+
+
+class FailedJob(Base):
+    __tablename__ = "failed_jobs"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    uuid = Column(String(255), unique=True, nullable=False)
+    connection = Column(Text, nullable=False)
+    queue = Column(Text, nullable=False)
+    payload = Column(Text, nullable=False)
+    exception = Column(Text, nullable=False)
+    failed_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)
+
+
+# One row per price change; (product_id, ts) keeps each product's series contiguous
+class PriceHistory(Base):
+    __tablename__ = "price_history"
+
+    product_id = Column(BigInteger, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    ts = Column(TIMESTAMP().with_variant(mysql.TIMESTAMP(fsp=6), "mysql"), primary_key=True)
+    price = Column(Double, nullable=True)
+    original_price = Column(Double, nullable=True)
+    currency = Column(String(3), nullable=True)
+
+
+# Laravel's notifications table, read by the PHP app
+class Notification(Base):
+    __tablename__ = "notifications"
 
+    id = Column(BigInteger, primary_key=True, index=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    cocart_id = Column(BigInteger, ForeignKey("cocarts.id", ondelete="CASCADE"), nullable=True)
+    product_id = Column(BigInteger, ForeignKey("products.id", ondelete="CASCADE"), nullable=True, index=True)
+    user_notification_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    title = Column(String(255), nullable=True)
+    notification = Column(String(255), nullable=True)
+    type = Column(String(255), nullable=True)
+    url = Column(String(255), nullable=True)
+    read_at = Column(TIMESTAMP, nullable=True)
+    deleted_at = Column(TIMESTAMP, nullable=True)
+    created_at = Column(TIMESTAMP, nullable=True)
+    updated_at = Column(TIMESTAMP, nullable=True)
+    extra_data = Column(Text, nullable=True)
+    is_joined = Column(Integer, nullable=True)
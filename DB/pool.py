@@ -0,0 +1,156 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+# Upper bounds of the checkout wait histogram, in milliseconds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Metrics of every instrumented engine, by name
+pool_metrics = {}
+
+
+class PoolMetrics:
+    """Checkout, connection and invalidation counters for one engine's pool.
+
+    Event counters come from pool events; the wait histogram is fed by
+    the timed pool classes below, which time every checkout including the
+    time spent queueing for a free connection.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.wait_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_sum_ms = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.closes = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.peak_checked_out = 0
+
+    def attach(self, engine):
+        """Instrument ``engine`` (sync, or the ``sync_engine`` of an async one)."""
+        self.pool = engine.pool
+        engine.pool.metrics = self
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "soft_invalidate", self._on_soft_invalidate)
+        pool_metrics[self.name] = self
+        return self
+
+    def observe_wait(self, seconds, timed_out=False):
+        wait_ms = seconds * 1000
+        index = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if wait_ms <= bound),
+                     len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.wait_counts[index] += 1
+            self.wait_sum_ms += wait_ms
+            self.timeouts += timed_out
+
+    def _on_connect(self, dbapi_connection, record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_close(self, dbapi_connection, record):
+        with self._lock:
+            self.closes += 1
+
+    def _on_checkout(self, dbapi_connection, record, proxy):
+        checked_out = self.pool.checkedout() if hasattr(self.pool, "checkedout") else 0
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def _on_invalidate(self, dbapi_connection, record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_soft_invalidate(self, dbapi_connection, record, exception):
+        with self._lock:
+            self.soft_invalidations += 1
+
+    def wait_percentile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile, in ms."""
+        total = sum(self.wait_counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS_MS + (None,), self.wait_counts):
+            seen += count
+            if seen >= total * fraction:
+                return bound
+        return None
+
+    def snapshot(self):
+        pool = self.pool
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(WAIT_BUCKETS_MS + ("+Inf",), self.wait_counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "pool": pool.status() if pool is not None else None,
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": max(0, pool.overflow()) if hasattr(pool, "overflow") else None,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "closes": self.closes,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "checkout_wait_ms": {
+                    "buckets": buckets,
+                    "count": cumulative,
+                    "sum": round(self.wait_sum_ms, 3),
+                    "p50": self.wait_percentile(0.5),
+                    "p99": self.wait_percentile(0.99),
+                },
+            }
+
+
+class _TimedCheckout:
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            if self.metrics is not None:
+                self.metrics.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.observe_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep reporting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_metrics_snapshot():
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
@@ -0,0 +1,120 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from DB.pool import PoolMetrics, TimedAsyncQueuePool, TimedQueuePool
+
+
+class Replica:
+    def __init__(self, name, url, pool_options, async_url):
+        self.name = name
+        self.url = url
+        self.pool_options = pool_options
+        self.async_url = async_url
+        self.engine = create_engine(url, poolclass=TimedQueuePool, **pool_options)
+        PoolMetrics(name).attach(self.engine)
+        event.listen(self.engine, "invalidate", self._on_invalidate)
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = None
+        self.AsyncSession = None
+        # Reads stay on the primary until the first check passes
+        self.healthy = False
+        self.checked_at = None
+        self.last_error = None
+
+    def _on_invalidate(self, dbapi_connection, record, exception):
+        # A dropped connection takes the replica out until a check passes again
+        if exception is not None:
+            self.healthy = False
+            self.last_error = str(exception)
+
+    def async_sessions(self):
+        if self.AsyncSession is None:
+            self.async_engine = create_async_engine(
+                self.async_url(self.url), poolclass=TimedAsyncQueuePool, **self.pool_options)
+            PoolMetrics(f"{self.name}_async").attach(self.async_engine.sync_engine)
+            self.AsyncSession = async_sessionmaker(
+                self.async_engine, autoflush=False, expire_on_commit=False)
+        return self.AsyncSession
+
+    def check(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except SQLAlchemyError as e:
+            if self.healthy or self.checked_at is None:
+                print(f"Replica {self.name} is down: {e}")
+            self.healthy = False
+            self.last_error = str(e)
+        else:
+            if not self.healthy and self.checked_at is not None:
+                print(f"Replica {self.name} is back")
+            self.healthy = True
+            self.last_error = None
+        self.checked_at = time.time()
+
+
+class ReplicaSet:
+    """Read replicas handed out round-robin, skipping unhealthy ones.
+
+    A daemon thread runs a ``SELECT 1`` on each replica every
+    ``health_seconds``; a replica is used once a check has passed, and one
+    whose connection is invalidated mid-use is skipped until its next
+    check passes. ``pick`` returns None when
+    there are no healthy replicas, and callers fall back to the primary.
+    """
+
+    def __init__(self, urls, pool_options, health_seconds, async_url):
+        self.replicas = [Replica(f"replica{n}", url, pool_options, async_url)
+                         for n, url in enumerate(urls, 1)]
+        self.health_seconds = health_seconds
+        self._cycle = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def start(self):
+        """Start checking the replicas in the background, the first time right away.
+
+        Checks connect synchronously, so none run on the caller's thread,
+        which may be the event loop.
+        """
+        with self._lock:
+            if self._monitor is not None or not self.replicas:
+                return
+            self._monitor = threading.Thread(
+                target=self._watch, name="replica-health", daemon=True)
+            self._monitor.start()
+
+    def _watch(self):
+        while True:
+            for replica in self.replicas:
+                replica.check()
+            time.sleep(self.health_seconds)
+
+    def pick(self):
+        if not self.replicas:
+            return None
+        if self._monitor is None:
+            self.start()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._cycle) % len(self.replicas)]
+            if replica.healthy:
+                return replica
+        return None
+
+    def status(self):
+        return [{"name": replica.name, "healthy": replica.healthy,
+                 "checked_at": replica.checked_at, "last_error": replica.last_error}
+                for replica in self.replicas]
+
+    async def dispose_async(self):
+        for replica in self.replicas:
+            if replica.async_engine is not None:
+                await replica.async_engine.dispose()
+                replica.async_engine = None
+                replica.AsyncSession = None
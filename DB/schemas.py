@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -74,16 +74,21 @@ class CocartProductCreate(BaseModel):
     cocart_id: int
     product: ProductCreate
     note: Optional[str] = None
+    target_price: Optional[float] = Field(None, gt=0)
 
 class CocartProduct(BaseModel):
     id: int
     cocart_id: int
     product_id: int
     note: Optional[str] = None
+    target_price: Optional[float] = None
 
     class Config:
         orm_mode = True
 
+class TargetPriceUpdate(BaseModel):
+    target_price: Optional[float] = Field(None, gt=0)  # None removes the watch
+
 # Update Product schema
 
 class UpdateProductBase(BaseModel):
@@ -0,0 +1,31 @@
+"""add product canonical url
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Left NULL here; dedupe_products.py merges duplicates and fills them in
+    op.add_column('products', sa.Column('canonical_url', sa.String(length=2500), nullable=True))
+    op.add_column('products', sa.Column('canonical_url_hash', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('products_canonical_url_hash_unique', 'products', ['canonical_url_hash'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('products_canonical_url_hash_unique', 'products', type_='unique')
+    op.drop_column('products', 'canonical_url_hash')
+    op.drop_column('products', 'canonical_url')
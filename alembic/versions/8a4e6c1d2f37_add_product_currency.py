@@ -0,0 +1,28 @@
+"""add product currency and price index
+
+Revision ID: 8a4e6c1d2f37
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e6c1d2f37'
+down_revision: Union[str, None] = '3f1c2a9d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('currency', sa.String(length=3), nullable=True))
+    op.create_index('ix_products_price', 'products', ['price'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_price', table_name='products')
+    op.drop_column('products', 'currency')
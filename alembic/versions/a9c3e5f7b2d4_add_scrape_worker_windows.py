@@ -0,0 +1,32 @@
+"""add scrape worker windows
+
+Revision ID: a9c3e5f7b2d4
+Revises: e4b8c2d1a7f3
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e5f7b2d4'
+down_revision: Union[str, None] = 'e4b8c2d1a7f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scrape_worker_windows',
+        sa.Column('window', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('allowance', sa.Integer(), nullable=False),
+        sa.Column('remaining_at_start', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('window'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scrape_worker_windows')
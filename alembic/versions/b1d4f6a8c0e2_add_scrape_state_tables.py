@@ -0,0 +1,95 @@
+"""add scrape state tables
+
+Revision ID: b1d4f6a8c0e2
+Revises: a9c3e5f7b2d4
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1d4f6a8c0e2'
+down_revision: Union[str, None] = 'a9c3e5f7b2d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# These tables used to come from Base.metadata.create_all, which never adds
+# columns to a table that exists; a deploy that created an earlier version
+# gets the missing columns here instead
+def _state_columns():
+    return [
+        sa.Column('page_digest', sa.String(length=64), nullable=True),
+        sa.Column('fields_digest', sa.String(length=64), nullable=True),
+        sa.Column('last_price', sa.String(length=255), nullable=True),
+        sa.Column('change_rate', sa.Double(), nullable=False, server_default='0.5'),
+        sa.Column('last_checked_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('next_check_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('lease_owner', sa.String(length=64), nullable=True),
+        sa.Column('lease_expires_at', sa.TIMESTAMP(), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'product_scrape_states' not in tables:
+        op.create_table(
+            'product_scrape_states',
+            sa.Column('product_id', sa.BigInteger(), nullable=False),
+            *_state_columns(),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('product_id'),
+        )
+    else:
+        existing = {column['name'] for column in inspector.get_columns('product_scrape_states')}
+        for column in _state_columns():
+            if column.name not in existing:
+                op.add_column('product_scrape_states', column)
+    indexes = {index['name'] for index in inspector.get_indexes('product_scrape_states')} \
+        if 'product_scrape_states' in tables else set()
+    if 'ix_product_scrape_states_next_check_at' not in indexes:
+        op.create_index('ix_product_scrape_states_next_check_at',
+                        'product_scrape_states', ['next_check_at'])
+
+    if 'scraper_credit_usage' not in tables:
+        op.create_table(
+            'scraper_credit_usage',
+            sa.Column('period_start', sa.TIMESTAMP(), nullable=False),
+            sa.Column('credits_used', sa.Integer(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('period_start'),
+        )
+
+    if 'leases' not in tables:
+        op.create_table(
+            'leases',
+            sa.Column('name', sa.String(length=191), nullable=False),
+            sa.Column('owner', sa.String(length=64), nullable=False),
+            sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+            sa.PrimaryKeyConstraint('name'),
+        )
+
+    # Products from before scrape states or their schedule existed are due right away
+    now = datetime.utcnow()
+    op.get_bind().execute(sa.text(
+        "UPDATE product_scrape_states SET next_check_at = :now WHERE next_check_at IS NULL"
+    ), {"now": now})
+    op.get_bind().execute(sa.text(
+        "INSERT INTO product_scrape_states (product_id, next_check_at, change_rate) "
+        "SELECT products.id, :now, 0.5 FROM products "
+        "LEFT JOIN product_scrape_states ON product_scrape_states.product_id = products.id "
+        "WHERE product_scrape_states.product_id IS NULL"
+    ), {"now": now})
+
+
+def downgrade() -> None:
+    op.drop_table('leases')
+    op.drop_table('scraper_credit_usage')
+    op.drop_index('ix_product_scrape_states_next_check_at', table_name='product_scrape_states')
+    op.drop_table('product_scrape_states')
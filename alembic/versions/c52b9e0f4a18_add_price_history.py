@@ -0,0 +1,37 @@
+"""add price history
+
+Revision ID: c52b9e0f4a18
+Revises: 8a4e6c1d2f37
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52b9e0f4a18'
+down_revision: Union[str, None] = '8a4e6c1d2f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'price_history',
+        sa.Column('product_id', sa.BigInteger(), nullable=False),
+        sa.Column('ts', sa.TIMESTAMP().with_variant(mysql.TIMESTAMP(fsp=6), 'mysql'),
+                  nullable=False),
+        sa.Column('price', sa.Double(), nullable=True),
+        sa.Column('original_price', sa.Double(), nullable=True),
+        sa.Column('currency', sa.String(length=3), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'ts'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('price_history')
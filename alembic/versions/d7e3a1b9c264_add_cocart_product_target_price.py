@@ -0,0 +1,29 @@
+"""add cocart product target price
+
+Revision ID: d7e3a1b9c264
+Revises: c52b9e0f4a18
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e3a1b9c264'
+down_revision: Union[str, None] = 'c52b9e0f4a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cocart_products', sa.Column('target_price', sa.Double(), nullable=True))
+    op.create_index('ix_cocart_products_product_id_target_price', 'cocart_products',
+                    ['product_id', 'target_price'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cocart_products_product_id_target_price', table_name='cocart_products')
+    op.drop_column('cocart_products', 'target_price')
@@ -0,0 +1,45 @@
+"""add scrape jobs
+
+Revision ID: e4b8c2d1a7f3
+Revises: d7e3a1b9c264
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8c2d1a7f3'
+down_revision: Union[str, None] = 'd7e3a1b9c264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'scrape_jobs',
+        sa.Column('id', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('fetched', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('deferred', sa.Integer(), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+        sa.Column('started_at', sa.TIMESTAMP(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+        sa.Column('finished_at', sa.TIMESTAMP(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_scrape_jobs_status', 'scrape_jobs', ['status'])
+    op.create_index('ix_scrape_jobs_started_at', 'scrape_jobs', ['started_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scrape_jobs_started_at', table_name='scrape_jobs')
+    op.drop_index('ix_scrape_jobs_status', table_name='scrape_jobs')
+    op.drop_table('scrape_jobs')
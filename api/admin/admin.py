@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from fastapi import FastAPI, Depends, HTTPException, APIRouter
 from sqlalchemy.orm import Session
 from typing import List
-from DB.database import get_db
+from DB.database import get_db, get_read_db
 from DB.models import User, Wishlist, WishlistProduct, Product
 
 from sqlalchemy import func, desc
@@ -64,13 +64,13 @@ class ProductOut(BaseModel):
 
 
 @admin_router.get("/users", response_model=List[UserOut])
-def get_all_users(db: Session = Depends(get_db)):
+def get_all_users(db: Session = Depends(get_read_db)):
     users = db.query(User).all()
     return users
 
 
 @admin_router.get("/users/{user_id}", response_model=UserOut)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -101,13 +101,13 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @admin_router.get("/wishlists", response_model=List[WishlistOut])
-def get_all_wishlists(db: Session = Depends(get_db)):
+def get_all_wishlists(db: Session = Depends(get_read_db)):
     wishlists = db.query(Wishlist).all()
     return wishlists
 
 
 @admin_router.get("/wishlists/{wishlist_id}", response_model=WishlistOut)
-def get_wishlist(wishlist_id: int, db: Session = Depends(get_db)):
+def get_wishlist(wishlist_id: int, db: Session = Depends(get_read_db)):
     wishlist = db.query(Wishlist).filter(Wishlist.id == wishlist_id).first()
     if wishlist is None:
         raise HTTPException(status_code=404, detail="Wishlist not found")
@@ -116,7 +116,7 @@ def get_wishlist(wishlist_id: int, db: Session = Depends(get_db)):
 # Reports on Popular Products and WishLists
 
 @admin_router.get("/reports/popular-wishlists", response_model=List[WishlistOut])
-def get_popular_wishlists(limit: int = 10, db: Session = Depends(get_db)):
+def get_popular_wishlists(limit: int = 10, db: Session = Depends(get_read_db)):
     popular_wishlists = (
         db.query(Wishlist, func.count(
             WishlistProduct.wishlist_id).label('count'))
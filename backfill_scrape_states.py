@@ -0,0 +1,11 @@
+from DB.database import SessionLocal
+from monitoring.schedule import backfill_scrape_states
+
+# One-off: products from before scrape states existed get a row due now.
+# New products get theirs when they are added.
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        backfill_scrape_states(db)
+    finally:
+        db.close()
@@ -0,0 +1,49 @@
+"""Local SQLite stand-in for the MySQL database, shared by the benchmarks."""
+import os
+import sys
+
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# DB.database builds its MySQL URL at import time; no connection is made
+for _name, _default in (("DB_CONNECTION", "mysql+pymysql"), ("DB_HOST", "localhost"),
+                        ("DB_PORT", "3306"), ("DB_DATABASE", "cocarting"),
+                        ("DB_USERNAME", "bench"), ("DB_PASSWORD", "bench")):
+    os.environ.setdefault(_name, _default)
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    return "INTEGER"
+
+
+def sqlite_session(path, fresh=True):
+    import DB.models  # noqa: F401  registers the models on Base
+    from DB.database import Base
+
+    if fresh and os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def concurrent_sqlite_engine(path):
+    # Several processes write at once: take the write lock when a
+    # transaction starts so SQLite waits for it instead of failing
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60})
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, record):
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return engine
@@ -0,0 +1,98 @@
+"""Latency of adding a product to a cocart, old and new write paths.
+
+Replays the database work of ``POST /cocart-products`` against a SQLite
+file with durable commits. ``separate`` is the previous path: commit the
+product, refresh it, commit its image and scrape state, then commit and
+refresh the cart entry. ``single`` is the current one: the product, image,
+scrape state and cart entry flushed through relationships and committed
+once. Both paths run for new products and for products already in the
+catalog, and the run reports statements, p50 and p99 per add.
+
+    python benchmarks/bench_add_product.py --adds 500
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import _sqlite
+from _sqlite import sqlite_session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--adds", type=int, default=500)
+    args = parser.parse_args()
+
+    from sqlalchemy import event, select
+    from DB.models import Cocart, CocartProduct, Product, ProductImage, ProductScrapeState, User
+    from monitoring.urls import canonical_url, url_hash
+
+    def lookup(db, cocart_id, url):
+        db.scalar(select(Cocart.id).filter(Cocart.id == cocart_id))
+        return db.scalar(select(Product).filter(Product.canonical_url_hash == url_hash(
+            canonical_url(url))))
+
+    def new_product(url, slug, **relationships):
+        canonical = canonical_url(url)
+        return Product(name="Product", slug=slug, product_tracking_url=url,
+                       canonical_url=canonical, canonical_url_hash=url_hash(canonical),
+                       **relationships)
+
+    def separate(db, cocart_id, url, slug):
+        product = lookup(db, cocart_id, url)
+        if not product:
+            product = new_product(url, slug)
+            db.add(product)
+            db.commit()
+            db.refresh(product)
+            db.add(ProductImage(product_id=product.id, image="img"))
+            db.add(ProductScrapeState(product_id=product.id, next_check_at=datetime.utcnow()))
+            db.commit()
+        cocart_product = CocartProduct(cocart_id=cocart_id, product_id=product.id)
+        db.add(cocart_product)
+        db.commit()
+        db.refresh(cocart_product)
+
+    def single(db, cocart_id, url, slug):
+        product = lookup(db, cocart_id, url) or new_product(
+            url, slug, product_images=[ProductImage(image="img")],
+            scrape_state=ProductScrapeState(next_check_at=datetime.utcnow()))
+        db.add(CocartProduct(cocart_id=cocart_id, product=product))
+        db.commit()
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_add.db")
+    engine, Session = sqlite_session(path)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    db = Session()
+    db.add(User(id=1, email="u@example.com"))
+    db.add(Cocart(id=1, user_id=1, name="cart", slug="c1"))
+    db.commit()
+
+    for prefix, label, add in (("A", "separate commits", separate),
+                               ("B", "single commit", single)):
+        for kind in ("new", "existing"):
+            latencies = []
+            for n in range(args.adds):
+                url = (f"https://www.amazon.in/dp/B{prefix}{n:08d}" if kind == "new"
+                       else f"https://www.amazon.in/dp/B{prefix}EXISTING")
+                statements.clear()
+                started = time.perf_counter()
+                add(db, 1, url, f"{prefix}-{kind}-{n}")
+                latencies.append(time.perf_counter() - started)
+                db.expunge_all()
+            latencies.sort()
+            print(f"{label:16s} {kind:8s}: {len(statements)} statements, "
+                  f"p50 {statistics.median(latencies) * 1000:6.2f} ms, "
+                  f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:6.2f} ms")
+
+    db.close()
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Sync versus async request path under high concurrency.
+
+Serves the two hot reads, a user's cocarts and a cocart's products, from
+two in-process apps: one with sync ``def`` handlers on a ``Session``,
+which FastAPI runs on its threadpool, and one with ``async def`` handlers
+on an ``AsyncSession``. Both use the same queries against the same SQLite
+file, with ``--latency-ms`` added to every statement in the driver thread
+to stand in for a network round trip to MySQL. ``--concurrency`` clients
+then issue ``--requests`` requests to each app.
+
+    python benchmarks/bench_async_endpoints.py --concurrency 200 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import _sqlite
+from _sqlite import sqlite_session
+
+LATENCY = 0.0
+
+
+class SlowCursor(sqlite3.Cursor):
+    def execute(self, *args):
+        time.sleep(LATENCY)
+        return super().execute(*args)
+
+
+class SlowConnection(sqlite3.Connection):
+    def cursor(self, factory=SlowCursor):
+        return super().cursor(factory)
+
+
+def build_apps(path, pool_size):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import Session, selectinload, sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    from DB.models import Cocart, CocartProduct, Product
+
+    def cocarts_query(user_id):
+        return select(Cocart).options(selectinload(Cocart.products)).filter(
+            Cocart.user_id == user_id)
+
+    def products_query(cocart_id):
+        return (select(Product, CocartProduct.note)
+                .options(selectinload(Product.product_images))
+                .join(CocartProduct, CocartProduct.product_id == Product.id)
+                .filter(CocartProduct.cocart_id == cocart_id))
+
+    def cocart_rows(cocarts):
+        return [{"id": c.id, "name": c.name, "products": [p.product_id for p in c.products]}
+                for c in cocarts]
+
+    def product_rows(rows):
+        return [{"id": p.id, "name": p.name, "price": p.price, "note": note,
+                 "images": [i.image for i in p.product_images]} for p, note in rows]
+
+    sync_engine = create_engine(
+        f"sqlite:///{path}", pool_size=pool_size, max_overflow=0,
+        connect_args={"factory": SlowConnection, "check_same_thread": False})
+    SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size, max_overflow=0, connect_args={"factory": SlowConnection})
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    sync_app = FastAPI()
+
+    @sync_app.get("/cocarts/{user_id}")
+    def get_cocarts(user_id: int, db: Session = Depends(get_db)):
+        return cocart_rows(db.execute(cocarts_query(user_id)).scalars().all())
+
+    @sync_app.get("/cocarts/{cocart_id}/products")
+    def get_cocart_products(cocart_id: int, db: Session = Depends(get_db)):
+        db.get(Cocart, cocart_id)
+        return product_rows(db.execute(products_query(cocart_id)).all())
+
+    async_app = FastAPI()
+
+    @async_app.get("/cocarts/{user_id}")
+    async def get_cocarts_async(user_id: int, db: AsyncSession = Depends(get_async_db)):
+        return cocart_rows((await db.execute(cocarts_query(user_id))).scalars().all())
+
+    @async_app.get("/cocarts/{cocart_id}/products")
+    async def get_cocart_products_async(cocart_id: int,
+                                        db: AsyncSession = Depends(get_async_db)):
+        await db.get(Cocart, cocart_id)
+        return product_rows((await db.execute(products_query(cocart_id))).all())
+
+    return (sync_app, sync_engine), (async_app, async_engine)
+
+
+def seed(path, users, carts_per_user, products_per_cart):
+    from DB.models import Cocart, CocartProduct, Product, ProductImage, User
+
+    engine, _ = sqlite_session(path)
+    rng = random.Random(2)
+    cocarts = users * carts_per_user
+    products = cocarts * products_per_cart // 2
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "email": f"u{i}@example.com"} for i in range(1, users + 1)])
+        conn.execute(Cocart.__table__.insert(), [
+            {"id": i, "user_id": (i - 1) // carts_per_user + 1, "type": 0, "name": "cart",
+             "slug": f"c{i}", "allow_vote": False, "allow_add_product": False,
+             "allow_remove_product": False, "mark_purchased_items": False,
+             "is_read": False, "is_hide": False}
+            for i in range(1, cocarts + 1)])
+        conn.execute(Product.__table__.insert(), [
+            {"id": i, "name": f"Product {i}", "slug": f"p{i}", "price": 999.0}
+            for i in range(1, products + 1)])
+        conn.execute(ProductImage.__table__.insert(), [
+            {"product_id": i, "image": f"https://img/{i}.jpg"} for i in range(1, products + 1)])
+        conn.execute(CocartProduct.__table__.insert(), [
+            {"cocart_id": cocart_id, "product_id": rng.randrange(1, products + 1),
+             "note": "", "is_bought": False, "is_claimed": False}
+            for cocart_id in range(1, cocarts + 1) for _ in range(products_per_cart)])
+    engine.dispose()
+    return users, cocarts
+
+
+async def load(app, requests, concurrency, users, cocarts):
+    import httpx
+
+    rng = random.Random(9)
+    paths = [f"/cocarts/{rng.randrange(1, users + 1)}" if rng.random() < 0.5
+             else f"/cocarts/{rng.randrange(1, cocarts + 1)}/products"
+             for _ in range(requests)]
+    latencies = []
+    errors = 0
+    queue = iter(paths)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://bench") as client:
+        async def worker():
+            nonlocal errors
+            for path in queue:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return (requests / elapsed, statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000, errors)
+
+
+def main():
+    global LATENCY
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--carts-per-user", type=int, default=3)
+    parser.add_argument("--products-per-cart", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--pool-size", type=int, default=100)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_async.db")
+    users, cocarts = seed(path, args.users, args.carts_per_user, args.products_per_cart)
+    LATENCY = args.latency_ms / 1000
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, "
+          f"{args.latency_ms:g} ms per statement")
+
+    for label, (app, engine) in zip(("sync", "async"), build_apps(path, args.pool_size)):
+        rate, p50, p99, errors = asyncio.run(
+            load(app, args.requests, args.concurrency, users, cocarts))
+        print(f"{label:5s}: {rate:7.0f} req/s, p50 {p50:7.1f} ms, p99 {p99:7.1f} ms"
+              f"{f', {errors} errors' if errors else ''}")
+        if hasattr(engine, "sync_engine"):
+            asyncio.run(engine.dispose())
+        else:
+            engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Rows per second written by ProductBatchWriter at different batch sizes.
+
+Runs against a local SQLite file standing in for MySQL. Every batch size
+rewrites the same catalog with fresh prices; ``--bad-rows`` mixes in rows
+that fail to bind so the per-row isolation path is exercised too.
+
+    python benchmarks/bench_batch_writer.py --products 5000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from _sqlite import sqlite_session
+
+from DB.models import PriceHistory, Product, ProductImage
+from monitoring.writer import ProductBatchWriter
+
+
+def seed(Session, size):
+    db = Session()
+    db.bulk_insert_mappings(Product, [
+        {"id": i, "name": f"Product {i}", "slug": f"product-{i}",
+         "product_tracking_url": f"https://www.amazon.in/dp/B{i:09d}"}
+        for i in range(1, size + 1)
+    ])
+    db.bulk_insert_mappings(ProductImage, [
+        {"product_id": i, "image": "old.jpg"} for i in range(1, size + 1)
+    ])
+    db.commit()
+    db.close()
+
+
+def scraped(product_id, round_no, bad):
+    return {
+        "name": f"Product {product_id}",
+        "price": "not a price" if bad else 100.0 + round_no + product_id % 7,
+        "original_price": 150.0,
+        "customer_rating": "4.2",
+        "product_tracking_url": f"https://www.amazon.in/dp/B{product_id:09d}",
+        "slug": f"product-{product_id}",
+        "image": f"https://m.media-amazon.com/images/I/{product_id}-{round_no}.jpg",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--batch-sizes", default="1,100,1000")
+    parser.add_argument("--bad-rows", type=int, default=0,
+                        help="rows per run whose price fails to bind")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_writer.db")
+    engine, Session = sqlite_session(path)
+    seed(Session, args.products)
+    bad_ids = set(range(1, args.products + 1, max(1, args.products // max(1, args.bad_rows))))
+    bad_ids = set(list(bad_ids)[:args.bad_rows])
+
+    for round_no, batch_size in enumerate(int(b) for b in args.batch_sizes.split(",")):
+        db = Session()
+        writer = ProductBatchWriter(db, batch_size=batch_size)
+        started = time.perf_counter()
+        for product_id in range(1, args.products + 1):
+            writer.add(product_id, scraped(product_id, round_no, product_id in bad_ids),
+                       {"page_digest": f"p{round_no}", "fields_digest": f"f{round_no}"})
+        writer.flush()
+        elapsed = time.perf_counter() - started
+        # Every round changes every good price, so each one adds a history row
+        history = db.query(PriceHistory).count()
+        db.close()
+        print(f"batch size {batch_size:5d}: {writer.written / elapsed:9.0f} rows/s "
+              f"({writer.written} written, {len(writer.failed)} failed, {elapsed:.2f}s, "
+              f"{history} price history rows)")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Peak RSS while iterating the catalog: query(Product).all() vs streaming.
+
+Seeds SQLite catalogs of increasing size (each product carries a few KB of
+description text, like real rows) and walks every product the way scrape
+does, each mode in a fresh child process so ru_maxrss is comparable.
+
+    python benchmarks/bench_catalog_memory.py --sizes 10000,50000,100000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from _sqlite import sqlite_session
+
+from DB.models import Product
+from monitoring.catalog import iter_product_chunks
+
+DESCRIPTION = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40
+
+
+def seed(path, size):
+    engine, Session = sqlite_session(path)
+    db = Session()
+    for start in range(1, size + 1, 5000):
+        db.bulk_insert_mappings(Product, [
+            {"id": i, "name": f"Product {i}", "slug": f"product-{i}",
+             "product_tracking_url": f"https://www.amazon.in/dp/B{i:09d}",
+             "description": DESCRIPTION, "short_description": DESCRIPTION[:500]}
+            for i in range(start, min(start + 5000, size + 1))
+        ])
+        db.commit()
+    db.close()
+    engine.dispose()
+
+
+def walk(path, mode):
+    engine, Session = sqlite_session(path, fresh=False)
+    db = Session()
+    seen = 0
+    if mode == "all":
+        for product in db.query(Product).all():
+            seen += bool(product.product_tracking_url)
+    else:
+        for chunk in iter_product_chunks(db):
+            seen += len(chunk)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{seen} {peak_kb}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,50000,100000")
+    parser.add_argument("--walk", nargs=2, metavar=("DB", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.walk:
+        walk(*args.walk)
+        return
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        path = os.path.join(tempfile.gettempdir(), f"cocarting_bench_catalog_{size}.db")
+        seed(path, size)
+        results = {}
+        for mode in ("all", "stream"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--walk", path, mode],
+                check=True, capture_output=True, text=True).stdout.split()
+            results[mode] = int(out[1]) / 1024
+        print(f"{size:8d} products: query().all() peak {results['all']:7.1f} MB, "
+              f"streaming peak {results['stream']:7.1f} MB")
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
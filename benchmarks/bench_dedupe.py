@@ -0,0 +1,78 @@
+"""Duplicate products merged by canonical URL, and the scrape fetches saved.
+
+Seeds a SQLite catalog where each of ``--items`` Amazon/Flipkart items
+was added ``--copies`` times through differently tracked links, with a
+cart entry per copy spread over ``--copies`` carts, then runs
+dedupe_products and reports products (one scrape fetch each) before and
+after, cart entries left once copies in the same cart are merged, and time.
+
+    python benchmarks/bench_dedupe.py --items 5000 --copies 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import _sqlite
+from _sqlite import sqlite_session
+
+
+def links(i, n):
+    asin = f"B{i:09d}"
+    if i % 2:
+        return [f"https://www.amazon.in/Some-Item-{i}/dp/{asin}/ref=sr_1_{n}?qid={n}&sr=8-{n}",
+                f"https://amazon.in/dp/{asin}?tag=aff-21&th=1",
+                f"https://www.amazon.in/gp/product/{asin}/?psc=1",
+                f"https://m.amazon.in/dp/{asin}"]
+    itm, pid = f"itm{i:012x}", f"MOB{i:013d}"
+    return [f"https://www.flipkart.com/item-{i}/p/{itm}?pid={pid}&lid=LST{n}&marketplace=FLIPKART",
+            f"https://dl.flipkart.com/dl/item-{i}/p/{itm}?pid={pid}",
+            f"https://www.flipkart.com/x/p/{itm}?pid={pid}&otracker=search",
+            f"https://www.flipkart.com/item-{i}/p/{itm}?pid={pid}&utm_source=share"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--copies", type=int, default=4)
+    args = parser.parse_args()
+
+    from DB.models import Cocart, CocartProduct, Product, ProductImage, User
+    from dedupe_products import dedupe_products
+
+    engine, Session = sqlite_session(os.path.join(tempfile.gettempdir(), "cocarting_bench_dedupe.db"))
+    db = Session()
+    db.add(User(id=1, email="bench@example.com"))
+    db.add_all([Cocart(id=n, user_id=1, name="bench", slug=f"bench{n}")
+                for n in range(1, args.copies + 1)])
+    products = []
+    for i in range(args.items):
+        for n in range(args.copies):
+            products.append(random.choice(links(i, n)))
+    random.shuffle(products)
+    db.bulk_insert_mappings(Product, [
+        {"id": i, "name": "x", "slug": f"p{i}", "product_tracking_url": url}
+        for i, url in enumerate(products, 1)])
+    db.bulk_insert_mappings(ProductImage, [
+        {"product_id": i, "image": "x"} for i in range(1, len(products) + 1)])
+    db.bulk_insert_mappings(CocartProduct, [
+        {"cocart_id": i % args.copies + 1, "product_id": i} for i in range(1, len(products) + 1)])
+    db.commit()
+
+    before = db.query(Product).count()
+    started = time.perf_counter()
+    dedupe_products(db, batch_size=500)
+    elapsed = time.perf_counter() - started
+    after = db.query(Product).count()
+    entries = db.query(CocartProduct).count()
+    orphans = (db.query(CocartProduct)
+               .outerjoin(Product, Product.id == CocartProduct.product_id)
+               .filter(Product.id.is_(None)).count())
+    print(f"products {before} -> {after} ({after / before:.0%} of the fetches), "
+          f"cart entries {len(products)} -> {entries}, orphaned {orphans}, {elapsed:.2f}s")
+    db.close()
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
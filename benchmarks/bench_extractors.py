@@ -0,0 +1,103 @@
+"""Per-page field extraction time: legacy if/elif chain vs compiled registry.
+
+Both versions run over the same pre-parsed soup of each saved page in
+benchmarks/fixtures, so the numbers isolate selector work from HTML
+parsing.
+
+    python benchmarks/bench_extractors.py --rounds 200
+"""
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monitoring.extractors import find_extractor, extract_fields  # noqa: E402
+
+FIXTURES = {
+    "amazon_product.html": "https://www.amazon.in/dp/B0BSRX4V2W",
+    "flipkart_product.html": "https://www.flipkart.com/apple-iphone-15/p/itm6ac6485515ae4",
+}
+
+
+def legacy_extract(soup, hostname):
+    # Field extraction as it was before the registry: every field calls
+    # select_one twice and the CSS is re-parsed on each call
+    if "amazon" in hostname:
+        product_title = soup.select_one('#productTitle').get_text(
+            strip=True) if soup.select_one('#productTitle') else 'Title not available'
+        price_whole = soup.select_one('.a-price .a-price-whole').get_text(
+            strip=True) if soup.select_one('.a-price .a-price-whole') else ''
+        soup.select_one('.a-price .a-price-fraction').get_text(
+            strip=True) if soup.select_one('.a-price .a-price-fraction') else '00'
+        product_price = f"₹{price_whole}" if price_whole else 'Price not available'
+        mrp_price = soup.select_one('.a-price.a-text-price .a-offscreen').get_text(strip=True) or \
+            soup.select_one('.basisPrice .a-price .a-offscreen').get_text(strip=True) if soup.select_one(
+                '.basisPrice .a-price .a-offscreen') else 'MRP not available'
+        rating_text = soup.select_one('#acrPopover').get('title', '').strip(
+        ) if soup.select_one('#acrPopover') else 'Rating not available'
+        rating = rating_text.split(
+            ' ')[0] if 'out of' in rating_text else 'Rating not available'
+        image_element = soup.select_one('.a-dynamic-image.a-stretch-vertical')
+        if image_element:
+            image_url = image_element.get('data-old-hires') or image_element.get('src')
+        else:
+            image_element = soup.select_one(
+                'span.a-declarative[data-action="main-image-click"] img')
+            image_url = (image_element.get('data-old-hires') or image_element.get('src')
+                         if image_element else 'Image not available')
+    else:
+        product_title = soup.select_one(
+            '.VU-ZEz').get_text(strip=True) if soup.select_one('.VU-ZEz') else 'Title not available'
+        product_price = soup.select_one('.Nx9bqj').get_text(
+            strip=True) if soup.select_one('.Nx9bqj') else 'Price not available'
+        mrp_price = soup.select_one('.yRaY8j').get_text(
+            strip=True) if soup.select_one('.yRaY8j') else 'MRP not available'
+        rating = soup.select_one('.XQDdHH').get_text(
+            strip=True) if soup.select_one('.XQDdHH') else 'Rating not available'
+        image_url = soup.select_one('.DByuf4').get(
+            'src') if soup.select_one('.DByuf4') else 'Image not available'
+
+    return {
+        "name": product_title,
+        "original_price": mrp_price,
+        "customer_rating": rating,
+        "price": product_price,
+        "image": image_url,
+    }
+
+
+def timed(fn, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    for filename, url in FIXTURES.items():
+        with open(os.path.join(fixtures_dir, filename), encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), 'html.parser')
+        hostname = url.split("/")[2]
+        extractor = find_extractor(hostname)
+
+        legacy = legacy_extract(soup, hostname)
+        compiled = extract_fields(soup, extractor)
+        mismatched = [key for key in legacy if legacy[key] != compiled[key]]
+
+        before = timed(lambda: legacy_extract(soup, hostname), args.rounds)
+        after = timed(lambda: extract_fields(soup, extractor), args.rounds)
+        print(f"{filename:24s} legacy {before:7.3f} ms/page  registry {after:7.3f} ms/page  "
+              f"speedup {before / after:4.1f}x  mismatched fields: {mismatched or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""ScrapeEngine against a stub ScraperAPI that fails one host.
+
+Requests for flipkart products get 429/503 (``--error-rate`` of them,
+after ``--healthy-requests`` good ones), amazon products always succeed.
+Runs the same mixed catalog with the adaptive throttle and breaker
+disabled and enabled, and reports requests wasted on the failing host,
+products deferred and the healthy host's throughput while the
+failing host is being retried.
+
+    python benchmarks/bench_host_throttle.py --products 400 --error-rate 1.0
+"""
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+from aiohttp import web
+import _sqlite  # noqa: F401  puts the repo on sys.path
+from monitoring.engine import ScrapeEngine
+from monitoring.throttle import HostThrottles
+
+
+def start_stub_server(latency, error_rate, healthy_requests, hits):
+    async def handler(request):
+        host = urlparse(request.query["url"]).hostname
+        hits[host] += 1
+        await asyncio.sleep(latency)
+        if (host.endswith("flipkart.com") and hits[host] > healthy_requests
+                and random.random() < error_rate):
+            return web.Response(status=random.choice((429, 503)))
+        return web.Response(text="<html></html>", content_type="text/html")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.SockSite(runner, sock).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{port}/"
+
+
+async def run(api_url, products, throttles):
+    done = Counter()
+    finished = {}
+    started = time.perf_counter()
+
+    async def handle(product_id, product_url, status, page_html):
+        host = urlparse(product_url).hostname
+        done[(host, status)] += 1
+        finished[host] = time.perf_counter() - started
+
+    deferred = []
+    async with ScrapeEngine(api_key="bench", api_url=api_url, throttles=throttles) as engine:
+        summary = await engine.run(
+            products, handle, defer=lambda *item: deferred.append(item))
+    return summary, done, deferred, finished
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=1.0)
+    parser.add_argument("--healthy-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    hits = Counter()
+    api_url = start_stub_server(args.latency, args.error_rate, args.healthy_requests, hits)
+    products = [
+        (i, f"https://www.amazon.in/dp/B{i:09d}" if i % 2
+         else f"https://www.flipkart.com/p/itm{i:012d}")
+        for i in range(args.products)
+    ]
+    unlimited = 10 ** 9
+    modes = {
+        "no throttle": HostThrottles(rate=unlimited, min_rate=unlimited, max_rate=unlimited,
+                                     burst=unlimited, failures_to_trip=unlimited),
+        "adaptive": HostThrottles(rate=20, max_rate=50, burst=10, cooldown=30),
+    }
+    for name, throttles in modes.items():
+        hits.clear()
+        started = time.perf_counter()
+        summary, done, deferred, finished = asyncio.run(run(api_url, products, throttles))
+        elapsed = time.perf_counter() - started
+        errors = sum(n for (host, status), n in done.items() if status != 200)
+        healthy = done[("www.amazon.in", 200)] / finished["www.amazon.in"]
+        print(f"{name:12s}: {elapsed:5.2f}s, flipkart requests {hits['www.flipkart.com']:4d} "
+              f"({errors} errors), deferred {len(deferred):4d}, "
+              f"amazon {healthy:6.1f} products/s, "
+              f"states {throttles.to_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Jobs/s through the database queue for 1..N queue worker processes.
+
+Fills a SQLite ``jobs`` table with no-op jobs (each sleeps ``--work``
+seconds), then runs worker processes with ``--once`` until the queue is
+drained. Reports jobs/s per worker count and batch size, plus any job
+that ran more than once or was left behind.
+
+    python benchmarks/bench_job_queue.py --jobs 2000 --workers 1,2,4 --batch-sizes 1,10
+"""
+import argparse
+import asyncio
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import _sqlite
+from _sqlite import concurrent_sqlite_engine, sqlite_session
+
+
+def seed(path, size):
+    from monitoring.jobqueue import dispatch_many
+
+    engine, Session = sqlite_session(path)
+    db = Session()
+    dispatch_many(db, "bench_noop", [{"n": i} for i in range(size)], queue="bench")
+    db.close()
+    engine.dispose()
+
+
+def worker(path, batch_size, work, log_path):
+    from sqlalchemy.orm import sessionmaker
+    from monitoring.jobqueue import job_handler, run_worker
+
+    log = open(log_path, "w")
+
+    @job_handler("bench_noop")
+    async def noop(db, data):
+        await asyncio.sleep(work)
+        log.write(f"{data['n']}\n")
+
+    db = sessionmaker(bind=concurrent_sqlite_engine(path))()
+    asyncio.run(run_worker(db, ["bench"], batch_size, poll_seconds=0.1, once=True))
+    log.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--batch-sizes", default="1,10")
+    parser.add_argument("--work", type=float, default=0.0)
+    parser.add_argument("--worker", metavar="DB", help=argparse.SUPPRESS)
+    parser.add_argument("--batch-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--log", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.batch_size, args.work, args.log)
+        return
+
+    tmp = tempfile.gettempdir()
+    path = os.path.join(tmp, "cocarting_bench_queue.db")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        for count in (int(c) for c in args.workers.split(",")):
+            seed(path, args.jobs)
+            logs = [os.path.join(tmp, f"cocarting_bench_queue_{i}.log") for i in range(count)]
+            started = time.perf_counter()
+            procs = [subprocess.Popen(
+                [sys.executable, __file__, "--worker", path, "--batch-size", str(batch_size),
+                 "--work", str(args.work), "--log", log],
+                stdout=subprocess.DEVNULL, cwd=os.path.dirname(_sqlite.__file__))
+                for log in logs]
+            for proc in procs:
+                proc.wait()
+            elapsed = time.perf_counter() - started
+            runs = Counter()
+            for log in logs:
+                with open(log) as f:
+                    runs.update(line.strip() for line in f)
+            duplicates = sum(1 for n in runs.values() if n > 1)
+            print(f"batch {batch_size:3d}, {count} worker(s): "
+                  f"{sum(runs.values()) / elapsed:8.1f} jobs/s ({elapsed:.2f}s), "
+                  f"ran {len(runs)}/{args.jobs}, ran twice {duplicates}")
+    for leftover in glob.glob(os.path.join(tmp, "cocarting_bench_queue*")):
+        os.remove(leftover)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Several scheduler processes, one leader: exactly one run per interval.
+
+Starts N processes that each run a BackgroundScheduler with the leader
+heartbeat and a leader_only job against one SQLite file. Each job run is
+logged with its pid. Partway through, the current leader is killed with
+SIGKILL. The report shows run gaps and who ran the job, and flags any
+interval that ran twice.
+
+    python benchmarks/bench_leader_election.py --processes 4 --interval 2
+"""
+import argparse
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import _sqlite
+from _sqlite import concurrent_sqlite_engine, sqlite_session
+
+
+def child(path, interval, ttl):
+    from apscheduler.schedulers.blocking import BlockingScheduler
+
+    import DB.database as database
+    from monitoring.leader import LeaderElection
+
+    database.SessionLocal.configure(bind=concurrent_sqlite_engine(path))
+    leader = LeaderElection(name="bench", ttl=ttl, owner=f"pid-{os.getpid()}")
+
+    def tick():
+        with sqlite3.connect(path, timeout=60) as conn:
+            conn.execute("INSERT INTO bench_runs VALUES (?, ?)", (os.getpid(), time.time()))
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(leader.heartbeat, "interval", seconds=1,
+                      next_run_time=datetime.now())
+    scheduler.add_job(leader.leader_only(tick, interval), "interval", seconds=interval)
+    scheduler.start()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--interval", type=int, default=2)
+    parser.add_argument("--ttl", type=int, default=4)
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--child", metavar="DB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.interval, args.ttl)
+        return
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_leader.db")
+    engine, _ = sqlite_session(path)
+    engine.dispose()
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE bench_runs (pid INTEGER, ts REAL)")
+
+    procs = {}
+    for _ in range(args.processes):
+        proc = subprocess.Popen(
+            [sys.executable, __file__, "--child", path,
+             "--interval", str(args.interval), "--ttl", str(args.ttl)],
+            stdout=subprocess.DEVNULL, cwd=os.path.dirname(_sqlite.__file__))
+        procs[proc.pid] = proc
+
+    started = time.time()
+    time.sleep(args.seconds / 2)
+    with sqlite3.connect(path, timeout=60) as conn:
+        owner = conn.execute("SELECT owner FROM leases WHERE name = 'bench'").fetchone()[0]
+    killed = int(owner.split("-")[1])
+    procs[killed].send_signal(signal.SIGKILL)
+    killed_at = time.time()
+    time.sleep(args.seconds / 2)
+    for proc in procs.values():
+        proc.kill()
+        proc.wait()
+
+    with sqlite3.connect(path) as conn:
+        runs = conn.execute("SELECT pid, ts FROM bench_runs ORDER BY ts").fetchall()
+    os.remove(path)
+
+    gaps = [b[1] - a[1] for a, b in zip(runs, runs[1:])]
+    doubled = sum(1 for gap in gaps if gap < args.interval * 0.5)
+    after_kill = [ts for pid, ts in runs if ts > killed_at and pid != killed]
+    print(f"{args.processes} processes, interval {args.interval}s, lease ttl {args.ttl}s, "
+          f"{args.seconds}s run: {len(runs)} job runs "
+          f"(~{int(args.seconds / args.interval)} intervals)")
+    print(f"runs by pid: {sorted({pid: sum(1 for p, _ in runs if p == pid) for pid, _ in runs}.items())}")
+    print(f"gap between runs: min {min(gaps):.2f}s, max {max(gaps):.2f}s; "
+          f"intervals run twice: {doubled}")
+    if after_kill:
+        print(f"leader pid {killed} killed {killed_at - started:.1f}s in; "
+              f"next run by the new leader {after_kill[0] - killed_at:.1f}s later")
+
+
+if __name__ == "__main__":
+    main()
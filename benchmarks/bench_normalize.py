@@ -0,0 +1,56 @@
+"""Price/rating normalization: per-product calls vs one batch per chunk.
+
+Builds ``--products`` scraped rows from a realistic mix of price, MRP and
+rating strings and normalizes them with ``normalize_product`` one at a
+time and with ``normalize_products`` in chunks of ``--chunk``.
+
+    python benchmarks/bench_normalize.py --products 100000 --chunk 500
+"""
+import argparse
+import random
+import time
+
+import _sqlite  # noqa: F401  puts the repo on sys.path
+from monitoring.normalize import normalize_product, normalize_products
+
+
+def scraped_rows(size):
+    rng = random.Random(7)
+    prices = [f"₹{rng.choice([199, 299, 499, 999, 1299, 2899, 5100, 12999, 129999]):,}"
+              for _ in range(50)] + ["Price not available"]
+    mrps = [f"₹{p:,}.00" for p in (499, 999, 1999, 5100, 15999)] + ["MRP not available"]
+    ratings = ["4.1", "4.3", "3.9 out of 5 stars", "Rating not available"]
+    return [
+        {"name": f"Product {i}", "price": rng.choice(prices),
+         "original_price": rng.choice(mrps), "customer_rating": rng.choice(ratings),
+         "product_tracking_url": f"https://www.{rng.choice(['amazon.in', 'flipkart.com'])}/p/{i}"}
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--chunk", type=int, default=500)
+    args = parser.parse_args()
+    rows = scraped_rows(args.products)
+
+    started = time.perf_counter()
+    single = [normalize_product(row) for row in rows]
+    per_row = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = []
+    for start in range(0, len(rows), args.chunk):
+        batched.extend(normalize_products(rows[start:start + args.chunk]))
+    per_chunk = time.perf_counter() - started
+
+    assert single == batched
+    priced = sum(1 for row in batched if row["price"] is not None)
+    print(f"{args.products} products, {priced} with a price: "
+          f"per product {args.products / per_row:,.0f}/s, "
+          f"batched {args.products / per_chunk:,.0f}/s ({per_row / per_chunk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
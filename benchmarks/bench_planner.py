@@ -0,0 +1,73 @@
+"""Offline run of the ScraperAPI credit planner over a synthetic catalog.
+
+No database or network: builds candidates with random staleness, cart
+counts and watch gaps, plans them against a credit budget and reports
+what was selected versus deferred and how long planning took.
+
+    python benchmarks/bench_planner.py --products 100000 --budget 10000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import _sqlite  # noqa: F401  repo path and offline DB settings
+
+import monitoring.planner as planner
+
+
+def synthetic_catalog(size, seed=7):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    hosts = ["www.amazon.in", "www.flipkart.com", "www.myntra.com"]
+    catalog = []
+    for product_id in range(1, size + 1):
+        catalog.append({
+            "product_id": product_id,
+            "product_url": f"https://{rng.choice(hosts)}/p/{product_id}",
+            "last_checked_at": (None if rng.random() < 0.05
+                                else now - timedelta(hours=rng.expovariate(1 / 96))),
+            "cart_count": int(rng.paretovariate(1.5)) - 1,
+            "watch_gap": rng.random() * 0.5 if rng.random() < 0.1 else None,
+        })
+    return now, catalog
+
+
+def describe(label, candidates, now):
+    if not candidates:
+        print(f"  {label:9s}: none")
+        return
+    stale = [(now - c["last_checked_at"]).total_seconds() / 3600
+             for c in candidates if c["last_checked_at"]]
+    print(f"  {label:9s}: {len(candidates):7d} products, "
+          f"median staleness {sorted(stale)[len(stale) // 2]:6.1f}h, "
+          f"mean carts {sum(c['cart_count'] for c in candidates) / len(candidates):5.2f}, "
+          f"watched {sum(c['watch_gap'] is not None for c in candidates):6d}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--budget", type=int, default=10000)
+    parser.add_argument("--host-credits", default="amazon=5,flipkart=1")
+    args = parser.parse_args()
+
+    planner.SCRAPER_API_HOST_CREDITS.clear()
+    for pair in args.host_credits.split(","):
+        keyword, cost = pair.split("=")
+        planner.SCRAPER_API_HOST_CREDITS[keyword] = int(cost)
+
+    now, catalog = synthetic_catalog(args.products)
+    started = time.perf_counter()
+    selected, deferred, credits = planner.plan_scrape(catalog, args.budget, now)
+    elapsed = time.perf_counter() - started
+
+    print(f"planned {args.products} products against {args.budget} credits "
+          f"in {elapsed * 1000:.0f} ms; spent {credits}")
+    describe("selected", selected, now)
+    describe("deferred", deferred, now)
+    print(f"  first deferred ids: {[c['product_id'] for c in deferred[:10]]}")
+
+
+if __name__ == "__main__":
+    main()
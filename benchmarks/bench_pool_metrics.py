@@ -0,0 +1,92 @@
+"""Checkout wait under bursty load for different pool sizes.
+
+``--threads`` request threads arrive in bursts and each holds a
+connection for ``--hold-ms`` (a query plus the request around it) on an
+instrumented SQLite pool. For each ``size+overflow`` configuration the
+run reports throughput and what the ``/metrics/db-pool`` surface would
+show: peak checked-out connections, checkout wait percentiles and
+timeouts. The goal is to pick the smallest pool whose p99 wait is flat.
+
+    python benchmarks/bench_pool_metrics.py --threads 64 --pools 5+10 20+10 40+10
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import _sqlite  # noqa: F401  sets the DB_* variables DB.database reads
+
+
+def run(path, pool_size, max_overflow, threads, requests, hold, burst_gap, timeout):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.exc import TimeoutError as PoolTimeout
+    from DB.pool import PoolMetrics, TimedQueuePool
+
+    engine = create_engine(
+        f"sqlite:///{path}", poolclass=TimedQueuePool, pool_size=pool_size,
+        max_overflow=max_overflow, pool_timeout=timeout, pool_pre_ping=True,
+        connect_args={"check_same_thread": False})
+    metrics = PoolMetrics(f"{pool_size}+{max_overflow}").attach(engine)
+    failed = 0
+    lock = threading.Lock()
+
+    def worker(seed):
+        nonlocal failed
+        rng = random.Random(seed)
+        for n in range(requests):
+            # Requests arrive together at the start of each burst
+            if n % 10 == 0:
+                time.sleep(burst_gap)
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                    time.sleep(hold * rng.uniform(0.5, 1.5))
+            except PoolTimeout:
+                with lock:
+                    failed += 1
+
+    started = time.perf_counter()
+    pool_threads = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool_threads:
+        thread.start()
+    for thread in pool_threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    snapshot = metrics.snapshot()
+    engine.dispose()
+    return threads * requests / elapsed, snapshot, failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--hold-ms", type=float, default=10)
+    parser.add_argument("--burst-gap-ms", type=float, default=50)
+    parser.add_argument("--timeout", type=float, default=2)
+    parser.add_argument("--pools", nargs="+", default=["5+10", "20+10", "40+10", "60+10"])
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_pool.db")
+    print(f"{args.threads} threads x {args.requests} requests, "
+          f"{args.hold_ms:g} ms held, bursts every {args.burst_gap_ms:g} ms")
+    for pool in args.pools:
+        pool_size, max_overflow = (int(part) for part in pool.split("+"))
+        rate, snapshot, failed = run(
+            path, pool_size, max_overflow, args.threads, args.requests,
+            args.hold_ms / 1000, args.burst_gap_ms / 1000, args.timeout)
+        wait = snapshot["checkout_wait_ms"]
+        print(f"pool {pool:6s}: {rate:6.0f} req/s, peak {snapshot['peak_checked_out']:3d} "
+              f"checked out, {snapshot['connects']:3d} connects, "
+              f"wait p50 <= {wait['p50']} ms, p99 <= {wait['p99']} ms, "
+              f"mean {wait['sum'] / max(1, wait['count']):.1f} ms, "
+              f"{snapshot['timeouts']} timeouts")
+        assert failed == snapshot["timeouts"]
+    if os.path.exists(path):
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
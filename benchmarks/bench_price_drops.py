@@ -0,0 +1,110 @@
+"""Price drop fan-out over a large cart table.
+
+Builds ``--users`` users with one cocart each and ``--entries`` cart
+entries spread over ``--products`` products in SQLite, then drops the
+price of ``--drops`` products and times ``notify_price_drops``: the
+joined lookup of affected carts, the dedupe check and the bulk INSERT.
+The same batch is then replayed to show it is deduplicated, and a
+per-product loop (one query per product, one ORM add per notification)
+is timed for comparison.
+
+    python benchmarks/bench_price_drops.py --entries 1000000 --drops 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+import _sqlite
+from _sqlite import sqlite_session
+
+
+def naive_notify(db, changes, Cocart, CocartProduct, Notification):
+    created = 0
+    for change in changes:
+        entries = (
+            db.query(CocartProduct, Cocart)
+            .join(Cocart, Cocart.id == CocartProduct.cocart_id)
+            .filter(CocartProduct.product_id == change["product_id"],
+                    CocartProduct.deleted_at.is_(None),
+                    CocartProduct.is_bought.is_(False))
+            .all()
+        )
+        for entry, cocart in entries:
+            db.add(Notification(user_id=cocart.user_id, cocart_id=cocart.id,
+                                product_id=change["product_id"], title="Price drop",
+                                type="price_drop", created_at=datetime.utcnow()))
+            created += 1
+    db.flush()
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--drops", type=int, default=500)
+    args = parser.parse_args()
+
+    from DB.models import Cocart, CocartProduct, Notification, Product, User
+    from monitoring.alerts import notify_price_drops
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_drops.db")
+    engine, Session = sqlite_session(path)
+    rng = random.Random(5)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "email": f"u{i}@example.com"} for i in range(1, args.users + 1)])
+        conn.execute(Cocart.__table__.insert(), [
+            {"id": i, "user_id": i, "type": 0, "name": "cart", "slug": f"c{i}",
+             "allow_vote": False, "allow_add_product": False, "allow_remove_product": False,
+             "mark_purchased_items": False, "is_read": False, "is_hide": False}
+            for i in range(1, args.users + 1)])
+        conn.execute(Product.__table__.insert(), [
+            {"id": i, "name": f"Product {i}", "slug": f"p{i}"}
+            for i in range(1, args.products + 1)])
+        rows = []
+        for i in range(1, args.entries + 1):
+            rows.append({"id": i, "cocart_id": rng.randrange(1, args.users + 1),
+                         "product_id": rng.randrange(1, args.products + 1),
+                         "is_bought": rng.random() < 0.1, "is_claimed": False})
+            if len(rows) == 100000:
+                conn.execute(CocartProduct.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(CocartProduct.__table__.insert(), rows)
+    print(f"built {args.entries:,} cart entries in {time.perf_counter() - started:.1f}s")
+
+    now = datetime(2026, 1, 1, 12)
+    changes = [
+        {"product_id": product_id, "ts": now, "old_price": 1000.0, "price": 899.0,
+         "original_price": 1200.0, "currency": "INR", "name": f"Product {product_id}"}
+        for product_id in rng.sample(range(1, args.products + 1), args.drops)
+    ]
+
+    db = Session()
+    for label in ("set-based", "set-based, replayed"):
+        started = time.perf_counter()
+        created = notify_price_drops(db, changes, now=now)
+        db.commit()
+        elapsed = time.perf_counter() - started
+        print(f"{label:20s}: {created:6,} notifications in {elapsed * 1000:7.1f} ms")
+
+    started = time.perf_counter()
+    created = naive_notify(db, changes, Cocart, CocartProduct, Notification)
+    elapsed = time.perf_counter() - started
+    db.rollback()
+    print(f"{'per-product loop':20s}: {created:6,} notifications in {elapsed * 1000:7.1f} ms "
+          f"(no dedupe)")
+
+    db.close()
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
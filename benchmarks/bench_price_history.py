@@ -0,0 +1,90 @@
+"""Price history ingest rate and query latency over a synthetic year.
+
+Appends ``--changes`` price changes spread over one year for each of
+``--products`` products through ``record_price_changes`` (one INSERT per
+``--batch`` changes) into SQLite, then times the query API for random
+products: 90-day min/max, last 10 points, and a weekly series for the
+year.
+
+    python benchmarks/bench_price_history.py --products 20000 --changes 100
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import _sqlite
+from _sqlite import sqlite_session
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--changes", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    from DB.models import Product
+    from monitoring.history import last_prices, price_series, price_stats, record_price_changes
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_history.db")
+    engine, Session = sqlite_session(path)
+    db = Session()
+    db.bulk_insert_mappings(Product, [
+        {"id": i, "name": "x", "slug": f"p{i}"} for i in range(1, args.products + 1)])
+    db.commit()
+
+    rng = random.Random(3)
+    end = datetime(2026, 1, 1)
+    start = end - timedelta(days=365)
+    step = 365 * 86400 // args.changes
+    # Scrape batches cover many products at the same moment
+    batch, total = [], args.products * args.changes
+    started = time.perf_counter()
+    for n in range(args.changes):
+        ts = start + timedelta(seconds=n * step)
+        for product_id in range(1, args.products + 1):
+            batch.append({"product_id": product_id, "ts": ts,
+                          "price": float(rng.randrange(200, 20000)),
+                          "original_price": None, "currency": "INR"})
+            if len(batch) >= args.batch:
+                record_price_changes(db, batch)
+                db.commit()
+                batch = []
+    record_price_changes(db, batch)
+    db.commit()
+    elapsed = time.perf_counter() - started
+    print(f"ingested {total:,} points in {elapsed:.1f}s ({total / elapsed:,.0f}/s), "
+          f"database {os.path.getsize(path) / 2**20:.0f} MiB")
+
+    ids = [rng.randrange(1, args.products + 1) for _ in range(args.queries)]
+    picks = iter(ids * 3)
+    for name, query in (
+        ("min/max 90 days", lambda: price_stats(db, next(picks), since=end - timedelta(days=90))),
+        ("last 10", lambda: last_prices(db, next(picks), 10)),
+        ("weekly series, 1 year", lambda: price_series(db, next(picks), start, end, timedelta(days=7))),
+    ):
+        p50, p99 = timed(query, args.queries)
+        print(f"{name:22s}: p50 {p50:6.2f} ms, p99 {p99:6.2f} ms")
+
+    db.close()
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
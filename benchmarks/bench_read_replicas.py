@@ -0,0 +1,172 @@
+"""Read-replica routing with SQLite files standing in for the servers.
+
+Seeds a primary file and copies it to two replicas. A third replica URL
+points at a directory that does not exist, so it fails its health check.
+Then, through an in-process app using ``get_read_db``, ``get_db`` and the
+``read_your_writes`` middleware, it:
+
+* counts which database served ``--reads`` GETs;
+* writes through the primary and reads it back, with the read-your-writes
+  cookie and without it (the copies never replicate, so a replica read
+  shows the write is missing);
+* times GETs while a writer thread keeps rewriting the primary, once
+  with reads pinned to the primary and once spread over the replicas.
+
+    python benchmarks/bench_read_replicas.py --reads 2000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import _sqlite
+
+DIR = tempfile.mkdtemp(prefix="cocarting_replicas_")
+PRIMARY = os.path.join(DIR, "primary.db")
+REPLICAS = [os.path.join(DIR, "replica1.db"), os.path.join(DIR, "replica2.db")]
+os.environ["DB_REPLICA_URLS"] = ",".join(
+    [f"sqlite:///{path}" for path in REPLICAS] + [f"sqlite:///{DIR}/missing/replica3.db"])
+os.environ.setdefault("DB_REPLICA_HEALTH_SECONDS", "1")
+
+
+def seed(cocarts, products_per_cart):
+    from DB.models import Cocart, CocartProduct, Product, User
+
+    engine, _ = _sqlite.sqlite_session(PRIMARY)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "email": "u@example.com"}])
+        conn.execute(Cocart.__table__.insert(), [
+            {"id": i, "user_id": 1, "type": 0, "name": "cart", "slug": f"c{i}",
+             "allow_vote": False, "allow_add_product": False, "allow_remove_product": False,
+             "mark_purchased_items": False, "is_read": False, "is_hide": False}
+            for i in range(1, cocarts + 1)])
+        conn.execute(Product.__table__.insert(), [
+            {"id": i, "name": f"Product {i}", "slug": f"p{i}", "price": 100.0}
+            for i in range(1, cocarts * products_per_cart + 1)])
+        conn.execute(CocartProduct.__table__.insert(), [
+            {"cocart_id": (i - 1) // products_per_cart + 1, "product_id": i,
+             "is_bought": False, "is_claimed": False}
+            for i in range(1, cocarts * products_per_cart + 1)])
+    engine.dispose()
+    for path in REPLICAS:
+        shutil.copy(PRIMARY, path)
+
+
+def build_app():
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import Session
+    import DB.database as database
+    from DB.models import CocartProduct, Product
+
+    # Point the primary at the local file
+    primary = create_engine(f"sqlite:///{PRIMARY}", connect_args={"timeout": 30})
+    database.engine = primary
+    database.SessionLocal.configure(bind=primary)
+
+    served = Counter()
+    engines = [("primary", primary)] + [(r.name, r.engine) for r in database.replicas.replicas]
+    for name, engine in engines:
+        event.listen(engine, "before_cursor_execute",
+                     lambda *args, name=name: served.update([name]))
+
+    app = FastAPI()
+    app.middleware("http")(database.read_your_writes)
+
+    @app.get("/cocarts/{cocart_id}/products")
+    def get_cocart_products(cocart_id: int, db: Session = Depends(database.get_read_db)):
+        return [{"id": product.id, "price": product.price} for product in (
+            db.query(Product)
+            .join(CocartProduct, CocartProduct.product_id == Product.id)
+            .filter(CocartProduct.cocart_id == cocart_id))]
+
+    @app.post("/cocarts/{cocart_id}/products/{product_id}")
+    def add_product(cocart_id: int, product_id: int, db: Session = Depends(database.get_db)):
+        db.add(CocartProduct(cocart_id=cocart_id, product_id=product_id))
+        db.commit()
+        return {"ok": True}
+
+    return app, database, primary, served
+
+
+async def timed_reads(app, reads, concurrency, cocarts, cookies=None):
+    import httpx
+
+    latencies, errors = [], 0
+    paths = iter(f"/cocarts/{n % cocarts + 1}/products" for n in range(reads))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                 base_url="http://bench", cookies=cookies) as client:
+        async def worker():
+            nonlocal errors
+            for path in paths:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return (reads / elapsed, statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99) - 1] * 1000, errors)
+
+
+def write_storm(primary, stop):
+    from sqlalchemy import text
+
+    while not stop.is_set():
+        with primary.begin() as conn:
+            conn.execute(text("UPDATE products SET price = price + 1"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cocarts", type=int, default=500)
+    parser.add_argument("--products-per-cart", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    seed(args.cocarts, args.products_per_cart)
+    app, database, primary, served = build_app()
+    from fastapi.testclient import TestClient
+
+    database.replicas.start()
+    print("replicas:", [(r["name"], r["healthy"]) for r in database.replicas.status()])
+
+    rate, p50, p99, errors = asyncio.run(
+        timed_reads(app, args.reads, args.concurrency, args.cocarts))
+    print(f"{args.reads} reads, statements per database: {dict(served)}, {errors} errors")
+
+    with TestClient(app) as client:
+        client.post(f"/cocarts/1/products/{args.cocarts * args.products_per_cart}")
+        with_cookie = len(client.get("/cocarts/1/products").json())
+    with TestClient(app) as client:
+        without_cookie = len(client.get("/cocarts/1/products").json())
+    print(f"after a write: {with_cookie} products with the read-your-writes cookie "
+          f"(primary), {without_cookie} without it (replica)")
+
+    stop = threading.Event()
+    writer = threading.Thread(target=write_storm, args=(primary, stop))
+    writer.start()
+    try:
+        pinned = {database.READ_PRIMARY_COOKIE: str(time.time() + 3600)}
+        for label, cookies in (("primary", pinned), ("replicas", None)):
+            rate, p50, p99, errors = asyncio.run(
+                timed_reads(app, args.reads, args.concurrency, args.cocarts, cookies))
+            print(f"reads on {label:8s} during a write storm: {rate:6.0f} req/s, "
+                  f"p50 {p50:7.1f} ms, p99 {p99:7.1f} ms, {errors} errors")
+    finally:
+        stop.set()
+        writer.join()
+    shutil.rmtree(DIR)
+
+
+if __name__ == "__main__":
+    main()
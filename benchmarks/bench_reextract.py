@@ -0,0 +1,74 @@
+"""Snapshot store size and offline re-extraction throughput.
+
+Saves ``--products`` distinct pages (the fixtures with a per-product
+marker) into a fresh SnapshotStore, reports save rate and compression,
+then runs reextract.py's ``reextract`` against a SQLite catalog with
+1..N pool workers and projects the time for 100k products.
+
+    python benchmarks/bench_reextract.py --products 500 --workers 1,2
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import _sqlite
+from _sqlite import sqlite_session
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--workers", default="1,2")
+    args = parser.parse_args()
+
+    from DB.models import Product, ProductImage
+    from monitoring.snapshots import SnapshotStore
+    from reextract import reextract
+
+    pages = {
+        "https://www.amazon.in/dp/B{:09d}": open(os.path.join(FIXTURES, "amazon_product.html")).read(),
+        "https://www.flipkart.com/p/itm{:012d}": open(os.path.join(FIXTURES, "flipkart_product.html")).read(),
+    }
+    tmp = tempfile.mkdtemp(prefix="cocarting_snapshots_")
+    store = SnapshotStore(os.path.join(tmp, "store"))
+    engine, Session = sqlite_session(os.path.join(tmp, "catalog.db"))
+    db = Session()
+    products = []
+    started = time.perf_counter()
+    for i in range(1, args.products + 1):
+        url_format, page = list(pages.items())[i % 2]
+        url = url_format.format(i)
+        # A visible marker so every product has its own page digest
+        store.save(i, url, page.replace("</body>", f"<span>{i}</span></body>"))
+        products.append({"id": i, "name": "x", "slug": url, "product_tracking_url": url})
+    store.commit()
+    elapsed = time.perf_counter() - started
+    stats = store.stats()
+    print(f"saved {args.products} snapshots in {elapsed:.2f}s "
+          f"({args.products / elapsed:.0f}/s), {stats['bytes'] / 2**20:.1f} MiB -> "
+          f"{stats['stored_bytes'] / 2**20:.1f} MiB "
+          f"({stats['bytes'] / stats['stored_bytes']:.1f}x)")
+    db.bulk_insert_mappings(Product, products)
+    db.bulk_insert_mappings(ProductImage, [{"product_id": p["id"], "image": "x"} for p in products])
+    db.commit()
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        started = time.perf_counter()
+        summary = reextract(db, store, workers=workers, batch_size=200, dry_run=True)
+        elapsed = time.perf_counter() - started
+        rate = summary["products"] / elapsed
+        print(f"{workers} worker(s): {rate:6.1f} products/s, "
+              f"100k products in {100_000 / rate / 60:.1f} min")
+
+    store.close()
+    db.close()
+    engine.dispose()
+    shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Products scraped per second: legacy sequential loop vs ScrapeEngine.
+
+Serves a saved Amazon page from a local stub standing in for ScraperAPI,
+with an artificial per-request latency, and scrapes the same synthetic
+catalog both ways. Nothing is written to a database.
+
+    python benchmarks/bench_scrape_engine.py --products 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import requests
+from aiohttp import web
+
+import _sqlite  # noqa: E402,F401  repo on sys.path, DB settings for the imports
+import BackgroundMonitoring  # noqa: E402
+from BackgroundMonitoring import scrape_product_data  # noqa: E402
+from monitoring.engine import ScrapeEngine  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "amazon_product.html")
+
+
+def start_stub_server(latency):
+    with open(FIXTURE, encoding="utf-8") as f:
+        page_html = f.read()
+
+    async def handler(request):
+        await asyncio.sleep(latency)
+        return web.Response(text=page_html, content_type="text/html")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.SockSite(runner, sock).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{port}/"
+
+
+def catalog(size):
+    return [(i, f"https://www.amazon.in/dp/B0{i:08d}") for i in range(size)]
+
+
+async def legacy_loop(api_url, products):
+    # Mirrors the pre-engine `scrape`: one blocking GET at a time
+    for product_id, product_url in products:
+        response = requests.get(api_url, params={"api_key": "x", "url": product_url})
+        await scrape_product_data(response.text, product_url)
+
+
+async def engine_run(api_url, products, concurrency, per_host):
+    async def handle(product_id, product_url, status, page_html):
+        await scrape_product_data(page_html, product_url, engine.session)
+
+    async with ScrapeEngine(api_key="x", api_url=api_url,
+                            concurrency=concurrency, per_host=per_host) as engine:
+        return await engine.run(products, handle)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--per-host", type=int, default=50)
+    parser.add_argument("--executor", choices=["inline", "process"], default="inline",
+                        help="where the engine run parses pages")
+    args = parser.parse_args()
+
+    api_url = start_stub_server(args.latency)
+    products = catalog(args.products)
+
+    started = time.perf_counter()
+    asyncio.run(legacy_loop(api_url, products))
+    legacy = time.perf_counter() - started
+
+    BackgroundMonitoring.SCRAPE_EXTRACT_EXECUTOR = args.executor
+    started = time.perf_counter()
+    summary = asyncio.run(engine_run(api_url, products,
+                                     args.concurrency, args.per_host))
+    concurrent = time.perf_counter() - started
+    BackgroundMonitoring.shutdown_extract_pool()
+
+    print(f"products: {args.products}, stub latency: {args.latency}s")
+    print(f"legacy loop : {args.products / legacy:8.1f} products/s ({legacy:.2f}s)")
+    # Only fetched products count; deferred ones were never scraped
+    print(f"engine      : {summary['fetched'] / concurrent:8.1f} products/s ({concurrent:.2f}s), "
+          f"concurrency={args.concurrency} per_host={args.per_host}, "
+          f"executor={args.executor}, fetched={summary['fetched']}, "
+          f"deferred={summary['deferred']}, failed={summary['failed']}")
+
+
+if __name__ == "__main__":
+    main()
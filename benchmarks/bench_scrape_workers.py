@@ -0,0 +1,155 @@
+"""Throughput of 1..N scrape_worker processes sharing one database.
+
+Seeds a SQLite catalog whose products are all due, starts a stub
+ScraperAPI server that counts requests per product URL, then runs the
+workers with ``--once`` until the catalog is drained. Reports products/s
+per worker count and any product fetched more than once. A last run
+gives the workers a credit budget that paces them to ``--paced-allowance``
+credits per window, shared by all of them, and checks that what they
+spent stays within the allowance of the windows the run spanned.
+
+    python benchmarks/bench_scrape_workers.py --products 300 --workers 1,2,4
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from aiohttp import web
+import _sqlite
+from _sqlite import concurrent_sqlite_engine, sqlite_session
+
+PAGE = """<html><body><span id="productTitle">Stub product</span>
+<span class="a-price"><span class="a-price-whole">1,299</span></span>
+<span id="acrPopover" title="4.2 out of 5 stars"></span></body></html>"""
+
+
+def start_stub_server(latency, hits):
+    async def handler(request):
+        hits[request.query["url"]] += 1
+        await asyncio.sleep(latency)
+        return web.Response(text=PAGE, content_type="text/html")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.SockSite(runner, sock).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{port}/"
+
+
+def seed(path, size):
+    from DB.models import Product, ProductImage, ProductScrapeState
+
+    engine, Session = sqlite_session(path)
+    db = Session()
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(Product, [
+        {"id": i, "name": "x", "slug": f"p{i}",
+         "product_tracking_url": f"https://www.amazon.in/dp/B{i:09d}"}
+        for i in range(1, size + 1)])
+    db.bulk_insert_mappings(ProductImage, [
+        {"product_id": i, "image": "x"} for i in range(1, size + 1)])
+    db.bulk_insert_mappings(ProductScrapeState, [
+        {"product_id": i, "next_check_at": now, "change_rate": 0.5}
+        for i in range(1, size + 1)])
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def worker(path, batch_size):
+    import DB.database as database
+    from scrape_worker import run_worker
+
+    database.SessionLocal.configure(bind=concurrent_sqlite_engine(path))
+    asyncio.run(run_worker(batch_size, poll_seconds=0.1, once=True))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--per-worker-concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--paced-allowance", type=int, default=40)
+    parser.add_argument("--worker", metavar="DB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.batch_size)
+        return
+
+    hits = Counter()
+    api_url = start_stub_server(args.latency, hits)
+    env = dict(os.environ, SCRAPER_API_URL=api_url, SCRAPER_API="bench",
+               SCRAPE_CONCURRENCY=str(args.per_worker_concurrency),
+               SCRAPE_PER_HOST_CONCURRENCY=str(args.per_worker_concurrency),
+               SCRAPER_API_CREDITS_PER_PERIOD=str(10 ** 12))
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_workers.db")
+
+    def run(count, env):
+        seed(path, args.products)
+        hits.clear()
+        started = time.perf_counter()
+        procs = [subprocess.Popen(
+            [sys.executable, __file__, "--worker", path,
+             "--batch-size", str(args.batch_size)],
+            env=env, stdout=subprocess.DEVNULL, cwd=os.path.dirname(_sqlite.__file__))
+            for _ in range(count)]
+        for proc in procs:
+            proc.wait()
+        return time.perf_counter() - started
+
+    baseline = None
+    counts = [int(c) for c in args.workers.split(",")]
+    for count in counts:
+        elapsed = run(count, env)
+        rate = sum(hits.values()) / elapsed
+        baseline = baseline or rate
+        duplicates = sum(1 for n in hits.values() if n > 1)
+        print(f"{count} worker(s): {rate:7.1f} products/s ({elapsed:.2f}s), "
+              f"scaling {rate / baseline:4.2f}x, fetched {len(hits)}/{args.products}, "
+              f"double-fetched {duplicates}")
+
+    from monitoring.planner import current_period
+    from scrape_worker import SCRAPE_WORKER_TICK_SECONDS
+
+    # Credits that leave exactly the allowance per window for the rest of the period
+    now = datetime.utcnow()
+    ticks_left = -(-(current_period(now)[1] - now).total_seconds() // SCRAPE_WORKER_TICK_SECONDS)
+    paced = dict(env, SCRAPER_API_CREDITS_PER_PERIOD=str(int(args.paced_allowance * ticks_left)))
+    first_window = int(time.time() // SCRAPE_WORKER_TICK_SECONDS)
+    run(counts[-1], paced)
+    windows = int(time.time() // SCRAPE_WORKER_TICK_SECONDS) - first_window + 1
+    cap = args.paced_allowance * windows
+    spent = sum(hits.values())
+    print(f"{counts[-1]} worker(s) sharing {args.paced_allowance} credits per "
+          f"{SCRAPE_WORKER_TICK_SECONDS}s window: spent {spent} credits over {windows} "
+          f"window(s), cap {cap}, {'within' if spent <= cap else 'OVER'} the cap")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Upstream requests saved by single-flight fetch coalescing.
+
+A stub ScraperAPI counts requests per URL. Fires bursts of fetches where
+each of ``--urls`` pages is requested ``--copies`` times at once (with
+tracking-parameter variants), then a second burst right after, with
+coalescing off and on. ``--processes`` engines in separate processes then
+fetch the same list with the cross-process lease mode on SQLite.
+
+    python benchmarks/bench_singleflight.py --urls 50 --copies 10 --processes 2
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from aiohttp import web
+import _sqlite
+from _sqlite import concurrent_sqlite_engine, sqlite_session
+
+
+def start_stub_server(latency, hits):
+    async def handler(request):
+        hits[request.query["url"].split("?")[0]] += 1
+        await asyncio.sleep(latency)
+        return web.Response(text="<html>page</html>", content_type="text/html")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    ready = threading.Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app, access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.SockSite(runner, sock).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{port}/"
+
+
+class NoFlight:
+    async def do(self, key, fn, cache_if=None):
+        return await fn()
+
+
+def burst(urls, copies):
+    # Copies are the same product linked with different tracking parameters
+    return [(i, f"https://www.amazon.in/dp/B{i:09d}?ref=share_{n}")
+            for n in range(copies) for i in range(urls)]
+
+
+async def fetch_all(api_url, products, flights, shared=False):
+    from monitoring.engine import ScrapeEngine
+    from monitoring.throttle import HostThrottles
+
+    unlimited = 10 ** 9
+    throttles = HostThrottles(rate=unlimited, max_rate=unlimited, burst=unlimited)
+    async with ScrapeEngine(api_key="bench", api_url=api_url, concurrency=50,
+                            per_host=50, throttles=throttles, flights=flights,
+                            shared=shared) as engine:
+        summary = await engine.run(products, lambda *args: asyncio.sleep(0))
+    return summary
+
+
+def worker(path, api_url, urls):
+    import DB.database as database
+    from monitoring.singleflight import SingleFlight
+
+    database.SessionLocal.configure(bind=concurrent_sqlite_engine(path))
+    summary = asyncio.run(fetch_all(api_url, burst(urls, 1), SingleFlight(), shared=True))
+    print(summary["fetched"], summary["deferred"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=50)
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--worker", nargs=2, metavar=("DB", "API"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], args.worker[1], args.urls)
+        return
+
+    from monitoring.singleflight import SingleFlight
+
+    hits = Counter()
+    api_url = start_stub_server(args.latency, hits)
+    products = burst(args.urls, args.copies)
+    for name, flights in (("no coalescing", NoFlight()), ("single-flight", SingleFlight())):
+        for wave in ("burst", "burst again"):
+            hits.clear()
+            started = time.perf_counter()
+            asyncio.run(fetch_all(api_url, products, flights))
+            print(f"{name:13s} {wave:11s}: {len(products)} fetches -> "
+                  f"{sum(hits.values()):4d} upstream requests in "
+                  f"{time.perf_counter() - started:.2f}s")
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_singleflight.db")
+    engine, _ = sqlite_session(path)
+    engine.dispose()
+    hits.clear()
+    procs = [subprocess.Popen(
+        [sys.executable, __file__, "--urls", str(args.urls), "--worker", path, api_url],
+        stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(_sqlite.__file__))
+        for _ in range(args.processes)]
+    results = [proc.communicate()[0].split() for proc in procs]
+    print(f"{args.processes} processes, shared leases: {args.processes * args.urls} fetches -> "
+          f"{sum(hits.values())} upstream requests, (fetched, skipped) per process {results}")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
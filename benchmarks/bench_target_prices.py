@@ -0,0 +1,103 @@
+"""Target price evaluation cost against the number of watches.
+
+Fills SQLite with cart entries carrying a target price in steps up to
+``--watches`` and, at each step, times ``triggered_watches`` for write
+batches of ``--changed`` products whose price just fell. For comparison
+it also times a scan that checks every watch in Python, which is what
+evaluating watches one by one amounts to.
+
+    python benchmarks/bench_target_prices.py --watches 5000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import _sqlite
+from _sqlite import sqlite_session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--watches", type=int, default=5000000)
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--changed", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    from sqlalchemy import func
+    from DB.models import Cocart, CocartProduct, Product, User
+    from monitoring.alerts import triggered_watches
+
+    path = os.path.join(tempfile.gettempdir(), "cocarting_bench_watches.db")
+    engine, Session = sqlite_session(path)
+    rng = random.Random(11)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "email": f"u{i}@example.com"} for i in range(1, args.users + 1)])
+        conn.execute(Cocart.__table__.insert(), [
+            {"id": i, "user_id": i, "type": 0, "name": "cart", "slug": f"c{i}",
+             "allow_vote": False, "allow_add_product": False, "allow_remove_product": False,
+             "mark_purchased_items": False, "is_read": False, "is_hide": False}
+            for i in range(1, args.users + 1)])
+        conn.execute(Product.__table__.insert(), [
+            {"id": i, "name": f"Product {i}", "slug": f"p{i}", "price": 1000.0}
+            for i in range(1, args.products + 1)])
+
+    db = Session()
+    # Compile the query and warm the connection before timing
+    triggered_watches(db, [{"product_id": 1, "old_price": 1000.0, "price": 800.0}])
+    db.rollback()
+    inserted = 0
+    sizes = [args.watches * (step + 1) // args.steps for step in range(args.steps)]
+    for size in sizes:
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            while inserted < size:
+                rows = [
+                    {"id": inserted + n + 1, "cocart_id": rng.randrange(1, args.users + 1),
+                     "product_id": rng.randrange(1, args.products + 1),
+                     "target_price": float(rng.randrange(500, 1000)),
+                     "is_bought": False, "is_claimed": False}
+                    for n in range(min(100000, size - inserted))
+                ]
+                conn.execute(CocartProduct.__table__.insert(), rows)
+                inserted += len(rows)
+        print(f"{inserted:,} watches (+{time.perf_counter() - started:.0f}s to insert)")
+
+        for changed in args.changed:
+            changes = [
+                {"product_id": product_id, "old_price": 1000.0, "price": 800.0}
+                for product_id in rng.sample(range(1, args.products + 1), changed)
+            ]
+            started = time.perf_counter()
+            triggered = triggered_watches(db, changes)
+            elapsed = time.perf_counter() - started
+            db.rollback()
+            print(f"  {changed:5d} products changed: {len(triggered):6,} triggered "
+                  f"in {elapsed * 1000:8.1f} ms")
+
+        started = time.perf_counter()
+        prices = {change["product_id"]: change for change in changes}
+        matched = sum(
+            1 for product_id, target_price in db.query(
+                CocartProduct.product_id, CocartProduct.target_price)
+            .filter(CocartProduct.target_price.isnot(None))
+            if product_id in prices and prices[product_id]["price"] <= target_price
+            < prices[product_id]["old_price"]
+        )
+        elapsed = time.perf_counter() - started
+        db.rollback()
+        print(f"  scan of every watch for {changed} products: {matched:,} matched "
+              f"in {elapsed * 1000:8.1f} ms")
+
+    assert db.query(func.count(CocartProduct.id)).scalar() == inserted
+    db.close()
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
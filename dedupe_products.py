@@ -0,0 +1,251 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import bindparam, column, delete, inspect, or_, select, table, tuple_, update
+
+from DB.database import SessionLocal
+from DB.models import (
+    CocartProduct, Notification, PriceHistory, Product, ProductImage, ProductScrapeState)
+from monitoring.catalog import chunked, iter_product_chunks
+from monitoring.schedule import backfill_scrape_states
+from monitoring.urls import canonical_url, url_hash
+
+_cart_entries = CocartProduct.__table__
+
+# Laravel tables that reference products.id with ON DELETE CASCADE; every
+# row has to follow its product to the survivor before the copy is deleted
+_votes = [
+    table(name, column("id"), column("product_id"), column("cocart_product_id"),
+          column("user_id"), column("deleted_at"))
+    for name in ("cocart_product_upvotes", "cocart_product_downvotes")
+]
+_favorites = table("product_favorites", column("id"), column("product_id"),
+                   column("user_id"), column("cocart_id"), column("deleted_at"))
+_compare = table("compare", column("id"), column("product_id"), column("user_id"))
+# Rows that can't collide: a product may have any number of them
+_plain_references = [
+    table("product_reviews", column("product_id")),
+    table("cocart_messages", column("product_id")),
+    Notification.__table__,
+]
+
+
+def _repoint(db, references, pairs, name="product_id"):
+    db.execute(
+        update(references)
+        .where(references.c[name] == bindparam("b_duplicate_id"))
+        .values({name: bindparam("b_product_id")}),
+        pairs,
+    )
+
+
+def _collisions(rows, key, moved):
+    """Return ``{dropped_id: kept_id}`` for rows that share ``key`` once moved.
+
+    Only groups a moved row joins are merged. The kept row is a live one
+    if there is any, preferring rows already on the survivor.
+    """
+    groups = defaultdict(list)
+    for row in rows:
+        groups[key(row)].append(row)
+    dropped = {}
+    for group in groups.values():
+        if len(group) > 1 and any(moved(row) for row in group):
+            group.sort(key=lambda row: (row._mapping.get("deleted_at") is not None,
+                                        moved(row), row.id))
+            for row in group[1:]:
+                dropped[row.id] = group[0].id
+    return dropped
+
+
+def _delete_rows(db, references, ids):
+    if ids:
+        db.execute(delete(references).where(references.c.id.in_(list(ids))))
+
+
+def _merge_cart_entries(db, duplicates, product_ids):
+    """Fold cart entries that would hold the same product twice into one.
+
+    The kept entry takes the lowest target price and any bought/claimed
+    flag or note of the others. Returns ``{dropped_id: kept_id}``.
+    """
+    rows = db.execute(select(_cart_entries).where(
+        _cart_entries.c.product_id.in_(product_ids))).all()
+    dropped = _collisions(
+        rows, lambda row: (row.cocart_id, duplicates.get(row.product_id, row.product_id)),
+        lambda row: row.product_id in duplicates)
+    by_id = {row.id: row for row in rows}
+    merged = {}
+    for dropped_id, kept_id in dropped.items():
+        row = by_id[dropped_id]
+        kept = merged.setdefault(kept_id, dict(by_id[kept_id]._mapping))
+        targets = [price for price in (kept["target_price"], row.target_price) if price is not None]
+        kept["target_price"] = min(targets) if targets else None
+        kept["is_bought"] = kept["is_bought"] or row.is_bought
+        kept["is_claimed"] = kept["is_claimed"] or row.is_claimed
+        kept["note"] = kept["note"] or row.note
+    if merged:
+        db.execute(update(CocartProduct), [
+            {key: entry[key] for key in ("id", "target_price", "is_bought", "is_claimed", "note")}
+            for entry in merged.values()
+        ])
+    return dropped
+
+
+def _merge_votes(db, votes, duplicates, product_ids, entries):
+    # Votes follow both their product and their (possibly folded) cart entry
+    rows = db.execute(select(votes).where(or_(
+        votes.c.product_id.in_(product_ids),
+        votes.c.cocart_product_id.in_(list(entries))))).all()
+    _delete_rows(db, votes, _collisions(
+        rows,
+        lambda row: (row.user_id, entries.get(row.cocart_product_id, row.cocart_product_id),
+                     duplicates.get(row.product_id, row.product_id)),
+        lambda row: row.product_id in duplicates or row.cocart_product_id in entries))
+    if entries:
+        _repoint(db, votes, [{"b_duplicate_id": dropped_id, "b_product_id": kept_id}
+                             for dropped_id, kept_id in entries.items()],
+                 name="cocart_product_id")
+
+
+def _merge_rows(db, references, key, duplicates, product_ids):
+    rows = db.execute(select(references).where(
+        references.c.product_id.in_(product_ids))).all()
+    _delete_rows(db, references, _collisions(
+        rows,
+        lambda row: (duplicates.get(row.product_id, row.product_id),)
+        + tuple(row._mapping[name] for name in key),
+        lambda row: row.product_id in duplicates))
+
+
+def _merge_price_history(db, duplicates, product_ids):
+    # The survivor's own point wins over a copy's at the same instant
+    history = PriceHistory.__table__
+    rows = db.execute(select(history.c.product_id, history.c.ts).where(
+        history.c.product_id.in_(product_ids))).all()
+    seen, dropped = set(), []
+    for product_id, ts in sorted(rows, key=lambda row: row.product_id in duplicates):
+        point = (duplicates.get(product_id, product_id), ts)
+        if point in seen:
+            dropped.append((product_id, ts))
+        else:
+            seen.add(point)
+    if dropped:
+        db.execute(delete(history).where(
+            tuple_(history.c.product_id, history.c.ts).in_(dropped)))
+
+
+def find_duplicates(db):
+    """Group the catalog by canonical URL hash.
+
+    Returns ``(canonical, duplicates)``: ``canonical`` maps each surviving
+    product id (the oldest of its group) to its canonical URL and
+    ``duplicates`` maps every other id to its survivor.
+    """
+    survivors = {}
+    canonical = {}
+    duplicates = {}
+    for chunk in iter_product_chunks(db):
+        for product_id, product_url in chunk:
+            canonical_value = canonical_url(product_url)
+            canonical_hash = url_hash(canonical_value)
+            if not canonical_hash:
+                continue
+            survivor = survivors.setdefault(canonical_hash, product_id)
+            if survivor == product_id:
+                canonical[product_id] = canonical_value
+            else:
+                duplicates[product_id] = survivor
+    db.commit()
+    return canonical, duplicates
+
+
+def merge_duplicates(db, duplicates, batch_size=500):
+    """Move everything that references a copy onto its survivor, then delete the copies.
+
+    Rows are re-pointed before any product is deleted, since the foreign
+    keys cascade. Rows that would then repeat (two entries for the same
+    product in one cart, a user's second favorite or vote for it, price
+    points at the same instant) are merged into one. Images and scrape
+    state belong to the scraper and are dropped with the copy. Each batch
+    commits on its own, so an interrupted run can simply be started again.
+    """
+    present = set(inspect(db.get_bind()).get_table_names())
+    votes = [references for references in _votes if references.name in present]
+    keyed = [(references, key) for references, key in
+             ((_favorites, ("user_id", "cocart_id")), (_compare, ("user_id",)))
+             if references.name in present]
+    plain = [references for references in _plain_references if references.name in present]
+
+    merged = 0
+    for batch in chunked(list(duplicates.items()), batch_size):
+        batch_duplicates = dict(batch)
+        duplicate_ids = list(batch_duplicates)
+        product_ids = duplicate_ids + list(set(batch_duplicates.values()))
+        pairs = [{"b_duplicate_id": duplicate_id, "b_product_id": product_id}
+                 for duplicate_id, product_id in batch]
+
+        entries = _merge_cart_entries(db, batch_duplicates, product_ids)
+        for references in votes:
+            _merge_votes(db, references, batch_duplicates, product_ids, entries)
+            _repoint(db, references, pairs)
+        _delete_rows(db, _cart_entries, entries)
+        _repoint(db, _cart_entries, pairs)
+        for references, key in keyed:
+            _merge_rows(db, references, key, batch_duplicates, product_ids)
+            _repoint(db, references, pairs)
+        if PriceHistory.__tablename__ in present:
+            _merge_price_history(db, batch_duplicates, product_ids)
+            _repoint(db, PriceHistory.__table__, pairs)
+        for references in plain:
+            _repoint(db, references, pairs)
+
+        for model, column in ((ProductImage, ProductImage.product_id),
+                              (ProductScrapeState, ProductScrapeState.product_id),
+                              (Product, Product.id)):
+            db.execute(delete(model).where(column.in_(duplicate_ids)))
+        db.commit()
+        merged += len(batch)
+        print(f"Merged {merged}/{len(duplicates)} duplicate products")
+
+
+def backfill_canonical_urls(db, canonical, batch_size=500):
+    for batch in chunked(list(canonical.items()), batch_size):
+        db.execute(update(Product), [
+            {"id": product_id, "canonical_url": value, "canonical_url_hash": url_hash(value)}
+            for product_id, value in batch
+        ])
+        db.commit()
+
+
+def dedupe_products(db, batch_size=500, dry_run=False):
+    canonical, duplicates = find_duplicates(db)
+    groups = defaultdict(int)
+    for product_id in duplicates.values():
+        groups[product_id] += 1
+    total = len(canonical) + len(duplicates)
+    print(f"{total} products, {len(duplicates)} duplicates of {len(groups)} products "
+          f"({len(duplicates) / total if total else 0:.1%} of scrape fetches)")
+    if dry_run:
+        return canonical, duplicates
+    merge_duplicates(db, duplicates, batch_size)
+    backfill_canonical_urls(db, canonical, batch_size)
+    print(f"Canonical URLs set on {len(canonical)} products")
+    # Surviving products from before scrape states existed get theirs here
+    backfill_scrape_states(db)
+    return canonical, duplicates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge products that share a canonical URL and fill in canonical_url")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report how many duplicates there are")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        dedupe_products(db, args.batch_size, args.dry_run)
+    finally:
+        db.close()
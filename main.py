@@ -1,28 +1,55 @@
 from fastapi import FastAPI, Request, HTTPException, Depends, status, Body
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from datetime import datetime, timedelta
 from typing import List
 
-from DB.models import User, Cocart, Product, CocartProduct, ProductImage
+from DB.models import User, Cocart, Product, CocartProduct, ProductImage, ProductScrapeState
 from DB.schemas import (
     UserCreate, User as UserSchema,
     CocartCreate, Cocart as CocartSchema,
-    CocartProductCreate, UpdateProductBase
+    CocartProductCreate, CocartProduct as CocartProductSchema,
+    TargetPriceUpdate
 )
-from DB.database import engine, get_db, Base
-from sqlalchemy.orm import joinedload
-import requests
+from DB.database import (
+    engine, get_db, get_async_db, get_read_db, get_async_read_db,
+    dispose_async_engine, read_your_writes, replicas, Base
+)
+from DB.pool import pool_metrics_snapshot
 import os
-from BackgroundMonitoring import scrape_product_data
+from BackgroundMonitoring import shutdown_extract_pool
+from monitoring.catalog import chunked
+from monitoring.pipeline import scrape_products
+from monitoring.schedule import (
+    due_products, schedule_new_products, reschedule_products, retry_state)
+from monitoring.planner import load_candidates, plan_scrape, tick_budget
+from monitoring.claims import new_owner, claim_products, release_products, renew_leases
+from monitoring.leader import LeaderElection, SCHEDULER_HEARTBEAT_SECONDS
+from monitoring.jobs import scrape_jobs, get_job, cancel_job
+from monitoring.jobqueue import dispatch_many
+from monitoring.tasks import SCRAPE_QUEUE
+from monitoring import snapshots
+from monitoring.urls import canonical_url, url_hash
+from monitoring.history import last_prices, price_series, price_stats
 import asyncio
 from apscheduler.schedulers.background import BackgroundScheduler
 from api.admin.admin import admin_router
 
+SCRAPE_TICK_MINUTES = int(os.getenv("SCRAPE_TICK_MINUTES", "15"))
+# "inline" scrapes in the leader process, "queue" hands batches to queue_worker.py
+SCRAPE_DISPATCH = os.getenv("SCRAPE_DISPATCH", "inline")
+# Bounds of /products/{id}/price-history
+PRICE_HISTORY_MAX_DAYS = int(os.getenv("PRICE_HISTORY_MAX_DAYS", "730"))
+PRICE_HISTORY_MAX_BUCKETS = int(os.getenv("PRICE_HISTORY_MAX_BUCKETS", "1000"))
+PRICE_HISTORY_MAX_LAST = 100
+
 Base.metadata.create_all(bind=engine)
 app = FastAPI()
 app.include_router(admin_router)
+app.middleware("http")(read_your_writes)
 
 # CORS Middleware settings
 app.add_middleware(
@@ -39,12 +66,45 @@ def healthcheck(request: Request):
     return {
         "message": "Server is up and running",
         "domain": request.url.hostname,
+        "replicas": replicas.status(),
     }
 
 
+@app.get("/metrics/db-pool")
+def db_pool_metrics():
+    return pool_metrics_snapshot()
+
+
 async def monitor_product(db: Session):
-    print(f"Scraping data at {datetime.now()}")
-    await scrape(db)
+    print(f"Scraping due products at {datetime.now()}")
+    # Products the PHP app added since the last tick get a due state row
+    schedule_new_products(db)
+    budget = tick_budget(db, timedelta(minutes=SCRAPE_TICK_MINUTES))
+    candidates = load_candidates(db, due_products(db))
+    selected, deferred, credits = plan_scrape(candidates, budget)
+    if deferred:
+        print(f"Deferred {len(deferred)} products over the {budget} credit budget: "
+              f"{[candidate['product_id'] for candidate in deferred]}")
+    if SCRAPE_DISPATCH == "queue":
+        batches = chunked([c["product_id"] for c in selected])
+        queued = dispatch_many(db, "scrape_products",
+                               [{"product_ids": batch} for batch in batches],
+                               queue=SCRAPE_QUEUE)
+        # Hold queued products back like a failed check, so later ticks
+        # don't queue them again; the job sets their real next check
+        hold_until = retry_state()["next_check_at"]
+        reschedule_products(db, {c["product_id"]: hold_until for c in selected})
+        print(f"Queued {queued} scrape jobs for {len(selected)} products")
+        return
+    # Lease the selection so standalone scrape workers skip these products
+    owner = new_owner()
+    claimed = claim_products(db, owner, [c["product_id"] for c in selected])
+    renew = asyncio.create_task(renew_leases(db, owner))
+    try:
+        await scrape_products(db, chunked(claimed), budget=budget)
+    finally:
+        renew.cancel()
+        release_products(db, owner)
 
 
 def run_async_task():
@@ -52,60 +112,76 @@ def run_async_task():
     asyncio.run(monitor_product(db))
 
 
+# Every worker runs the scheduler, but only the elected leader runs jobs
+leader = LeaderElection()
+scheduler = BackgroundScheduler()
+
+
 def start_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(run_async_task, 'interval', days=7)
+    # Each product carries its own next_check_at; the tick only picks due ones
+    scheduler.add_job(leader.heartbeat, 'interval',
+                      seconds=SCHEDULER_HEARTBEAT_SECONDS,
+                      next_run_time=datetime.now())
+    scheduler.add_job(leader.leader_only(run_async_task, SCRAPE_TICK_MINUTES * 60),
+                      'interval', minutes=SCRAPE_TICK_MINUTES)
+    # Processes share the snapshot directory, so only the leader prunes it;
+    # hosts with their own disk run "reextract.py --prune" instead
+    if snapshots.snapshot_store is not None:
+        scheduler.add_job(leader.leader_only(snapshots.snapshot_store.prune, 6 * 3600),
+                          'interval', hours=6)
     scheduler.start()
 
 
 @app.on_event("startup")
 async def startup_event():
+    replicas.start()
     start_scheduler()
 
 
-def update_product(product_id: int, product: UpdateProductBase, db: Session):
-    try:
-        db.query(Product).filter_by(id=product_id).update(
-            {
-                "name": product.get("name"),
-                "original_price": product.get("original_price"),
-                "price": product.get("price"),
-                "customer_rating": product.get("customer_rating"),
-                "product_tracking_url": product.get("product_tracking_url"),
-                "slug": product.get("slug"),
-            }
-        )
+@app.on_event("shutdown")
+def shutdown_event():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    leader.resign()
+    shutdown_extract_pool()
+    if snapshots.snapshot_store is not None:
+        snapshots.snapshot_store.close()
 
-        if product.image:
-            db.query(ProductImage).filter_by(product_id=product_id).update(
-                {
-                    "image": product.image
-                }
-            )
 
-        db.commit()
-        return {"message": "Product updated successfully"}
-    except SQLAlchemyError as e:
-        db.rollback()
-        return {"error": str(e)}
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+
+@app.get("/monitor-product", status_code=status.HTTP_202_ACCEPTED)
+def scrape():
+    job_id, started = scrape_jobs.start(SCRAPE_QUEUE if SCRAPE_DISPATCH == "queue" else None)
+    return {
+        "message": "Scrape job started" if started else "Scrape job already running",
+        "job_id": job_id,
+    }
 
 
-@app.get("/monitor-product")
-async def scrape(db: Session = Depends(get_db)):
-    key = os.getenv("SCRAPER_API")
-    url = f"https://api.scraperapi.com?api_key={key}&url="
+@app.get("/monitor-product/jobs/{job_id}")
+def get_scrape_job(job_id: str, db: Session = Depends(get_db)):
+    job = get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Scrape job not found"
+        )
+    return job
 
-    products = db.query(Product).all()
-    for product in products:
-        product_url = product.product_tracking_url
-        product_id = product.id
-        response = requests.get(url + product_url)
-        product = await scrape_product_data(response.text, product_url)
-        print(product)
-        update_product(product_id, product, db)
-        print("Product data updated successfully for product_id: ", product_id)
 
-    return {"message": "Product data updated successfully"}
+@app.delete("/monitor-product/jobs/{job_id}")
+def cancel_scrape_job(job_id: str, db: Session = Depends(get_db)):
+    job = cancel_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Scrape job not found"
+        )
+    return {"message": "Scrape job cancellation requested", "job_id": job.id}
 
 
 # User Endpoints
@@ -134,7 +210,7 @@ def create_user(user_create: UserCreate, db: Session = Depends(get_db)):
 
 
 @app.get("/users/{user_id}", response_model=UserSchema)
-def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_read_db)):
     try:
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
@@ -182,19 +258,21 @@ def create_cocart(cocart_create: CocartCreate, db: Session = Depends(get_db)):
 
 
 @app.get("/cocarts/{user_id}", response_model=List[CocartSchema])
-def get_cocarts(user_id: int, db: Session = Depends(get_db)):
+async def get_cocarts(user_id: int, db: AsyncSession = Depends(get_async_read_db)):
     try:
-        cocarts = db.query(Cocart).filter(
-            Cocart.user_id == user_id).all()
-        return cocarts
+        result = await db.execute(
+            select(Cocart)
+            .options(selectinload(Cocart.products))
+            .filter(Cocart.user_id == user_id)
+        )
+        return result.scalars().all()
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-
 @app.delete("/cocarts/{cocart_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_cocart(cocart_id: int, db: Session = Depends(get_db)):
     try:
@@ -232,15 +310,17 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Product not found"
             )
+        # Products are shared between carts, so one still in a cart stays
+        in_carts = db.query(CocartProduct.id).filter(
+            CocartProduct.product_id == product_id).count()
+        if in_carts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Product is still in {in_carts} cart(s); remove it from them first"
+            )
         db.delete(product)
         db.commit()
 
-        cocart_product = db.query(CocartProduct).filter(
-            CocartProduct.product_id == product_id).first()
-        if cocart_product:
-            db.delete(cocart_product)
-            db.commit()
-
         return {"message": "Product deleted successfully"}
     except SQLAlchemyError as e:
         db.rollback()
@@ -249,61 +329,137 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
             detail=str(e)
         )
 
+@app.get("/products/{product_id}/price-history")
+def get_price_history(product_id: int, days: int = 90, bucket_hours: int = 24,
+                      last: int = 10, db: Session = Depends(get_read_db)):
+    if not 1 <= days <= PRICE_HISTORY_MAX_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"days must be between 1 and {PRICE_HISTORY_MAX_DAYS}"
+        )
+    if bucket_hours < 1 or days * 24 / bucket_hours > PRICE_HISTORY_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"bucket_hours must be at least 1 and give at most "
+                   f"{PRICE_HISTORY_MAX_BUCKETS} buckets"
+        )
+    if not 0 <= last <= PRICE_HISTORY_MAX_LAST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"last must be between 0 and {PRICE_HISTORY_MAX_LAST}"
+        )
+    try:
+        product = db.query(Product.id).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
+        end = datetime.utcnow()
+        start = end - timedelta(days=days)
+        return {
+            "product_id": product_id,
+            "stats": price_stats(db, product_id, since=start),
+            "last": [{"ts": ts, "price": price}
+                     for ts, price in last_prices(db, product_id, last)],
+            "series": price_series(db, product_id, start, end,
+                                   timedelta(hours=bucket_hours)),
+        }
+    except SQLAlchemyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
 # CocartProduct Endpoints
 
 @app.post("/cocart-products", status_code=status.HTTP_201_CREATED)
-def add_product_to_cocart(
+async def add_product_to_cocart(
     cocart_product_create: CocartProductCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         print("cocart_product_create", cocart_product_create)
-        cocart = db.query(Cocart).filter(
-            Cocart.id == cocart_product_create.cocart_id).first()
-        if not cocart:
+        cocart_id = await db.scalar(select(Cocart.id).filter(
+            Cocart.id == cocart_product_create.cocart_id))
+        if not cocart_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Cocart not found"
             )
         
-        new_product = Product(
-            name=cocart_product_create.product.name,
-            original_price=cocart_product_create.product.original_price,
-            price=cocart_product_create.product.price,
-            slug=cocart_product_create.product.slug,
-            added_by=cocart_product_create.product.added_by,
-            customer_rating=cocart_product_create.product.customer_rating,
-            product_tracking_url=cocart_product_create.product.product_tracking_url
-        )
+        # Every link to the same item resolves to one shared product row
+        canonical = canonical_url(cocart_product_create.product.product_tracking_url)
+        canonical_hash = url_hash(canonical)
+        product = None
+        if canonical_hash:
+            product = await db.scalar(select(Product).filter(
+                Product.canonical_url_hash == canonical_hash))
 
-        if not new_product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Product not found"
+        if not product:
+            # The product, its image and scrape state and the cart entry are
+            # flushed in dependency order and committed together
+            product = Product(
+                name=cocart_product_create.product.name,
+                original_price=cocart_product_create.product.original_price,
+                price=cocart_product_create.product.price,
+                slug=cocart_product_create.product.slug,
+                added_by=cocart_product_create.product.added_by,
+                customer_rating=cocart_product_create.product.customer_rating,
+                product_tracking_url=cocart_product_create.product.product_tracking_url,
+                canonical_url=canonical,
+                canonical_url_hash=canonical_hash,
+                product_images=[ProductImage(image=cocart_product_create.product.image)],
+                scrape_state=ProductScrapeState(next_check_at=datetime.utcnow())
             )
 
-        db.add(new_product)
-        db.commit()
-        db.refresh(new_product)
-
-        new_product_image = ProductImage(
-            product_id=new_product.id,
-            image=cocart_product_create.product.image
-        )
-        db.add(new_product_image)
-        db.commit()
-
-        new_cocart_product = CocartProduct(
-            cocart_id=cocart_product_create.cocart_id,
-            product_id=new_product.id,
-            note=cocart_product_create.note
+        cocart_product = dict(
+            cocart_id=cocart_id,
+            note=cocart_product_create.note,
+            target_price=cocart_product_create.target_price
         )
-        db.add(new_cocart_product)
-        db.commit()
-        db.refresh(new_cocart_product)
+        db.add(CocartProduct(product=product, **cocart_product))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent add created the same product first
+            await db.rollback()
+            product_id = await db.scalar(select(Product.id).filter(
+                Product.canonical_url_hash == canonical_hash))
+            if not product_id or not canonical_hash:
+                raise
+            db.add(CocartProduct(product_id=product_id, **cocart_product))
+            await db.commit()
         return {
             "message": "Product added to cocart successfully",
         }
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@app.put("/cocart-products/{cocart_product_id}/target-price",
+         response_model=CocartProductSchema)
+def set_target_price(
+    cocart_product_id: int,
+    target_price_update: TargetPriceUpdate,
+    db: Session = Depends(get_db)
+):
+    try:
+        cocart_product = db.query(CocartProduct).filter(
+            CocartProduct.id == cocart_product_id,
+            CocartProduct.deleted_at.is_(None)).first()
+        if not cocart_product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cocart product not found"
+            )
+        cocart_product.target_price = target_price_update.target_price
+        db.commit()
+        db.refresh(cocart_product)
+        return cocart_product
     except SQLAlchemyError as e:
         db.rollback()
         raise HTTPException(
@@ -313,23 +469,21 @@ def add_product_to_cocart(
 
 
 @app.get("/cocarts/{cocart_id}/products")
-def get_cocart_products(cocart_id: int, db: Session = Depends(get_db)):
+async def get_cocart_products(cocart_id: int, db: AsyncSession = Depends(get_async_read_db)):
     try:
-        cocart = db.query(Cocart).filter(
-            Cocart.id == cocart_id).first()
+        cocart = await db.get(Cocart, cocart_id)
         if not cocart:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Cocart not found"
             )
 
-        products = (
-            db.query(Product)
-            .options(joinedload(Product.product_images))
+        products = (await db.execute(
+            select(Product, CocartProduct.note)
+            .options(selectinload(Product.product_images))
             .join(CocartProduct, CocartProduct.product_id == Product.id)
             .filter(CocartProduct.cocart_id == cocart_id)
-            .all()
-        )
+        )).all()
 
         response = []
         for product, note in products:
@@ -356,13 +510,12 @@ def get_cocart_products(cocart_id: int, db: Session = Depends(get_db)):
 
         return response
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
-
 # Delete all data (admin operation)
 
 @app.delete("/all_data")
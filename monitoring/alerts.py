@@ -0,0 +1,161 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session
+
+from DB.models import Cocart, CocartProduct, Notification
+from monitoring.catalog import chunked
+from monitoring.history import on_price_change
+
+
+PRICE_DROP_MIN_PERCENT = float(os.getenv("PRICE_DROP_MIN_PERCENT", "1"))
+PRICE_DROP_DEDUPE_HOURS = float(os.getenv("PRICE_DROP_DEDUPE_HOURS", "24"))
+PRICE_DROP_TYPE = "price_drop"
+TARGET_PRICE_TYPE = "target_price"
+# Products per watch query; each adds one OR'ed index range to the WHERE
+TARGET_PRICE_CHUNK_SIZE = int(os.getenv("TARGET_PRICE_CHUNK_SIZE", "200"))
+
+
+def price_drops(changes, min_percent=PRICE_DROP_MIN_PERCENT):
+    """Return ``{product_id: change}`` for changes that lowered the price enough."""
+    return {
+        change["product_id"]: change for change in changes
+        if change["old_price"] and change["price"] is not None
+        and change["price"] <= change["old_price"] * (1 - min_percent / 100)
+    }
+
+
+def affected_carts(db: Session, product_ids):
+    """Return ``{(user_id, product_id): cocart_id}`` for live, unbought cart entries.
+
+    One joined query per chunk of products; a user with the product in
+    several cocarts gets a single entry.
+    """
+    carts = {}
+    for chunk in chunked(list(product_ids)):
+        rows = (
+            db.query(Cocart.user_id, CocartProduct.product_id, CocartProduct.cocart_id)
+            .join(Cocart, Cocart.id == CocartProduct.cocart_id)
+            .filter(CocartProduct.product_id.in_(chunk),
+                    CocartProduct.deleted_at.is_(None),
+                    CocartProduct.is_bought.is_(False),
+                    Cocart.deleted_at.is_(None))
+        )
+        for user_id, product_id, cocart_id in rows:
+            carts.setdefault((user_id, product_id), cocart_id)
+    return carts
+
+
+def triggered_watches(db: Session, changes):
+    """Return ``{(user_id, product_id): cocart_id}`` for target prices just reached.
+
+    A watch triggers when the new price is at or below its target and the
+    old one was above it. Each product contributes one range over the
+    ``(product_id, target_price)`` index, so the cost follows the number
+    of changed products, not the number of watches.
+    """
+    ranges = [
+        and_(CocartProduct.product_id == change["product_id"],
+             CocartProduct.target_price >= change["price"],
+             *([CocartProduct.target_price < change["old_price"]]
+               if change["old_price"] is not None else []))
+        for change in changes
+        if change["price"] is not None
+        and (change["old_price"] is None or change["price"] < change["old_price"])
+    ]
+    watches = {}
+    for chunk in chunked(ranges, TARGET_PRICE_CHUNK_SIZE):
+        rows = (
+            db.query(Cocart.user_id, CocartProduct.product_id, CocartProduct.cocart_id)
+            .join(Cocart, Cocart.id == CocartProduct.cocart_id)
+            .filter(or_(*chunk),
+                    CocartProduct.deleted_at.is_(None),
+                    CocartProduct.is_bought.is_(False),
+                    Cocart.deleted_at.is_(None))
+        )
+        for user_id, product_id, cocart_id in rows:
+            watches.setdefault((user_id, product_id), cocart_id)
+    return watches
+
+
+def recently_notified(db: Session, product_ids, since, notification_type=PRICE_DROP_TYPE):
+    notified = set()
+    for chunk in chunked(list(product_ids)):
+        notified.update(
+            db.query(Notification.user_id, Notification.product_id)
+            .filter(Notification.product_id.in_(chunk),
+                    Notification.type == notification_type,
+                    Notification.created_at >= since)
+        )
+    return notified
+
+
+def _message(change, reached=False):
+    currency = change.get("currency") or ""
+    name = change.get("name") or "A product in your cocart"
+    if reached:
+        text = f"{name} is now {currency} {change['price']:,.2f}, at or below your target price"
+    else:
+        text = (f"{name} dropped from {currency} {change['old_price']:,.2f} "
+                f"to {currency} {change['price']:,.2f}")
+    return text if len(text) <= 255 else text[:252] + "..."
+
+
+def _insert_notifications(db: Session, carts, changes, notification_type, title, now):
+    rows = [
+        {"user_id": user_id, "cocart_id": cocart_id, "product_id": product_id,
+         "title": title,
+         "notification": _message(changes[product_id], notification_type == TARGET_PRICE_TYPE),
+         "type": notification_type, "created_at": now, "updated_at": now,
+         "extra_data": json.dumps({
+             "old_price": changes[product_id]["old_price"],
+             "price": changes[product_id]["price"],
+             "currency": changes[product_id].get("currency"),
+         })}
+        for (user_id, product_id), cocart_id in carts.items()
+    ]
+    if rows:
+        db.execute(insert(Notification), rows)
+    return len(rows)
+
+
+@on_price_change
+def notify_price_drops(db: Session, changes, now=None):
+    """Fan price drops in a write batch out to the users holding the products.
+
+    Skips any user already told about the same product within
+    ``PRICE_DROP_DEDUPE_HOURS`` and inserts the rest with one INSERT.
+    Returns the number of notifications created.
+    """
+    drops = price_drops(changes)
+    if not drops:
+        return 0
+    now = now or datetime.utcnow()
+    carts = affected_carts(db, drops)
+    if not carts:
+        return 0
+    notified = recently_notified(
+        db, drops, now - timedelta(hours=PRICE_DROP_DEDUPE_HOURS))
+    carts = {key: cocart_id for key, cocart_id in carts.items() if key not in notified}
+    return _insert_notifications(db, carts, drops, PRICE_DROP_TYPE, "Price drop", now)
+
+
+@on_price_change
+def notify_target_prices(db: Session, changes, now=None):
+    """Notify users whose target price was reached by a write batch.
+
+    Returns the number of notifications created.
+    """
+    watches = triggered_watches(db, changes)
+    if not watches:
+        return 0
+    now = now or datetime.utcnow()
+    by_product = {change["product_id"]: change for change in changes}
+    notified = recently_notified(
+        db, {product_id for _, product_id in watches},
+        now - timedelta(hours=PRICE_DROP_DEDUPE_HOURS), TARGET_PRICE_TYPE)
+    watches = {key: cocart_id for key, cocart_id in watches.items() if key not in notified}
+    return _insert_notifications(db, watches, by_product, TARGET_PRICE_TYPE,
+                                 "Target price reached", now)
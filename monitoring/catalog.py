@@ -0,0 +1,37 @@
+import os
+
+from sqlalchemy.orm import Session
+
+from DB.models import Product
+
+
+SCRAPE_READ_CHUNK_SIZE = int(os.getenv("SCRAPE_READ_CHUNK_SIZE", "500"))
+
+
+def iter_product_chunks(db: Session, chunk_size=SCRAPE_READ_CHUNK_SIZE):
+    """Yield lists of ``(product_id, product_tracking_url)`` in id order.
+
+    Only the two columns are selected, as plain rows rather than ORM
+    objects, and each chunk is fetched with a keyset query
+    (``id > last_id``), so nothing accumulates in the session and memory
+    stays flat however large the catalog is.
+    """
+    last_id = 0
+    while True:
+        rows = (
+            db.query(Product.id, Product.product_tracking_url)
+            .filter(Product.id > last_id,
+                    Product.product_tracking_url.isnot(None))
+            .order_by(Product.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return
+        yield [(product_id, product_url) for product_id, product_url in rows]
+        last_id = rows[-1][0]
+
+
+def chunked(items, chunk_size=SCRAPE_READ_CHUNK_SIZE):
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from DB.models import Product, ProductScrapeState
+
+
+SCRAPE_LEASE_SECONDS = int(os.getenv("SCRAPE_LEASE_SECONDS", "900"))
+
+
+def new_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _claimable(now):
+    return or_(ProductScrapeState.lease_expires_at.is_(None),
+               ProductScrapeState.lease_expires_at < now)
+
+
+def _lease(db: Session, owner, product_ids, now, lease_seconds):
+    """Lease the given products that nobody else holds; returns the claimed rows.
+
+    The conditional UPDATE only touches unleased or expired rows, so two
+    workers racing for a product cannot both win. Rows are read back by
+    owner and expiry to see which ones this call actually got.
+    """
+    if not product_ids:
+        return []
+    # TIMESTAMP columns may drop microseconds, which would break the read-back
+    expires_at = (now + timedelta(seconds=lease_seconds)).replace(microsecond=0)
+    db.execute(
+        update(ProductScrapeState)
+        .where(ProductScrapeState.product_id.in_(product_ids), _claimable(now))
+        .values(lease_owner=owner, lease_expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return [
+        (product_id, product_url)
+        for product_id, product_url in (
+            db.query(Product.id, Product.product_tracking_url)
+            .join(ProductScrapeState, ProductScrapeState.product_id == Product.id)
+            .filter(ProductScrapeState.product_id.in_(product_ids),
+                    ProductScrapeState.lease_owner == owner,
+                    ProductScrapeState.lease_expires_at == expires_at)
+            .order_by(ProductScrapeState.next_check_at)
+        )
+    ]
+
+
+def claim_due_products(db: Session, owner, limit, lease_seconds=SCRAPE_LEASE_SECONDS):
+    """Lease up to ``limit`` due products for ``owner``.
+
+    On MySQL and PostgreSQL candidates are picked with
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` so concurrent workers pass over
+    each other's rows instead of queueing on them. Leases left behind by a
+    crashed worker become claimable again once they expire.
+    """
+    now = datetime.utcnow()
+    query = (
+        db.query(ProductScrapeState.product_id)
+        .filter(ProductScrapeState.next_check_at <= now, _claimable(now))
+        .order_by(ProductScrapeState.next_check_at)
+        .limit(limit)
+    )
+    if db.get_bind().dialect.name in ("mysql", "postgresql"):
+        query = query.with_for_update(skip_locked=True)
+    product_ids = [product_id for (product_id,) in query]
+    return _lease(db, owner, product_ids, now, lease_seconds)
+
+
+def claim_products(db: Session, owner, product_ids, lease_seconds=SCRAPE_LEASE_SECONDS):
+    """Lease specific products, skipping any another worker holds."""
+    return _lease(db, owner, product_ids, datetime.utcnow(), lease_seconds)
+
+
+def release_products(db: Session, owner):
+    db.execute(
+        update(ProductScrapeState)
+        .where(ProductScrapeState.lease_owner == owner)
+        .values(lease_owner=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+async def renew_leases(db: Session, owner, lease_seconds=SCRAPE_LEASE_SECONDS):
+    """Keep ``owner``'s leases from expiring until this task is cancelled.
+
+    Run it alongside a batch that may outlast the lease. Renewals use
+    their own session, so they never commit the batch's work.
+    """
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        expires_at = (datetime.utcnow() + timedelta(seconds=lease_seconds)).replace(microsecond=0)
+        try:
+            with Session(bind=db.get_bind()) as renew_db:
+                renew_db.execute(
+                    update(ProductScrapeState)
+                    .where(ProductScrapeState.lease_owner == owner)
+                    .values(lease_expires_at=expires_at)
+                    .execution_options(synchronize_session=False)
+                )
+                renew_db.commit()
+        except SQLAlchemyError as e:
+            print(f"Error renewing scrape leases of {owner}: {e}")
@@ -0,0 +1,30 @@
+import hashlib
+import json
+import re
+
+
+# Fields whose change is worth writing back to the product row
+DIGEST_FIELDS = ("name", "price", "original_price", "customer_rating",
+                 "image", "product_tracking_url")
+
+_VOLATILE_BLOCKS = re.compile(
+    r"<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->",
+    re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_page(page_html):
+    # Scripts, styles and comments carry per-request tokens and timestamps
+    page_html = _VOLATILE_BLOCKS.sub("", page_html)
+    return _WHITESPACE.sub(" ", page_html).strip()
+
+
+def page_digest(page_html):
+    return hashlib.sha256(
+        normalize_page(page_html).encode("utf-8", "replace")).hexdigest()
+
+
+def fields_digest(product):
+    values = [product.get(field) for field in DIGEST_FIELDS]
+    return hashlib.sha256(
+        json.dumps(values, default=str).encode("utf-8")).hexdigest()
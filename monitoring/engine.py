@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+from monitoring.singleflight import (
+    SCRAPE_SHARED_FLIGHT, SharedFlight, flight_key, page_flights)
+from monitoring.throttle import SCRAPE_HOST_QUEUE, HostUnavailable, host_throttles
+
+
+SCRAPER_API_URL = os.getenv("SCRAPER_API_URL", "https://api.scraperapi.com")
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "20"))
+SCRAPE_PER_HOST_CONCURRENCY = int(os.getenv("SCRAPE_PER_HOST_CONCURRENCY", "5"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "70"))
+
+
+class ScrapeEngine:
+    """Fetches product pages concurrently through ScraperAPI.
+
+    A single keep-alive aiohttp session is shared by every page fetch and
+    by the selector lookups made while extracting (``engine.session``).
+    ``concurrency`` caps requests in flight overall, ``per_host`` caps them
+    per product hostname so one marketplace cannot take every slot.
+    Each hostname is also paced by an adaptive ``HostThrottle`` that backs
+    off on 429/5xx responses and trips a circuit breaker when a host keeps
+    failing. Concurrent fetches of one canonical URL share a single
+    request through ``flights``; with ``shared``, a product is also only
+    fetched by one process at a time.
+    """
+
+    def __init__(self, api_key=None, api_url=SCRAPER_API_URL,
+                 concurrency=SCRAPE_CONCURRENCY,
+                 per_host=SCRAPE_PER_HOST_CONCURRENCY,
+                 timeout=SCRAPE_TIMEOUT, throttles=None, flights=None,
+                 shared=SCRAPE_SHARED_FLIGHT, host_queue=SCRAPE_HOST_QUEUE):
+        self.api_key = api_key if api_key is not None else os.getenv("SCRAPER_API")
+        self.api_url = api_url
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.host_queue = host_queue
+        self.throttles = throttles if throttles is not None else host_throttles
+        self.flights = flights if flights is not None else page_flights
+        self.shared = SharedFlight() if shared else None
+        self.session = None
+        self._global_limit = None
+        self._host_limits = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._global_limit = asyncio.Semaphore(self.concurrency)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.shared is not None:
+            await self.shared.close()
+
+    def _host_limit(self, hostname):
+        limit = self._host_limits.get(hostname)
+        if limit is None:
+            limit = asyncio.Semaphore(self.per_host)
+            self._host_limits[hostname] = limit
+        return limit
+
+    async def fetch(self, product_url):
+        return await self.flights.do(
+            flight_key(product_url), lambda: self._fetch(product_url),
+            cache_if=lambda result: result[0] == 200)
+
+    async def _fetch(self, product_url):
+        hostname = urlparse(product_url).hostname or ""
+        params = {"api_key": self.api_key or "", "url": product_url}
+        throttle = self.throttles.get(hostname)
+        # Reserve the host's token before taking any slot, so a throttled
+        # host never holds up requests to healthy ones
+        await throttle.acquire()
+        async with self._host_limit(hostname):
+            async with self._global_limit:
+                started = time.monotonic()
+                try:
+                    async with self.session.get(self.api_url, params=params) as response:
+                        page_html = await response.text()
+                except asyncio.CancelledError:
+                    # Cancelled by our side, says nothing about the host
+                    raise
+                except Exception:
+                    throttle.record(None)
+                    raise
+                throttle.record(response.status, time.monotonic() - started)
+                return response.status, page_html
+
+    async def run(self, products, handle, summary=None, defer=None):
+        """Fetch every ``(product_id, product_url)`` in ``products``.
+
+        ``products`` may be a regular or an async iterable.
+
+        ``handle(product_id, product_url, status, page_html)`` is awaited for
+        each page as soon as it arrives. Products are pulled from the
+        iterable lazily into a bounded queue per hostname, drained by that
+        host's own workers, so a throttled host's products wait for its
+        tokens without holding up other hosts. Products whose host has an
+        open circuit are not fetched; they are passed to
+        ``defer(product_id, product_url, retry_at)`` instead.
+        Returns a summary dict with counts and the elapsed time; pass
+        ``summary`` to watch the counts while the run is in progress.
+        """
+        if summary is None:
+            summary = {}
+        summary.update({"fetched": 0, "failed": 0, "deferred": 0, "elapsed": 0.0})
+        queues = {}
+        workers = []
+        started = time.perf_counter()
+
+        async def process(product_id, product_url):
+            try:
+                if self.shared is not None:
+                    await self.shared.claim(product_id)
+                status, page_html = await self.fetch(product_url)
+                await handle(product_id, product_url, status, page_html)
+                summary["fetched"] += 1
+            except HostUnavailable as e:
+                summary["deferred"] += 1
+                if defer is not None:
+                    defer(product_id, product_url, e.retry_at)
+            except Exception as e:
+                summary["failed"] += 1
+                print(f"Error scraping product_id {product_id}: {e}")
+
+        async def drain(queue):
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                await process(*item)
+
+        # Twice the host's request slots, so pages are handled while the
+        # next ones download
+        host_workers = self.per_host * 2
+
+        async def start(item):
+            hostname = urlparse(item[1]).hostname or ""
+            queue = queues.get(hostname)
+            if queue is None:
+                queue = queues[hostname] = asyncio.Queue(self.host_queue)
+                workers.extend(asyncio.create_task(drain(queue))
+                               for _ in range(host_workers))
+            await queue.put(item)
+
+        await self.open()
+        try:
+            if hasattr(products, "__aiter__"):
+                async for item in products:
+                    await start(item)
+            else:
+                for item in products:
+                    await start(item)
+            for queue in queues.values():
+                for _ in range(host_workers):
+                    await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        summary["elapsed"] = time.perf_counter() - started
+        return summary
@@ -0,0 +1,142 @@
+from functools import lru_cache
+
+import soupsieve as sv
+
+
+def _amazon_price(text):
+    return f"₹{text}"
+
+
+def _amazon_rating(text):
+    text = text.strip()
+    return text.split(' ')[0] if 'out of' in text else None
+
+
+# Marketplace extractors, matched by a keyword in the product hostname.
+# Each field lists candidate selectors tried in order; the first element
+# found supplies the value (its text, or the first non-empty ``attrs``
+# entry), optionally passed through ``parse``. A missing or unparseable
+# value falls back to ``default``. Add a marketplace by adding an entry.
+SITE_EXTRACTORS = {
+    "amazon": {
+        "name": {
+            "select": ['#productTitle'],
+            "default": 'Title not available',
+        },
+        "price": {
+            "select": ['.a-price .a-price-whole'],
+            "parse": _amazon_price,
+            "default": 'Price not available',
+        },
+        "original_price": {
+            "select": ['.a-price.a-text-price .a-offscreen',
+                       '.basisPrice .a-price .a-offscreen'],
+            "default": 'MRP not available',
+        },
+        "customer_rating": {
+            "select": ['#acrPopover'],
+            "attrs": ['title'],
+            "parse": _amazon_rating,
+            "default": 'Rating not available',
+        },
+        "image": {
+            "select": ['.a-dynamic-image.a-stretch-vertical',
+                       'span.a-declarative[data-action="main-image-click"] img'],
+            "attrs": ['data-old-hires', 'src'],
+            "default": 'Image not available',
+        },
+    },
+    "flipkart": {
+        "name": {"select": ['.VU-ZEz'], "default": 'Title not available'},
+        "price": {"select": ['.Nx9bqj'], "default": 'Price not available'},
+        "original_price": {"select": ['.yRaY8j'], "default": 'MRP not available'},
+        "customer_rating": {"select": ['.XQDdHH'], "default": 'Rating not available'},
+        "image": {"select": ['.DByuf4'], "attrs": ['src'], "default": 'Image not available'},
+    },
+}
+
+# Field names used by the remote selector service, with their fallbacks
+REMOTE_SELECTOR_FIELDS = {
+    "name": ('title', None, "Title N/A"),
+    "price": ('current', None, "Price N/A"),
+    "original_price": ('mrp', None, "MRP N/A"),
+    "customer_rating": ('rating', None, "Rating N/A"),
+    "image": ('image', ['src'], "Image N/A"),
+}
+
+
+@lru_cache(maxsize=1024)
+def compile_selector(selector):
+    return sv.compile(selector)
+
+
+def _compile_fields(fields):
+    return {
+        name: (
+            tuple(compile_selector(selector) for selector in spec["select"]),
+            tuple(spec.get("attrs") or ()),
+            spec.get("parse"),
+            spec["default"],
+        )
+        for name, spec in fields.items()
+    }
+
+
+COMPILED_EXTRACTORS = {
+    keyword: _compile_fields(fields)
+    for keyword, fields in SITE_EXTRACTORS.items()
+}
+
+
+def find_extractor(hostname):
+    for keyword, extractor in COMPILED_EXTRACTORS.items():
+        if keyword in hostname:
+            return extractor
+    return None
+
+
+@lru_cache(maxsize=256)
+def _remote_extractor(selector_items):
+    selectors = dict(selector_items)
+    fields = {}
+    for name, (key, attrs, default) in REMOTE_SELECTOR_FIELDS.items():
+        selector = selectors.get(key)
+        fields[name] = {
+            "select": [selector] if selector else [],
+            "attrs": attrs,
+            "default": default,
+        }
+    return _compile_fields(fields)
+
+
+def build_remote_extractor(selectors):
+    items = tuple(sorted(
+        (key, value) for key, value in selectors.items()
+        if isinstance(value, str)
+    ))
+    return _remote_extractor(items)
+
+
+def _element_value(element, attrs):
+    if not attrs:
+        return element.get_text(strip=True)
+    for attr in attrs:
+        value = element.get(attr)
+        if value:
+            return value
+    return None
+
+
+def extract_fields(soup, extractor):
+    data = {}
+    for name, (selectors, attrs, parse, default) in extractor.items():
+        value = None
+        for selector in selectors:
+            element = selector.select_one(soup)
+            if element is not None:
+                value = _element_value(element, attrs)
+                break
+        if value and parse:
+            value = parse(value)
+        data[name] = value or default
+    return data
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from DB.models import PriceHistory, Product
+
+
+_price_listeners = []
+
+
+def on_price_change(fn):
+    """Register ``fn(db, changes)`` to run on every batch of price changes.
+
+    Listeners run inside the writer's transaction, after the history rows
+    are staged; ``changes`` is a list of dicts with ``product_id``,
+    ``old_price``, ``price``, ``original_price``, ``currency``, ``name``
+    and ``ts``.
+    """
+    _price_listeners.append(fn)
+    return fn
+
+
+def load_current_prices(db: Session, product_ids):
+    """Return ``{product_id: (price, original_price)}`` as stored now."""
+    return {
+        product_id: (price, original_price)
+        for product_id, price, original_price in db.query(
+            Product.id, Product.price, Product.original_price)
+        .filter(Product.id.in_(product_ids))
+    }
+
+
+def price_changes(current, products, ts=None):
+    """Compare normalized ``{product_id: product}`` with ``current`` prices.
+
+    A product is a change when its price or MRP differs from the stored
+    one; products without a scraped price are left out.
+    """
+    # Microseconds kept: ts is in the primary key, and a product can
+    # change twice within one second
+    ts = ts or datetime.utcnow()
+    changes = []
+    for product_id, product in products.items():
+        price, original_price = product.get("price"), product.get("original_price")
+        if price is None:
+            continue
+        old_price, old_original_price = current.get(product_id, (None, None))
+        if price == old_price and original_price == old_original_price:
+            continue
+        changes.append({
+            "product_id": product_id, "ts": ts, "old_price": old_price,
+            "price": price, "original_price": original_price,
+            "currency": product.get("currency"), "name": product.get("name"),
+        })
+    return changes
+
+
+def record_price_changes(db: Session, changes):
+    """Append one history row per change with a single INSERT and notify listeners.
+
+    Staged on the session; the caller commits with the product updates.
+    """
+    if not changes:
+        return
+    db.execute(insert(PriceHistory), [
+        {field: change[field] for field in
+         ("product_id", "ts", "price", "original_price", "currency")}
+        for change in changes
+    ])
+    for listener in _price_listeners:
+        listener(db, changes)
+
+
+def price_stats(db: Session, product_id, since=None):
+    """Lowest, highest and latest price of a product, optionally since ``since``."""
+    query = db.query(
+        func.min(PriceHistory.price), func.max(PriceHistory.price),
+        func.count(), func.max(PriceHistory.ts),
+    ).filter(PriceHistory.product_id == product_id)
+    if since is not None:
+        query = query.filter(PriceHistory.ts >= since)
+    lowest, highest, changes, last_changed_at = query.one()
+    return {"min": lowest, "max": highest, "changes": changes,
+            "last_changed_at": last_changed_at}
+
+
+def last_prices(db: Session, product_id, limit=10):
+    """The ``limit`` most recent ``(ts, price)`` points, newest first."""
+    return [
+        (ts, price) for ts, price in db.query(PriceHistory.ts, PriceHistory.price)
+        .filter(PriceHistory.product_id == product_id)
+        .order_by(PriceHistory.ts.desc())
+        .limit(limit)
+    ]
+
+
+def price_series(db: Session, product_id, start, end, bucket=timedelta(days=1)):
+    """Downsample a product's prices over ``[start, end)`` into ``bucket`` steps.
+
+    History only stores changes, so a price holds until the next one: each
+    bucket reports the open, low, high and close of the price in effect
+    during it, starting from the last change before ``start``.
+    """
+    carried = (
+        db.query(PriceHistory.price)
+        .filter(PriceHistory.product_id == product_id, PriceHistory.ts < start)
+        .order_by(PriceHistory.ts.desc())
+        .limit(1)
+        .scalar()
+    )
+    points = (
+        db.query(PriceHistory.ts, PriceHistory.price)
+        .filter(PriceHistory.product_id == product_id,
+                PriceHistory.ts >= start, PriceHistory.ts < end)
+        .order_by(PriceHistory.ts)
+        .all()
+    )
+
+    series = []
+    index = 0
+    bucket_start = start
+    while bucket_start < end:
+        bucket_end = min(bucket_start + bucket, end)
+        prices = [] if carried is None else [carried]
+        while index < len(points) and points[index][0] < bucket_end:
+            prices.append(points[index][1])
+            index += 1
+        if prices:
+            series.append({"ts": bucket_start, "open": prices[0], "low": min(prices),
+                           "high": max(prices), "close": prices[-1]})
+            carried = prices[-1]
+        bucket_start = bucket_end
+    return series
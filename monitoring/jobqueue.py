@@ -0,0 +1,219 @@
+import asyncio
+import inspect
+import json
+import os
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, insert, or_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from DB.models import FailedJob, Job
+
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_SECONDS = int(os.getenv("JOB_BACKOFF_SECONDS", "30"))
+# A reserved job not finished within this long is handed out again
+JOB_RETRY_AFTER_SECONDS = int(os.getenv("JOB_RETRY_AFTER_SECONDS", "900"))
+JOB_CONNECTION = "database"
+# The jobs table is shared with the Laravel app, so Python queues live
+# under their own prefix and only payloads marked as ours are reserved
+JOB_QUEUE_PREFIX = os.getenv("JOB_QUEUE_PREFIX", "python:")
+PAYLOAD_RUNTIME = "python"
+_PAYLOAD_MARKER = json.dumps({"runtime": PAYLOAD_RUNTIME})[:-1]
+
+_handlers = {}
+
+
+def job_handler(name):
+    """Register ``fn(db, data)`` (sync or async) as the handler for ``name``."""
+    def register(fn):
+        _handlers[name] = fn
+        return fn
+    return register
+
+
+def queue_name(queue):
+    return f"{JOB_QUEUE_PREFIX}{queue}"
+
+
+def _payload(name, data, max_attempts):
+    # "runtime" goes first so reserve() can match it as a prefix
+    return json.dumps({
+        "runtime": PAYLOAD_RUNTIME,
+        "uuid": str(uuid.uuid4()),
+        "job": name,
+        "data": data,
+        "maxTries": max_attempts,
+    })
+
+
+def dispatch(db: Session, name, data, queue="default", delay=0,
+             max_attempts=JOB_MAX_ATTEMPTS):
+    dispatch_many(db, name, [data], queue, delay, max_attempts)
+
+
+def dispatch_many(db: Session, name, items, queue="default", delay=0,
+                  max_attempts=JOB_MAX_ATTEMPTS):
+    """Queue one ``name`` job per entry of ``items`` with a single INSERT."""
+    now = int(time.time())
+    rows = [
+        {"queue": queue_name(queue), "payload": _payload(name, data, max_attempts),
+         "attempts": 0, "reserved_at": None, "available_at": now + delay,
+         "created_at": now}
+        for data in items
+    ]
+    if rows:
+        db.execute(insert(Job), rows)
+        db.commit()
+    return len(rows)
+
+
+def _available(now):
+    return or_(
+        and_(Job.reserved_at.is_(None), Job.available_at <= now),
+        Job.reserved_at <= now - JOB_RETRY_AFTER_SECONDS,
+    )
+
+
+def reserve(db: Session, queue, limit=1):
+    """Atomically reserve up to ``limit`` jobs from ``queue``.
+
+    Only jobs dispatched from Python are considered; anything else in the
+    table (e.g. the Laravel app's jobs) is never touched. On MySQL and PostgreSQL the candidates are locked with
+    ``FOR UPDATE SKIP LOCKED`` and reserved in one UPDATE. Elsewhere each
+    candidate is reserved with its own conditional UPDATE, and only the
+    rows this call changed count as reserved.
+    """
+    now = int(time.time())
+    query = (
+        db.query(Job.id)
+        .filter(Job.queue == queue_name(queue), _available(now),
+                Job.payload.startswith(_PAYLOAD_MARKER, autoescape=True))
+        .order_by(Job.id)
+        .limit(limit)
+    )
+    reserve_values = {"reserved_at": now, "attempts": Job.attempts + 1}
+    if db.get_bind().dialect.name in ("mysql", "postgresql"):
+        job_ids = [job_id for (job_id,) in query.with_for_update(skip_locked=True)]
+        if job_ids:
+            db.execute(
+                update(Job).where(Job.id.in_(job_ids)).values(**reserve_values)
+                .execution_options(synchronize_session=False))
+    else:
+        job_ids = [
+            job_id for (job_id,) in query.all()
+            if db.execute(
+                update(Job).where(Job.id == job_id, _available(now))
+                .values(**reserve_values)
+                .execution_options(synchronize_session=False)).rowcount
+        ]
+    jobs = []
+    if job_ids:
+        jobs = (
+            db.query(Job.id, Job.queue, Job.payload, Job.attempts)
+            .filter(Job.id.in_(job_ids))
+            .order_by(Job.id)
+            .all()
+        )
+    # Plain rows outlive the commit, so no transaction stays open while jobs run
+    db.commit()
+    return jobs
+
+
+def complete(db: Session, job_ids):
+    if job_ids:
+        db.query(Job).filter(Job.id.in_(job_ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+def release(db: Session, job, error):
+    """Retry ``job`` later with exponential backoff, or dead-letter it."""
+    max_attempts = json.loads(job.payload).get("maxTries") or JOB_MAX_ATTEMPTS
+    if job.attempts >= max_attempts:
+        fail(db, job, error)
+        return
+    delay = JOB_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+    db.query(Job).filter_by(id=job.id).update(
+        {"reserved_at": None, "available_at": int(time.time()) + delay},
+        synchronize_session=False)
+    db.commit()
+
+
+def fail(db: Session, job, error):
+    payload = json.loads(job.payload)
+    db.add(FailedJob(
+        uuid=payload.get("uuid") or str(uuid.uuid4()),
+        connection=JOB_CONNECTION,
+        queue=job.queue,
+        payload=job.payload,
+        exception=error,
+        failed_at=datetime.utcnow(),
+    ))
+    db.query(Job).filter_by(id=job.id).delete(synchronize_session=False)
+    db.commit()
+
+
+async def run_job(db: Session, job):
+    payload = json.loads(job.payload)
+    handler = _handlers.get(payload.get("job"))
+    if handler is None:
+        raise LookupError(f"No handler registered for job {payload.get('job')!r}")
+    result = handler(db, payload.get("data"))
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _keep_reserved(db: Session, job_id):
+    # Renew the reservation so a long job isn't handed to another worker
+    while True:
+        await asyncio.sleep(JOB_RETRY_AFTER_SECONDS / 3)
+        try:
+            with Session(bind=db.get_bind()) as renew_db:
+                renew_db.query(Job).filter_by(id=job_id).update(
+                    {"reserved_at": int(time.time())}, synchronize_session=False)
+                renew_db.commit()
+        except SQLAlchemyError as e:
+            print(f"Error renewing the reservation of job {job_id}: {e}")
+
+
+async def work(db: Session, queues, batch_size=10):
+    """Run up to ``batch_size`` jobs from each queue; returns jobs processed.
+
+    Jobs are reserved one at a time, just before they run, and a running
+    job's reservation is renewed until it finishes.
+    """
+    processed = 0
+    for queue in queues:
+        for _ in range(batch_size):
+            jobs = reserve(db, queue)
+            if not jobs:
+                break
+            job = jobs[0]
+            renew = asyncio.create_task(_keep_reserved(db, job.id))
+            try:
+                await run_job(db, job)
+            except Exception:
+                db.rollback()
+                error = traceback.format_exc()
+                print(f"Job {job.id} on {queue} failed (attempt {job.attempts}): "
+                      f"{error.strip().splitlines()[-1]}")
+                release(db, job, error)
+            else:
+                complete(db, [job.id])
+            finally:
+                renew.cancel()
+            processed += 1
+    return processed
+
+
+async def run_worker(db: Session, queues, batch_size=10, poll_seconds=3, once=False):
+    while True:
+        processed = await work(db, queues, batch_size)
+        if not processed:
+            if once:
+                return
+            await asyncio.sleep(poll_seconds)
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from DB.database import SessionLocal
+from DB.models import Lease, Product, ScrapeJob
+from monitoring.catalog import iter_product_chunks
+from monitoring.claims import claim_products, new_owner, release_products, renew_leases
+from monitoring.jobqueue import dispatch
+from monitoring.leader import acquire_lease, release_lease
+from monitoring.pipeline import scrape_products
+from monitoring.planner import remaining_credits
+
+
+SCRAPE_JOB_LEASE = "monitor-product"
+SCRAPE_JOB_LEASE_SECONDS = 60
+# A queued job holds the lease this long while it waits for a queue worker
+SCRAPE_JOB_QUEUED_SECONDS = int(os.getenv("SCRAPE_JOB_QUEUED_SECONDS", "900"))
+# How often a running job saves its progress and checks for a cancel
+SCRAPE_JOB_SYNC_SECONDS = 5
+SCRAPE_JOB_HISTORY = 20
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def new_job_id():
+    return f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+
+
+def start_job(db: Session, status="running", lease_seconds=SCRAPE_JOB_LEASE_SECONDS):
+    """Record a new job and take the job lease for it.
+
+    Returns ``(job_id, started)``. If a job is already running anywhere,
+    nothing is started and its id (the lease owner) is returned instead.
+    """
+    now = datetime.utcnow()
+    job_id = new_job_id()
+    db.add(ScrapeJob(id=job_id, status=status, started_at=now, updated_at=now))
+    db.commit()
+    if not acquire_lease(db, SCRAPE_JOB_LEASE, job_id, lease_seconds):
+        db.query(ScrapeJob).filter_by(id=job_id).delete(synchronize_session=False)
+        db.commit()
+        lease = db.get(Lease, SCRAPE_JOB_LEASE)
+        return (lease.owner if lease is not None else None), False
+
+    # Jobs still marked active lost their process along with the lease
+    db.query(ScrapeJob).filter(ScrapeJob.status.in_(ACTIVE_STATUSES),
+                               ScrapeJob.id != job_id).update(
+        {"status": "failed", "error": "Worker stopped", "finished_at": now},
+        synchronize_session=False)
+    keep = [row.id for row in db.query(ScrapeJob.id)
+            .order_by(ScrapeJob.started_at.desc()).limit(SCRAPE_JOB_HISTORY)]
+    db.query(ScrapeJob).filter(ScrapeJob.id.notin_(keep)).delete(synchronize_session=False)
+    db.commit()
+    return job_id, True
+
+
+def get_job(db: Session, job_id):
+    job = db.get(ScrapeJob, job_id)
+    return job_to_dict(job) if job is not None else None
+
+
+def cancel_job(db: Session, job_id):
+    """Flag a running job for cancellation; its process stops it on the next sync."""
+    job = db.get(ScrapeJob, job_id)
+    if job is not None and job.status in ACTIVE_STATUSES:
+        job.cancel_requested = True
+        db.commit()
+    return job
+
+
+def job_to_dict(job):
+    processed = job.fetched + job.failed + job.deferred
+    remaining = max(0, job.total - processed)
+    elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "total": job.total,
+        "done": job.fetched,
+        "failed": job.failed,
+        "deferred": job.deferred,
+        "remaining": remaining,
+        "rate_per_second": round(rate, 2),
+        "eta_seconds": round(remaining / rate) if rate and job.status in ACTIVE_STATUSES else None,
+        "cancel_requested": job.cancel_requested,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "summary": json.loads(job.summary) if job.summary else None,
+        "error": job.error,
+    }
+
+
+def _save(job_id, **values):
+    db = SessionLocal()
+    try:
+        values["updated_at"] = datetime.utcnow()
+        db.query(ScrapeJob).filter_by(id=job_id).update(values, synchronize_session=False)
+        db.commit()
+        return db.get(ScrapeJob, job_id)
+    finally:
+        db.close()
+
+
+def _progress_values(progress):
+    return {key: progress[key] for key in ("total", "fetched", "failed", "deferred")
+            if key in progress}
+
+
+def _claimed_chunks(db: Session, owner, chunks, progress):
+    # Lease each chunk just before the pipeline reads it, like every other
+    # scrape path; products a worker or the tick holds are left to it
+    for chunk in chunks:
+        claimed = claim_products(db, owner, [product_id for product_id, _ in chunk])
+        progress["total"] -= len(chunk) - len(claimed)
+        if claimed:
+            yield claimed
+
+
+async def run_job(job_id, extract_executor=None):
+    """Run the full-catalog scrape for ``job_id``, keeping its row current."""
+    db = SessionLocal()
+    job = db.get(ScrapeJob, job_id)
+    if job is None or job.status not in ACTIVE_STATUSES:
+        db.close()
+        return
+    if job.cancel_requested or not acquire_lease(
+            db, SCRAPE_JOB_LEASE, job_id, SCRAPE_JOB_LEASE_SECONDS):
+        _save(job_id, status="cancelled", finished_at=datetime.utcnow())
+        db.close()
+        return
+    _save(job_id, status="running", started_at=datetime.utcnow())
+    progress = {}
+    sync = asyncio.create_task(_sync(job_id, progress, asyncio.current_task()))
+    # Leases are held until the job ends, as the pipeline may still be
+    # fetching earlier chunks while it reads the next one
+    owner = new_owner()
+    renew = asyncio.create_task(renew_leases(db, owner))
+    status, summary, error = "finished", None, None
+    try:
+        progress["total"] = db.query(func.count(Product.id)).filter(
+            Product.product_tracking_url.isnot(None)).scalar()
+        _save(job_id, total=progress["total"])
+        summary = await scrape_products(
+            db, _claimed_chunks(db, owner, iter_product_chunks(db), progress),
+            budget=remaining_credits(db), progress=progress,
+            extract_executor=extract_executor)
+    except asyncio.CancelledError:
+        status = "cancelled"
+    except Exception as e:
+        status = "failed"
+        error = str(e)
+        print(f"Scrape job {job_id} failed: {e}")
+    finally:
+        sync.cancel()
+        renew.cancel()
+        try:
+            release_products(db, owner)
+        except SQLAlchemyError as e:
+            db.rollback()
+            print(f"Error releasing scrape job {job_id} leases: {e}")
+        if summary is not None:
+            # Ids are left out; the counts are in the summary already
+            summary = json.dumps({key: value for key, value in summary.items()
+                                  if key != "deferred_product_ids"}, default=str)
+        try:
+            _save(job_id, status=status, summary=summary, error=error,
+                  finished_at=datetime.utcnow(), **_progress_values(progress))
+        except SQLAlchemyError as e:
+            print(f"Error saving scrape job {job_id}: {e}")
+        release_lease(db, SCRAPE_JOB_LEASE, job_id)
+        db.close()
+
+
+async def _sync(job_id, progress, task):
+    # Renew the lease, save progress and pick up a cancel from any worker
+    while True:
+        await asyncio.sleep(SCRAPE_JOB_SYNC_SECONDS)
+        try:
+            db = SessionLocal()
+            try:
+                acquire_lease(db, SCRAPE_JOB_LEASE, job_id, SCRAPE_JOB_LEASE_SECONDS)
+            finally:
+                db.close()
+            job = _save(job_id, **_progress_values(progress))
+        except SQLAlchemyError as e:
+            print(f"Error syncing scrape job {job_id}: {e}")
+            continue
+        if job is not None and job.cancel_requested:
+            task.cancel()
+            return
+
+
+def _run_in_thread(job_id):
+    # Own loop, with parsing in the process pool, so the API loop stays free
+    asyncio.run(run_job(job_id, extract_executor="process"))
+
+
+class ScrapeJobManager:
+    """Starts the full-catalog scrape and reports on it from the database.
+
+    Only one job runs at a time across every process: the job holds a
+    lease row, and a trigger while it runs returns the running job's id.
+    Status, progress and cancel requests live in ``scrape_jobs``, so any
+    worker can answer for a job another worker is running. The scrape
+    itself never runs on the API's event loop: with a ``queue`` it goes
+    to queue_worker.py, otherwise to a thread with its own loop.
+    """
+
+    def start(self, queue=None):
+        """Return ``(job_id, started)``; ``job_id`` is the running job's if not started."""
+        db = SessionLocal()
+        try:
+            if queue is None:
+                job_id, started = start_job(db)
+                if started:
+                    threading.Thread(target=_run_in_thread, args=(job_id,),
+                                     name=f"scrape-job-{job_id}", daemon=True).start()
+                return job_id, started
+            job_id, started = start_job(db, "queued", SCRAPE_JOB_QUEUED_SECONDS)
+            if started:
+                dispatch(db, "scrape_catalog", {"job_id": job_id}, queue=queue)
+            return job_id, started
+        finally:
+            db.close()
+
+
+scrape_jobs = ScrapeJobManager()
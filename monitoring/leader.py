@@ -0,0 +1,125 @@
+import functools
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from DB.database import SessionLocal
+from DB.models import Lease
+from monitoring.claims import new_owner
+
+
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "15"))
+SCHEDULER_HEARTBEAT_SECONDS = int(os.getenv("SCHEDULER_HEARTBEAT_SECONDS", "5"))
+
+
+def acquire_lease(db: Session, name, owner, ttl_seconds):
+    """Take or renew the named lease; returns True if ``owner`` now holds it.
+
+    Succeeds when the lease is free, expired or already ours. Expiry is
+    stored in whole seconds to match TIMESTAMP columns.
+    """
+    now = datetime.utcnow()
+    expires_at = (now + timedelta(seconds=ttl_seconds)).replace(microsecond=0)
+    result = db.execute(
+        update(Lease)
+        .where(Lease.name == name,
+               or_(Lease.owner == owner, Lease.expires_at < now))
+        .values(owner=owner, expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.commit()
+        return True
+    try:
+        db.add(Lease(name=name, owner=owner, expires_at=expires_at))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def release_lease(db: Session, name, owner):
+    db.query(Lease).filter_by(name=name, owner=owner).delete()
+    db.commit()
+
+
+class LeaderElection:
+    """Keeps one process across all workers and pods as the scheduler leader.
+
+    ``heartbeat`` runs every few seconds in each process and takes or renews
+    the lease row. If the leader dies, its lease runs out after ``ttl``
+    seconds and the next heartbeat elsewhere takes over. A process only
+    considers itself leader until its own last successful renewal expires,
+    so a leader cut off from the database steps down on time.
+    """
+
+    def __init__(self, name="scheduler", ttl=SCHEDULER_LEASE_SECONDS,
+                 owner=None, on_elected=None):
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or new_owner()
+        self.on_elected = on_elected
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self):
+        return time.monotonic() < self._valid_until
+
+    def heartbeat(self):
+        was_leader = self.is_leader
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            held = acquire_lease(db, self.name, self.owner, self.ttl)
+        except SQLAlchemyError as e:
+            print(f"Leader heartbeat failed: {e}")
+            held = False
+        finally:
+            db.close()
+
+        # Leave a second of margin for the lease's whole-second expiry
+        self._valid_until = started + self.ttl - 1 if held else 0.0
+        if held and not was_leader:
+            print(f"{self.owner} is now the {self.name} leader")
+            if self.on_elected:
+                self.on_elected()
+        elif was_leader and not held:
+            print(f"{self.owner} lost the {self.name} lease")
+
+    def resign(self):
+        if self.is_leader:
+            db = SessionLocal()
+            try:
+                release_lease(db, self.name, self.owner)
+            finally:
+                db.close()
+        self._valid_until = 0.0
+
+    def leader_only(self, job, interval_seconds):
+        """Wrap a scheduled job so it runs once per interval, on the leader.
+
+        Besides checking leadership, each run takes a per-job lease lasting
+        most of the interval. A new leader that takes over mid-interval
+        therefore cannot repeat a run the old leader already did.
+        """
+        slot_ttl = max(1, int(interval_seconds * 0.9))
+
+        @functools.wraps(job)
+        def run():
+            if not self.is_leader:
+                return
+            db = SessionLocal()
+            try:
+                claimed = acquire_lease(
+                    db, f"{self.name}:{job.__name__}", new_owner(), slot_ttl)
+            finally:
+                db.close()
+            if claimed:
+                job()
+
+        return run
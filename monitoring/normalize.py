@@ -0,0 +1,130 @@
+import re
+from urllib.parse import urlparse
+
+
+CURRENCY_SYMBOLS = (("₹", "INR"), ("US$", "USD"), ("$", "USD"), ("€", "EUR"),
+                    ("£", "GBP"), ("¥", "JPY"))
+CURRENCY_CODES = {"rs": "INR", "inr": "INR", "usd": "USD", "eur": "EUR",
+                  "gbp": "GBP", "jpy": "JPY"}
+# Currency assumed when a price shows no symbol, by hostname suffix
+HOST_CURRENCIES = {
+    "amazon.in": "INR", "flipkart.com": "INR", "myntra.com": "INR",
+    "amazon.com": "USD", "amazon.co.uk": "GBP", "amazon.de": "EUR",
+    "amazon.fr": "EUR", "amazon.co.jp": "JPY",
+}
+# Currencies whose prices write "1.299,00" rather than "1,299.00"
+DECIMAL_COMMA_CURRENCIES = {"EUR"}
+
+_NUMBER = re.compile(r"\d[\d.,\s]*")
+_RATING = re.compile(r"\d+(?:[.,]\d+)?")
+_CURRENCY_CODE = re.compile(r"\b(" + "|".join(CURRENCY_CODES) + r")\b", re.IGNORECASE)
+
+
+def host_currency(url):
+    hostname = (urlparse(url).hostname or "") if url else ""
+    for suffix, currency in HOST_CURRENCIES.items():
+        if hostname == suffix or hostname.endswith("." + suffix):
+            return currency
+    return None
+
+
+def _currency(text):
+    for symbol, currency in CURRENCY_SYMBOLS:
+        if symbol in text:
+            return currency
+    match = _CURRENCY_CODE.search(text)
+    return CURRENCY_CODES[match.group(1).lower()] if match else None
+
+
+def _to_number(digits, decimal_comma):
+    digits = re.sub(r"\s", "", digits).rstrip(".,")
+    if decimal_comma:
+        digits = digits.replace(".", "").replace(",", ".")
+    elif "," in digits and "." not in digits and re.search(r",\d{1,2}$", digits) \
+            and digits.count(",") == 1:
+        # "12,5" has no thousands grouping, so the comma is the decimal point
+        digits = digits.replace(",", ".")
+    else:
+        # "1,29,999.00" and "1,299" group thousands with commas
+        digits = digits.replace(",", "")
+    if digits.count(".") > 1:
+        digits = digits.replace(".", "")
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def parse_price(text, default_currency=None):
+    """Return ``(amount, currency)`` for a displayed price, or ``(None, None)``.
+
+    Handles currency symbols and codes, Indian and western digit grouping
+    and decimal commas; for a range such as "₹1,299 - ₹1,499" the first
+    amount is taken. Numbers pass through unchanged.
+    """
+    if text is None:
+        return None, None
+    if isinstance(text, (int, float)):
+        return float(text), default_currency
+    match = _NUMBER.search(text)
+    if not match:
+        return None, None
+    currency = _currency(text) or default_currency
+    amount = _to_number(match.group(), currency in DECIMAL_COMMA_CURRENCIES)
+    return amount, currency if amount is not None else None
+
+
+def parse_rating(text):
+    """Return a rating such as "4.3 out of 5 stars" as ``4.3``, else ``None``."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _RATING.search(text)
+    if not match:
+        return None
+    rating = float(match.group().replace(",", "."))
+    return rating if 0 <= rating <= 5 else None
+
+
+def _format_rating(rating):
+    # customer_rating is a string column shared with the PHP app
+    return None if rating is None else f"{rating:g}"
+
+
+def normalize_product(product):
+    """Return ``product`` with numeric prices, a ``currency`` and a plain rating."""
+    return normalize_products([product])[0]
+
+
+def normalize_products(products):
+    """Normalize a whole chunk of scraped products at once.
+
+    Scraped chunks repeat the same strings ("MRP not available", common
+    price points, ratings), so each distinct string is parsed once per
+    call and the rest are dictionary lookups.
+    """
+    # Plain Python on purpose, although pandas is pinned: parsing depends on
+    # each value's currency, so a Series would still run these regexes per
+    # element, and chunks of a few hundred rows don't amortize a DataFrame.
+    prices = {}
+    ratings = {}
+    normalized = []
+    for product in products:
+        default_currency = host_currency(product.get("product_tracking_url"))
+        row = dict(product)
+        currency = None
+        for field in ("price", "original_price"):
+            key = (product.get(field), default_currency)
+            parsed = prices.get(key)
+            if parsed is None:
+                parsed = prices[key] = parse_price(*key)
+            row[field] = parsed[0]
+            currency = currency or parsed[1]
+        raw_rating = product.get("customer_rating")
+        if raw_rating not in ratings:
+            ratings[raw_rating] = _format_rating(parse_rating(raw_rating))
+        row["customer_rating"] = ratings[raw_rating]
+        row["currency"] = currency
+        normalized.append(row)
+    return normalized
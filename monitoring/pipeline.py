@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from BackgroundMonitoring import scrape_product_data, prefetch_selectors
+import monitoring.alerts  # noqa: F401  registers the price drop notifications
+from monitoring.digests import page_digest, fields_digest
+from monitoring import snapshots
+from monitoring.engine import ScrapeEngine
+from monitoring.planner import credit_cost, record_credits
+from monitoring.schedule import (
+    load_cart_counts, next_check_state, reschedule_products, retry_state)
+from monitoring.singleflight import SCRAPE_RESULT_TTL, SingleFlight
+from monitoring.state import load_scrape_states
+from monitoring.writer import ProductBatchWriter
+
+
+async def scrape_products(db: Session, chunks, budget=None, progress=None,
+                          extract_executor=None):
+    """Fetch, extract and store every product in ``chunks``.
+
+    ``chunks`` yields lists of ``(product_id, product_tracking_url)``.
+    With a ScraperAPI credit ``budget``, products that no longer fit are
+    deferred rather than fetched. ``progress`` is a dict kept up to date
+    with the engine's counts during the run. ``extract_executor``
+    overrides ``SCRAPE_EXTRACT_EXECUTOR`` for this run. Returns the run summary; if
+    the run is cancelled, results already scraped are still written.
+    """
+    states = {}
+    cart_counts = {}
+    skipped = {"parses_skipped": 0, "writes_skipped": 0, "selector_lookups": 0}
+    credits = {"credits_spent": 0, "deferred_product_ids": []}
+    writer = ProductBatchWriter(db, failure_state=retry_state)
+    host_deferred = {}
+    parsed = SingleFlight(ttl=SCRAPE_RESULT_TTL)
+
+    async with ScrapeEngine() as engine:
+        async def products():
+            # Load per-chunk state just before its products are fetched
+            for chunk in chunks:
+                if budget is not None:
+                    chunk = _within_budget(chunk, budget, credits)
+                    if not chunk:
+                        continue
+                product_ids = [product_id for product_id, _ in chunk]
+                states.update(load_scrape_states(db, product_ids))
+                cart_counts.update(load_cart_counts(db, product_ids))
+                # Don't hold a transaction open while pages are in flight
+                db.commit()
+                skipped["selector_lookups"] += await prefetch_selectors(
+                    [product_url for _, product_url in chunk], engine.session)
+                for item in chunk:
+                    yield item
+
+        async def handle(product_id, product_url, status_code, page_html):
+            stored = states.pop(product_id, None)
+            carts = cart_counts.pop(product_id, 0)
+            if status_code != 200:
+                writer.add(product_id, state=retry_state())
+                raise Exception(f"ScraperAPI returned {status_code}")
+
+            new_page = page_digest(page_html)
+            if snapshots.snapshot_store is not None:
+                # Kept so markup changes can be re-extracted without refetching;
+                # compressing and writing it happens off the event loop
+                await asyncio.to_thread(snapshots.snapshot_store.save,
+                                        product_id, product_url, page_html, new_page)
+            if stored is not None and new_page == stored.page_digest:
+                skipped["parses_skipped"] += 1
+                writer.add(product_id, state=next_check_state(
+                    stored, stored.last_price, carts))
+                return
+
+            # Copies of one page (e.g. a product still listed twice) parse once
+            product = await parsed.do(new_page, lambda: scrape_product_data(
+                page_html, product_url, engine.session, extract_executor))
+            if product:
+                product = {**product, "product_tracking_url": product_url,
+                           "slug": product_url}
+            if not product:
+                writer.add(product_id, state=retry_state())
+                raise Exception("No product data extracted")
+
+            new_fields = fields_digest(product)
+            state = {
+                "page_digest": new_page,
+                "fields_digest": new_fields,
+                **next_check_state(stored, product.get("price"), carts),
+            }
+            if stored is not None and new_fields == stored.fields_digest:
+                skipped["writes_skipped"] += 1
+                writer.add(product_id, state=state)
+                return
+            writer.add(product_id, product, state)
+
+        def defer(product_id, product_url, retry_at):
+            # Not fetched, so its credit goes back to the budget
+            credits["credits_spent"] -= credit_cost(product_url)
+            states.pop(product_id, None)
+            cart_counts.pop(product_id, 0)
+            if retry_at is not None:
+                host_deferred[product_id] = datetime.utcfromtimestamp(retry_at)
+
+        summary = {} if progress is None else progress
+        try:
+            await engine.run(products(), handle, summary, defer)
+        finally:
+            writer.flush()
+            reschedule_products(db, host_deferred)
+            if snapshots.snapshot_store is not None:
+                snapshots.snapshot_store.commit()
+            record_credits(db, credits["credits_spent"])
+        summary["written"] = writer.written
+        summary["write_failures"] = len(writer.failed)
+        summary.update(skipped)
+
+    summary.update(credits)
+    print(f"Scrape finished: {summary}")
+    return summary
+
+
+def _within_budget(chunk, budget, credits):
+    allowed = []
+    for product_id, product_url in chunk:
+        cost = credit_cost(product_url)
+        if credits["credits_spent"] + cost > budget:
+            credits["deferred_product_ids"].append(product_id)
+            continue
+        credits["credits_spent"] += cost
+        allowed.append((product_id, product_url))
+    return allowed
@@ -0,0 +1,209 @@
+import math
+import os
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from DB.models import (
+    CocartProduct, Product, ProductScrapeState, ScraperCreditUsage, ScrapeWorkerWindow)
+
+
+SCRAPER_API_CREDITS_PER_PERIOD = int(os.getenv("SCRAPER_API_CREDITS_PER_PERIOD", "100000"))
+SCRAPER_API_PERIOD_DAYS = int(os.getenv("SCRAPER_API_PERIOD_DAYS", "30"))
+SCRAPER_API_DEFAULT_CREDITS = int(os.getenv("SCRAPER_API_DEFAULT_CREDITS", "1"))
+# Per-host request cost as "keyword=credits" pairs, e.g. "amazon=5,flipkart=1"
+SCRAPER_API_HOST_CREDITS = {
+    keyword.strip(): int(cost)
+    for keyword, cost in (
+        pair.split("=") for pair in
+        os.getenv("SCRAPER_API_HOST_CREDITS", "").split(",") if "=" in pair
+    )
+}
+
+# A product never checked counts as this stale
+NEVER_CHECKED_DAYS = 30
+# How much a price close to a user's target raises the value of a check
+WATCH_WEIGHT = 2.0
+
+
+def credit_cost(product_url):
+    hostname = urlparse(product_url).hostname or ""
+    for keyword, cost in SCRAPER_API_HOST_CREDITS.items():
+        if keyword in hostname:
+            return cost
+    return SCRAPER_API_DEFAULT_CREDITS
+
+
+def expected_value(candidate, now):
+    """Relative value of refreshing a product now.
+
+    Grows with staleness and with the number of carts holding the product,
+    and sharply when the last known price is close to a user's target
+    (``watch_gap`` is the relative distance to the nearest target).
+    """
+    last_checked_at = candidate.get("last_checked_at")
+    if last_checked_at is None:
+        stale_days = NEVER_CHECKED_DAYS
+    else:
+        stale_days = max(0.0, (now - last_checked_at).total_seconds() / 86400)
+    value = (1 + stale_days) * (1 + math.log1p(candidate.get("cart_count") or 0))
+    watch_gap = candidate.get("watch_gap")
+    if watch_gap is not None:
+        value *= 1 + WATCH_WEIGHT / (abs(watch_gap) + 0.05)
+    return value
+
+
+def plan_scrape(candidates, budget, now=None):
+    """Split candidates into those to scrape within ``budget`` and the rest.
+
+    Candidates are dicts with ``product_id`` and ``product_url``, plus the
+    optional ``last_checked_at``, ``cart_count`` and ``watch_gap`` signals.
+    They are ranked by expected value per credit and picked greedily while
+    credits remain. Returns ``(selected, deferred, credits)``, with both
+    lists in rank order.
+    """
+    now = now or datetime.utcnow()
+    ranked = []
+    for candidate in candidates:
+        cost = credit_cost(candidate["product_url"])
+        ranked.append((expected_value(candidate, now) / cost, cost, candidate))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+
+    selected, deferred = [], []
+    credits = 0
+    for _, cost, candidate in ranked:
+        if credits + cost <= budget:
+            selected.append(candidate)
+            credits += cost
+        else:
+            deferred.append(candidate)
+    return selected, deferred, credits
+
+
+def load_cart_signals(db: Session, product_ids):
+    """Return ``{product_id: (cart_count, watch_gap)}`` in one grouped query.
+
+    ``watch_gap`` is the current price's relative distance above the
+    lowest live target price (negative once it is below), or None when no
+    cart entry watches the product.
+    """
+    live_target = case((and_(CocartProduct.deleted_at.is_(None),
+                             CocartProduct.is_bought.is_(False)),
+                        CocartProduct.target_price))
+    rows = (
+        db.query(CocartProduct.product_id, func.count(CocartProduct.id),
+                 func.min(live_target), Product.price)
+        .join(Product, Product.id == CocartProduct.product_id)
+        .filter(CocartProduct.product_id.in_(product_ids))
+        .group_by(CocartProduct.product_id, Product.price)
+    )
+    signals = {}
+    for product_id, cart_count, target_price, price in rows:
+        watch_gap = None
+        if target_price and price is not None:
+            watch_gap = (price - target_price) / target_price
+        signals[product_id] = (cart_count, watch_gap)
+    return signals
+
+
+def load_candidates(db: Session, products):
+    """Attach planning signals to ``(product_id, product_url)`` pairs."""
+    product_ids = [product_id for product_id, _ in products]
+    last_checked = dict(
+        db.query(ProductScrapeState.product_id, ProductScrapeState.last_checked_at)
+        .filter(ProductScrapeState.product_id.in_(product_ids))
+    )
+    signals = load_cart_signals(db, product_ids)
+    return [
+        {
+            "product_id": product_id,
+            "product_url": product_url,
+            "last_checked_at": last_checked.get(product_id),
+            "cart_count": signals.get(product_id, (0, None))[0],
+            "watch_gap": signals.get(product_id, (0, None))[1],
+        }
+        for product_id, product_url in products
+    ]
+
+
+def current_period(now=None):
+    now = now or datetime.utcnow()
+    period = timedelta(days=SCRAPER_API_PERIOD_DAYS)
+    start = datetime(1970, 1, 1) + period * ((now - datetime(1970, 1, 1)) // period)
+    return start, start + period
+
+
+def remaining_credits(db: Session, now=None):
+    period_start, _ = current_period(now)
+    used = db.query(ScraperCreditUsage.credits_used).filter_by(
+        period_start=period_start).scalar() or 0
+    return max(0, SCRAPER_API_CREDITS_PER_PERIOD - used)
+
+
+def tick_budget(db: Session, tick, now=None):
+    """Credits one scheduler tick may spend, pacing the rest of the period."""
+    now = now or datetime.utcnow()
+    _, period_end = current_period(now)
+    ticks_left = max(1, math.ceil((period_end - now) / tick))
+    return math.ceil(remaining_credits(db, now) / ticks_left)
+
+
+def record_credits(db: Session, credits, now=None):
+    period_start, _ = current_period(now)
+    for _ in range(2):
+        updated = db.query(ScraperCreditUsage).filter_by(
+            period_start=period_start).update(
+                {"credits_used": ScraperCreditUsage.credits_used + credits},
+                synchronize_session=False)
+        if updated:
+            db.commit()
+            return
+        db.add(ScraperCreditUsage(period_start=period_start, credits_used=credits))
+        try:
+            db.commit()
+            return
+        except IntegrityError:
+            # Another worker started the period first; add to its row
+            db.rollback()
+
+
+def window_allowance(db: Session, window, tick, now=None):
+    """Return ``(allowance, remaining_at_start)`` of a paced worker window.
+
+    The first worker to ask inserts the window with its ``tick_budget``
+    and the period's remaining credits; the others read that row back,
+    so every worker charges against the same allowance.
+    """
+    row = db.get(ScrapeWorkerWindow, window)
+    if row is None:
+        record_credits(db, 0, now)
+        db.query(ScrapeWorkerWindow).filter(ScrapeWorkerWindow.window < window).delete()
+        row = ScrapeWorkerWindow(window=window, allowance=tick_budget(db, tick, now),
+                                 remaining_at_start=remaining_credits(db, now))
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            row = db.get(ScrapeWorkerWindow, window)
+    return row.allowance, row.remaining_at_start
+
+
+def reserve_credits(db: Session, credits, keep, now=None):
+    """Record ``credits`` unless fewer than ``keep`` would remain in the period.
+
+    The check and the increment are one conditional UPDATE, so workers
+    reserving at the same time cannot both pass it. Returns whether the
+    credits were recorded.
+    """
+    period_start, _ = current_period(now)
+    reserved = db.query(ScraperCreditUsage).filter(
+        ScraperCreditUsage.period_start == period_start,
+        ScraperCreditUsage.credits_used + credits <= SCRAPER_API_CREDITS_PER_PERIOD - keep,
+    ).update({"credits_used": ScraperCreditUsage.credits_used + credits},
+             synchronize_session=False)
+    db.commit()
+    return bool(reserved)
@@ -0,0 +1,166 @@
+import math
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, literal, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from DB.models import CocartProduct, Product, ProductScrapeState
+
+
+SCRAPE_MIN_INTERVAL_HOURS = float(os.getenv("SCRAPE_MIN_INTERVAL_HOURS", "6"))
+SCRAPE_MAX_INTERVAL_HOURS = float(os.getenv("SCRAPE_MAX_INTERVAL_HOURS", str(24 * 30)))
+SCRAPE_FAILURE_RETRY_HOURS = float(os.getenv("SCRAPE_FAILURE_RETRY_HOURS", "12"))
+SCRAPE_MAX_PER_TICK = int(os.getenv("SCRAPE_MAX_PER_TICK", "5000"))
+# Newest product ids checked for a missing scrape state on each tick
+SCRAPE_NEW_PRODUCT_WINDOW = int(os.getenv("SCRAPE_NEW_PRODUCT_WINDOW", "10000"))
+
+# Weight of the latest check in the price-change moving average
+CHANGE_RATE_ALPHA = 0.3
+# How strongly cart popularity shortens the interval
+POPULARITY_WEIGHT = 0.5
+
+
+def update_change_rate(change_rate, changed):
+    if change_rate is None:
+        change_rate = 0.5
+    return CHANGE_RATE_ALPHA * float(changed) + (1 - CHANGE_RATE_ALPHA) * change_rate
+
+
+def refresh_interval(change_rate, cart_count=0,
+                     min_hours=SCRAPE_MIN_INTERVAL_HOURS,
+                     max_hours=SCRAPE_MAX_INTERVAL_HOURS):
+    """Time until the next check of a product.
+
+    A product whose price changed on every recent check is refreshed at
+    ``min_hours``, one that never changes drifts out to ``max_hours``, and
+    the interval shrinks further the more carts reference the product.
+    """
+    hours = max_hours - (max_hours - min_hours) * change_rate
+    hours /= 1 + POPULARITY_WEIGHT * math.log1p(cart_count)
+    return timedelta(hours=min(max_hours, max(min_hours, hours)))
+
+
+def next_check_state(stored, new_price, cart_count, now=None):
+    """Scheduling columns for a product that was just checked."""
+    now = now or datetime.utcnow()
+    last_price = stored.last_price if stored is not None else None
+    change_rate = stored.change_rate if stored is not None else None
+    changed = (last_price is not None and new_price is not None
+               and str(new_price) != last_price)
+    change_rate = update_change_rate(change_rate, changed)
+    return {
+        "last_price": str(new_price) if new_price is not None else last_price,
+        "change_rate": change_rate,
+        "next_check_at": now + refresh_interval(change_rate, cart_count),
+    }
+
+
+def retry_state(now=None):
+    now = now or datetime.utcnow()
+    return {"next_check_at": now + timedelta(hours=SCRAPE_FAILURE_RETRY_HOURS)}
+
+
+_reschedule = (
+    update(ProductScrapeState.__table__)
+    .where(ProductScrapeState.__table__.c.product_id == bindparam("b_product_id"))
+    .values(next_check_at=bindparam("b_next_check_at"))
+)
+
+
+def reschedule_products(db: Session, next_checks):
+    """Move ``{product_id: next_check_at}`` without marking them checked.
+
+    Products without a scrape state row get one.
+    """
+    if not next_checks:
+        return
+    try:
+        existing = {
+            product_id for (product_id,) in db.query(ProductScrapeState.product_id)
+            .filter(ProductScrapeState.product_id.in_(list(next_checks)))
+        }
+        updates = [
+            {"b_product_id": product_id, "b_next_check_at": next_check_at}
+            for product_id, next_check_at in next_checks.items()
+            if product_id in existing
+        ]
+        inserts = [
+            {"product_id": product_id, "next_check_at": next_check_at}
+            for product_id, next_check_at in next_checks.items()
+            if product_id not in existing
+        ]
+        if updates:
+            db.execute(_reschedule, updates)
+        if inserts:
+            db.execute(insert(ProductScrapeState), inserts)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"Error rescheduling {len(next_checks)} products: {e}")
+
+
+def load_cart_counts(db: Session, product_ids):
+    return dict(
+        db.query(CocartProduct.product_id, func.count(CocartProduct.id))
+        .filter(CocartProduct.product_id.in_(product_ids))
+        .group_by(CocartProduct.product_id)
+    )
+
+
+def due_products(db: Session, now=None, limit=SCRAPE_MAX_PER_TICK):
+    """``(product_id, product_tracking_url)`` due for a refresh, most overdue first.
+
+    Served by the index on ``product_scrape_states.next_check_at``.
+    """
+    now = now or datetime.utcnow()
+    return [
+        (product_id, product_url)
+        for product_id, product_url in (
+            db.query(Product.id, Product.product_tracking_url)
+            .join(ProductScrapeState, ProductScrapeState.product_id == Product.id)
+            .filter(ProductScrapeState.next_check_at <= now,
+                    Product.product_tracking_url.isnot(None))
+            .order_by(ProductScrapeState.next_check_at)
+            .limit(limit)
+        )
+    ]
+
+
+def _insert_missing_states(db: Session, products, now, what):
+    missing = (
+        select(products.c.id, literal(now), literal(0.5))
+        .outerjoin(ProductScrapeState, ProductScrapeState.product_id == products.c.id)
+        .where(ProductScrapeState.product_id.is_(None))
+    )
+    try:
+        db.execute(insert(ProductScrapeState).from_select(
+            ["product_id", "next_check_at", "change_rate"], missing))
+        db.commit()
+    except SQLAlchemyError as e:
+        # e.g. a product added concurrently got its row first; the next run retries
+        db.rollback()
+        print(f"Error backfilling scrape states of {what}: {e}")
+
+
+def backfill_scrape_states(db: Session, now=None):
+    """Give every product without a scrape state row one that is due now.
+
+    Scans the whole catalog, so it runs once (backfill_scrape_states.py,
+    dedupe_products.py) rather than on the scheduler tick.
+    """
+    products = select(Product.id).subquery()
+    _insert_missing_states(db, products, now or datetime.utcnow(), "the catalog")
+
+
+def schedule_new_products(db: Session, now=None, window=SCRAPE_NEW_PRODUCT_WINDOW):
+    """Give the newest products without a scrape state row one that is due now.
+
+    Products added through the API get their row on insert; this picks up
+    ones the PHP app inserts. Only the ``window`` highest ids are checked,
+    a primary-key range read however large the catalog is.
+    """
+    last_id = db.query(func.max(Product.id)).scalar() or 0
+    products = select(Product.id).where(Product.id > last_id - window).subquery()
+    _insert_missing_states(db, products, now or datetime.utcnow(), "new products")
@@ -0,0 +1,148 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+
+SELECTOR_CACHE_TTL = int(os.getenv("SELECTOR_CACHE_TTL", str(24 * 3600)))
+SELECTOR_CACHE_NEGATIVE_TTL = int(os.getenv("SELECTOR_CACHE_NEGATIVE_TTL", "3600"))
+SELECTOR_CACHE_FILE = os.getenv("SELECTOR_CACHE_FILE")
+
+_RETRY = object()
+
+
+class SelectorCache:
+    """Selector lookups keyed by hostname, with a TTL.
+
+    Hosts the selector service has nothing for are cached as ``None`` for
+    ``negative_ttl`` so they are not asked about on every product. Failed
+    lookups are not cached. With ``path`` set, entries are loaded from and
+    written back to a JSON file so a restarted process starts warm.
+    Pending lookups are shared through thread-safe futures, so event loops
+    in different threads (the scheduler's and a scrape job's) coalesce too.
+    """
+
+    def __init__(self, ttl=SELECTOR_CACHE_TTL,
+                 negative_ttl=SELECTOR_CACHE_NEGATIVE_TTL,
+                 path=SELECTOR_CACHE_FILE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self.lookups = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading selector cache: {e}")
+            return
+        now = time.time()
+        self._entries = {
+            hostname: (entry["selectors"], entry["expires_at"])
+            for hostname, entry in entries.items()
+            if entry.get("expires_at", 0) > now
+        }
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = {
+                hostname: {"selectors": selectors, "expires_at": expires_at}
+                for hostname, (selectors, expires_at) in self._entries.items()
+            }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving selector cache: {e}")
+
+    def lookup(self, hostname):
+        """Return ``(hit, selectors)`` without fetching."""
+        entry = self._entries.get(hostname)
+        if entry is None or entry[1] <= time.time():
+            return False, None
+        return True, entry[0]
+
+    def set(self, hostname, selectors):
+        ttl = self.ttl if selectors else self.negative_ttl
+        self._entries[hostname] = (selectors or None, time.time() + ttl)
+
+    def clear(self):
+        self._entries.clear()
+
+    async def get(self, hostname, fetch):
+        """Return cached selectors for ``hostname``, calling ``fetch()`` on a miss.
+
+        ``fetch`` is a coroutine function that returns the selectors, a
+        falsy value when the host has none, or raises on failure.
+        Concurrent misses for one host share a single fetch.
+        """
+        while True:
+            with self._lock:
+                hit, selectors = self.lookup(hostname)
+                if hit:
+                    return selectors
+                pending = self._pending.get(hostname)
+                leader = pending is None
+                if leader:
+                    pending = concurrent.futures.Future()
+                    self._pending[hostname] = pending
+
+            if leader:
+                return await self._lead(hostname, fetch, pending)
+            selectors = await asyncio.shield(asyncio.wrap_future(pending))
+            if selectors is not _RETRY:
+                return selectors
+            # The lookup was cancelled with its caller; let a waiter take over
+
+    async def _lead(self, hostname, fetch, pending):
+        try:
+            selectors = await self._fetch(hostname, fetch)
+        except BaseException:
+            with self._lock:
+                self._pending.pop(hostname, None)
+            pending.set_result(_RETRY)
+            raise
+        with self._lock:
+            self._pending.pop(hostname, None)
+        pending.set_result(selectors)
+        return selectors
+
+    async def _fetch(self, hostname, fetch):
+        self.lookups += 1
+        try:
+            selectors = await fetch()
+        except Exception as error:
+            print(f"Error fetching selectors for {hostname}: {error}")
+            return None
+        with self._lock:
+            self.set(hostname, selectors)
+        self.save()
+        return selectors or None
+
+    async def prefetch(self, hostnames, fetch_for):
+        """Warm the cache once per distinct hostname.
+
+        ``fetch_for(hostname)`` returns the ``fetch`` coroutine function
+        used for that host.
+        """
+        missing = {hostname for hostname in hostnames
+                   if not self.lookup(hostname)[0]}
+        await asyncio.gather(*(
+            self.get(hostname, fetch_for(hostname)) for hostname in missing))
+        return len(missing)
+
+
+selector_cache = SelectorCache()
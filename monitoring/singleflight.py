@@ -0,0 +1,167 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from DB.models import Lease
+from DB.database import SessionLocal
+from monitoring.claims import new_owner
+from monitoring.leader import acquire_lease
+from monitoring.throttle import HostUnavailable
+from monitoring.urls import canonical_url
+
+
+# Finished fetches are reused this long, to absorb bursts right after one
+SCRAPE_RESULT_TTL = float(os.getenv("SCRAPE_RESULT_TTL", "30"))
+SCRAPE_RESULT_CACHE_SIZE = int(os.getenv("SCRAPE_RESULT_CACHE_SIZE", "64"))
+# Also coordinate fetches across processes through the leases table
+SCRAPE_SHARED_FLIGHT = os.getenv("SCRAPE_SHARED_FLIGHT", "false").lower() == "true"
+SCRAPE_SHARED_FLIGHT_SECONDS = int(os.getenv("SCRAPE_SHARED_FLIGHT_SECONDS", "120"))
+SHARED_FLIGHT_PREFIX = "fetch:"
+
+_RETRY = object()
+
+
+def flight_key(product_url):
+    return canonical_url(product_url) or product_url
+
+
+class FetchedElsewhere(HostUnavailable):
+    """Raised instead of fetching while another process holds the product's lease.
+
+    That process writes the result, so the product needs no rescheduling
+    (``retry_at`` is None).
+    """
+
+    def __init__(self, product_id):
+        super().__init__(f"product {product_id}", None)
+
+
+class SingleFlight:
+    """Runs one call per key at a time and briefly keeps its result.
+
+    Callers that ask for a key while it is in flight wait for that call and
+    all get its result or exception. Results accepted by ``cache_if`` are
+    reused for ``ttl`` seconds (at most ``max_entries`` of them). Calls are
+    shared through thread-safe futures, so event loops in different
+    threads (the scheduler's and the API's) coalesce too.
+    """
+
+    def __init__(self, ttl=SCRAPE_RESULT_TTL, max_entries=SCRAPE_RESULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.executed = 0
+        self.joined = 0
+        self.cached = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._results = OrderedDict()
+
+    async def do(self, key, fn, cache_if=None):
+        """Return ``await fn()``, shared with concurrent callers of ``key``."""
+        while True:
+            with self._lock:
+                entry = self._results.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._results.move_to_end(key)
+                    self.cached += 1
+                    return entry[1]
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._inflight[key] = future
+                    self.executed += 1
+                else:
+                    self.joined += 1
+
+            if leader:
+                return await self._lead(key, fn, cache_if, future)
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not _RETRY:
+                return result
+            # The call was cancelled with its caller; let a waiter take over
+
+    async def _lead(self, key, fn, cache_if, future):
+        try:
+            result = await fn()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_result(_RETRY)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            if self.ttl > 0 and (cache_if is None or cache_if(result)):
+                self._results[key] = (time.monotonic() + self.ttl, result)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+class SharedFlight:
+    """Cross-process single-flight on top of the ``leases`` table.
+
+    ``claim`` takes a lease named after the product for ``ttl`` seconds,
+    long enough to fetch and write the page. Keying by product rather than
+    URL means the holder is always the process that writes the result.
+    The lease is not released per fetch, so it also keeps other processes
+    from refetching right afterwards. ``close`` drops this owner's leases
+    and any expired fetch leases.
+
+    Both run a database round trip in a thread, off the event loop.
+    """
+
+    def __init__(self, ttl=SCRAPE_SHARED_FLIGHT_SECONDS, session_factory=SessionLocal):
+        self.ttl = ttl
+        self.session_factory = session_factory
+        self.owner = new_owner()
+        self._claimed = False
+
+    async def claim(self, product_id):
+        if not await asyncio.to_thread(self._claim, product_id):
+            raise FetchedElsewhere(product_id)
+
+    def _claim(self, product_id):
+        self._claimed = True
+        db = self.session_factory()
+        try:
+            return acquire_lease(db, f"{SHARED_FLIGHT_PREFIX}{product_id}", self.owner, self.ttl)
+        finally:
+            db.close()
+
+    async def close(self):
+        if self._claimed:
+            await asyncio.to_thread(self._release)
+
+    def _release(self):
+        db = self.session_factory()
+        try:
+            db.query(Lease).filter(
+                Lease.name.startswith(SHARED_FLIGHT_PREFIX),
+                or_(Lease.owner == self.owner, Lease.expires_at < datetime.utcnow()),
+            ).delete(synchronize_session=False)
+            db.commit()
+            self._claimed = False
+        finally:
+            db.close()
+
+
+# Shared by every engine in the process
+page_flights = SingleFlight()
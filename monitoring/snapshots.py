@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from monitoring.digests import page_digest
+
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "true").lower() == "true"
+# Distinct page versions kept per product; the newest is never pruned by age
+SNAPSHOT_KEEP_PER_PRODUCT = int(os.getenv("SNAPSHOT_KEEP_PER_PRODUCT", "3"))
+SNAPSHOT_MAX_AGE_DAYS = float(os.getenv("SNAPSHOT_MAX_AGE_DAYS", "30"))
+SNAPSHOT_COMPRESS_LEVEL = int(os.getenv("SNAPSHOT_COMPRESS_LEVEL", "6"))
+SNAPSHOT_COMMIT_EVERY = 100
+# Blobs saved this recently are never pruned, so a page another process
+# has saved but not yet committed keeps its file
+SNAPSHOT_PRUNE_GRACE_SECONDS = int(os.getenv("SNAPSHOT_PRUNE_GRACE_SECONDS", "3600"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    product_id INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (product_id, digest)
+);
+CREATE INDEX IF NOT EXISTS snapshots_fetched_at ON snapshots (product_id, fetched_at);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    saved_at REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def blob_path(root, digest):
+    return os.path.join(root, "objects", digest[:2], digest[2:] + ".z")
+
+
+def read_blob(root, digest):
+    """Return the page stored under ``digest``; usable without an open store."""
+    with open(blob_path(root, digest), "rb") as f:
+        return zlib.decompress(f.read()).decode("utf-8")
+
+
+class SnapshotStore:
+    """Fetched product pages, zlib-compressed and addressed by page digest.
+
+    Blobs live under ``<root>/objects`` keyed by ``page_digest`` (the same
+    normalized digest used to skip unchanged pages), so a page that has
+    not changed is stored once however often it is fetched. A SQLite index
+    at ``<root>/index.db`` records which versions each product had and
+    when. ``prune()`` applies the retention limits.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, keep_per_product=SNAPSHOT_KEEP_PER_PRODUCT,
+                 max_age_days=SNAPSHOT_MAX_AGE_DAYS, level=SNAPSHOT_COMPRESS_LEVEL):
+        self.root = root
+        self.keep_per_product = keep_per_product
+        self.max_age_days = max_age_days
+        self.level = level
+        self._conn = None
+        self._uncommitted = 0
+        # Pipelines may save from the event loop and a worker thread at once
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+            self._conn = sqlite3.connect(
+                os.path.join(self.root, "index.db"), timeout=30,
+                check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(blobs)")]
+            if "saved_at" not in columns:
+                self._conn.execute(
+                    "ALTER TABLE blobs ADD COLUMN saved_at REAL NOT NULL DEFAULT 0")
+        return self._conn
+
+    def save(self, product_id, url, page_html, digest=None):
+        digest = digest or page_digest(page_html)
+        path = blob_path(self.root, digest)
+        now = time.time()
+        with self._lock:
+            # Marking the blob as used takes the index's write lock, so a
+            # prune in another process either ran before (and the blob is
+            # written again here) or waits until this batch is committed
+            reused = self.conn.execute(
+                "UPDATE blobs SET saved_at = ? WHERE digest = ?", (now, digest)).rowcount
+            if not reused or not os.path.exists(path):
+                data = page_html.encode("utf-8")
+                compressed = zlib.compress(data, self.level)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO blobs (digest, size, stored_size, saved_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (digest, len(data), len(compressed), now))
+            self.conn.execute(
+                "INSERT INTO snapshots (product_id, digest, url, fetched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (product_id, digest) DO UPDATE SET "
+                "url = excluded.url, fetched_at = excluded.fetched_at",
+                (product_id, digest, url, now))
+            self._uncommitted += 1
+            if self._uncommitted >= SNAPSHOT_COMMIT_EVERY:
+                self._commit()
+        return digest
+
+    def _commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+        self._uncommitted = 0
+
+    def commit(self):
+        with self._lock:
+            self._commit()
+
+    def load(self, digest):
+        return read_blob(self.root, digest)
+
+    def latest(self, product_ids=None):
+        """Yield ``(product_id, url, digest)`` for each product's newest snapshot."""
+        self.commit()
+        query = (
+            "SELECT s.product_id, s.url, s.digest FROM snapshots s "
+            "WHERE s.fetched_at = (SELECT MAX(fetched_at) FROM snapshots "
+            "WHERE product_id = s.product_id)"
+        )
+        params = ()
+        if product_ids is not None:
+            product_ids = list(product_ids)
+            query += f" AND s.product_id IN ({','.join('?' * len(product_ids))})"
+            params = product_ids
+        yield from self.conn.execute(query + " ORDER BY s.product_id", params)
+
+    def prune(self):
+        """Drop versions beyond the per-product and age limits, then their blobs.
+
+        Blobs saved within ``SNAPSHOT_PRUNE_GRACE_SECONDS`` are kept even
+        if no committed snapshot references them yet.
+        Returns ``(snapshots_removed, blobs_removed, bytes_freed)``.
+        """
+        with self._lock:
+            conn = self.conn
+            # Hold the write lock from the start, so no other process can
+            # start reusing a blob between the orphan query and its removal
+            self._commit()
+            conn.execute("BEGIN IMMEDIATE")
+            cutoff = time.time() - self.max_age_days * 86400
+            removed = conn.execute(
+                "DELETE FROM snapshots WHERE rowid IN ("
+                " SELECT rowid FROM ("
+                "  SELECT rowid, fetched_at, ROW_NUMBER() OVER ("
+                "   PARTITION BY product_id ORDER BY fetched_at DESC) AS version"
+                "  FROM snapshots)"
+                " WHERE version > ? OR (version > 1 AND fetched_at < ?))",
+                (self.keep_per_product, cutoff)).rowcount
+            orphans = conn.execute(
+                "SELECT digest, stored_size FROM blobs WHERE saved_at < ? AND digest NOT IN "
+                "(SELECT digest FROM snapshots)",
+                (time.time() - SNAPSHOT_PRUNE_GRACE_SECONDS,)).fetchall()
+            freed = 0
+            for digest, stored_size in orphans:
+                try:
+                    os.remove(blob_path(self.root, digest))
+                    freed += stored_size
+                except FileNotFoundError:
+                    pass
+            conn.executemany("DELETE FROM blobs WHERE digest = ?",
+                             [(digest,) for digest, _ in orphans])
+            self._commit()
+        return removed, len(orphans), freed
+
+    def stats(self):
+        self.commit()
+        snapshots, products = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT product_id) FROM snapshots").fetchone()
+        blobs, size, stored_size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) "
+            "FROM blobs").fetchone()
+        return {"snapshots": snapshots, "products": products, "blobs": blobs,
+                "bytes": size, "stored_bytes": stored_size}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+            self._uncommitted = 0
+
+
+snapshot_store = SnapshotStore() if SNAPSHOT_ENABLED else None
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from DB.models import ProductScrapeState
+
+
+def load_scrape_states(db: Session, product_ids=None):
+    """Return ``{product_id: row}`` with the digests and scheduling columns."""
+    query = db.query(
+        ProductScrapeState.product_id,
+        ProductScrapeState.page_digest,
+        ProductScrapeState.fields_digest,
+        ProductScrapeState.last_price,
+        ProductScrapeState.change_rate,
+    )
+    if product_ids is not None:
+        query = query.filter(ProductScrapeState.product_id.in_(product_ids))
+    return {row.product_id: row for row in query}
+
+
+def save_scrape_states(db: Session, states):
+    """Upsert ``{product_id: values}`` with one bulk UPDATE and one bulk INSERT.
+
+    Staged on the session; the caller commits with the product updates.
+    """
+    now = datetime.utcnow()
+    existing = {
+        product_id for (product_id,) in db.query(ProductScrapeState.product_id)
+        .filter(ProductScrapeState.product_id.in_(list(states)))
+    }
+    rows = [
+        {"product_id": product_id, "last_checked_at": now, **values}
+        for product_id, values in states.items()
+    ]
+    updates = [row for row in rows if row["product_id"] in existing]
+    inserts = [row for row in rows if row["product_id"] not in existing]
+    if updates:
+        db.execute(update(ProductScrapeState), updates)
+    if inserts:
+        db.execute(insert(ProductScrapeState), inserts)
@@ -0,0 +1,32 @@
+import asyncio
+
+from sqlalchemy.orm import Session
+
+from monitoring.claims import claim_products, new_owner, release_products, renew_leases
+from monitoring.jobqueue import job_handler
+from monitoring.jobs import run_job
+from monitoring.pipeline import scrape_products
+from monitoring.planner import remaining_credits
+
+
+SCRAPE_QUEUE = "scrape"
+
+
+@job_handler("scrape_products")
+async def scrape_products_job(db: Session, data):
+    # Lease the batch so scrape workers and the scheduler tick skip it
+    owner = new_owner()
+    claimed = claim_products(db, owner, data["product_ids"])
+    renew = asyncio.create_task(renew_leases(db, owner))
+    try:
+        if claimed:
+            await scrape_products(db, [claimed], budget=remaining_credits(db))
+    finally:
+        renew.cancel()
+        release_products(db, owner)
+
+
+@job_handler("scrape_catalog")
+async def scrape_catalog_job(db: Session, data):
+    # Started from /monitor-product; the job keeps its own session and row
+    await run_job(data["job_id"])
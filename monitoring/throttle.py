@@ -0,0 +1,175 @@
+import asyncio
+import os
+import time
+
+
+SCRAPE_HOST_RATE = float(os.getenv("SCRAPE_HOST_RATE", "5"))
+SCRAPE_HOST_MIN_RATE = float(os.getenv("SCRAPE_HOST_MIN_RATE", "0.2"))
+SCRAPE_HOST_MAX_RATE = float(os.getenv("SCRAPE_HOST_MAX_RATE", "20"))
+SCRAPE_HOST_BURST = float(os.getenv("SCRAPE_HOST_BURST", "5"))
+# Responses slower than this count against the host like a soft error
+SCRAPE_SLOW_SECONDS = float(os.getenv("SCRAPE_SLOW_SECONDS", "30"))
+# Products queued per host while they wait for its tokens
+SCRAPE_HOST_QUEUE = int(os.getenv("SCRAPE_HOST_QUEUE", "100"))
+SCRAPE_BREAKER_FAILURES = int(os.getenv("SCRAPE_BREAKER_FAILURES", "5"))
+SCRAPE_BREAKER_COOLDOWN = float(os.getenv("SCRAPE_BREAKER_COOLDOWN", "60"))
+SCRAPE_BREAKER_MAX_COOLDOWN = float(os.getenv("SCRAPE_BREAKER_MAX_COOLDOWN", "1800"))
+
+RATE_INCREASE = 0.5
+RATE_DECREASE = 0.5
+# Errors from requests already in flight only cut the rate once
+DECREASE_INTERVAL = 1.0
+
+
+class HostUnavailable(Exception):
+    """Raised instead of fetching while a host's breaker is open."""
+
+    def __init__(self, hostname, retry_at):
+        super().__init__(f"{hostname} unavailable")
+        self.hostname = hostname
+        # Wall-clock time at which the host may be tried again
+        self.retry_at = retry_at
+
+
+def is_host_error(status):
+    return status == 429 or status >= 500
+
+
+class HostThrottle:
+    """Token bucket whose rate adapts to a host's responses, plus a breaker.
+
+    Successes add ``RATE_INCREASE`` requests/s, errors and slow responses
+    multiply the rate by ``RATE_DECREASE`` (AIMD). A throttled but
+    healthy host only makes callers wait for their token. After
+    ``failures_to_trip`` consecutive errors the breaker opens and the host
+    is not requested until the cooldown passes; then a single probe is let
+    through, and each failed probe doubles the cooldown.
+    """
+
+    def __init__(self, hostname, rate=SCRAPE_HOST_RATE,
+                 min_rate=SCRAPE_HOST_MIN_RATE, max_rate=SCRAPE_HOST_MAX_RATE,
+                 burst=SCRAPE_HOST_BURST, slow_seconds=SCRAPE_SLOW_SECONDS,
+                 failures_to_trip=SCRAPE_BREAKER_FAILURES,
+                 cooldown=SCRAPE_BREAKER_COOLDOWN,
+                 max_cooldown=SCRAPE_BREAKER_MAX_COOLDOWN):
+        self.hostname = hostname
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.slow_seconds = slow_seconds
+        self.failures_to_trip = failures_to_trip
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.decreased = 0.0
+        self.failures = 0
+        self.opened_until = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_until is None:
+            return "closed"
+        if time.monotonic() < self.opened_until or self.probing:
+            return "open"
+        return "half-open"
+
+    def _check_breaker(self):
+        if self.opened_until is None:
+            return False
+        now = time.monotonic()
+        if now < self.opened_until or self.probing:
+            wait = max(self.opened_until - now, 0)
+            raise HostUnavailable(self.hostname, time.time() + wait)
+        return True
+
+    async def acquire(self):
+        """Reserve the next request token, waiting until it is due.
+
+        Raises ``HostUnavailable`` only while the breaker is open.
+        """
+        probe = self._check_breaker()
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        # Tokens may go negative; later callers queue behind this reservation
+        self.tokens -= 1
+        if probe:
+            # Half-open: this caller is the probe
+            self.probing = True
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+                if not probe:
+                    self._check_breaker()
+            except BaseException:
+                if probe:
+                    self.probing = False
+                raise
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.decreased >= DECREASE_INTERVAL:
+            self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+            self.decreased = now
+
+    def record(self, status=None, latency=0.0):
+        """Feed back one outcome; ``status=None`` means the request raised."""
+        failed = status is None or is_host_error(status)
+        if failed:
+            self._decrease()
+            self.failures += 1
+            if self.probing or self.failures >= self.failures_to_trip:
+                self._trip()
+            return
+        if latency > self.slow_seconds:
+            self._decrease()
+        else:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+        self.failures = 0
+        if self.opened_until is not None and self.probing:
+            self.opened_until = None
+            self.probing = False
+            self.cooldown = self.base_cooldown
+
+    def _trip(self):
+        if self.probing:
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        self.opened_until = time.monotonic() + self.cooldown
+        self.probing = False
+        self.failures = 0
+        # Start slow once the host is let back in
+        self.tokens = 0
+        print(f"Circuit opened for {self.hostname} for {self.cooldown:.0f}s")
+
+    def to_dict(self):
+        return {"state": self.state, "rate": round(self.rate, 2),
+                "failures": self.failures}
+
+
+class HostThrottles:
+    def __init__(self, **settings):
+        self.settings = settings
+        self._hosts = {}
+
+    def get(self, hostname):
+        throttle = self._hosts.get(hostname)
+        if throttle is None:
+            throttle = HostThrottle(hostname, **self.settings)
+            self._hosts[hostname] = throttle
+        return throttle
+
+    def clear(self):
+        self._hosts.clear()
+
+    def to_dict(self):
+        return {hostname: throttle.to_dict() for hostname, throttle in self._hosts.items()}
+
+
+# Shared by every engine in the process so a tripped host stays tripped
+# across scrape runs and worker batches
+host_throttles = HostThrottles()
@@ -0,0 +1,86 @@
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# Query parameters that only track where a click came from, on any site
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid"}
+TRACKING_PREFIXES = ("utm_",)
+
+# Marketplace parameters; elsewhere names like "store" or "ref" can matter
+AMAZON_TRACKING_PARAMS = {
+    "ref", "ref_", "tag", "linkcode", "linkid", "camp", "creative",
+    "creativeasin", "ascsubtag", "psc", "smid", "th", "qid", "sr", "keywords",
+    "crid", "sprefix", "content-id", "_encoding",
+}
+AMAZON_TRACKING_PREFIXES = ("pf_rd_", "pd_rd_", "ref_")
+FLIPKART_TRACKING_PARAMS = {
+    "affid", "lid", "marketplace", "store", "srno", "otracker", "otracker1",
+    "fm", "iid", "ssid", "ppt", "ppn", "spotlighttagid", "_refresh", "_appid",
+    "cmpid",
+}
+FLIPKART_TRACKING_PREFIXES = ("affextparam",)
+
+AMAZON_ASIN = re.compile(
+    r"/(?:dp|gp/product|gp/aw/d|exec/obidos/asin|o/asin)/([A-Z0-9]{10})(?:[/?]|$)",
+    re.IGNORECASE)
+FLIPKART_ITEM = re.compile(r"/p/(itm[0-9a-z]+)", re.IGNORECASE)
+
+
+def _amazon_host(hostname):
+    return hostname == "amazon" or ".amazon." in f".{hostname}"
+
+
+def _flipkart_host(hostname):
+    return hostname in ("flipkart.com", "dl.flipkart.com")
+
+
+def _is_tracking(name, hostname):
+    name = name.lower()
+    if name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES):
+        return True
+    if _amazon_host(hostname):
+        return name in AMAZON_TRACKING_PARAMS or name.startswith(AMAZON_TRACKING_PREFIXES)
+    if _flipkart_host(hostname):
+        return name in FLIPKART_TRACKING_PARAMS or name.startswith(FLIPKART_TRACKING_PREFIXES)
+    return False
+
+
+def canonical_url(url):
+    """Return one URL per product, whatever links users paste for it.
+
+    Amazon links reduce to ``/dp/<ASIN>`` on the marketplace's host and
+    Flipkart links to the item id plus ``pid``. Any other URL keeps its
+    path but loses the fragment, tracking parameters and parameter order;
+    marketplace tracking parameters are only dropped on their own hosts.
+    """
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    hostname = (parts.hostname or "").lower()
+    if not hostname:
+        return None
+    if hostname.startswith(("m.", "www.")):
+        hostname = hostname.split(".", 1)[1]
+    query = parse_qsl(parts.query, keep_blank_values=True)
+
+    if _amazon_host(hostname):
+        match = AMAZON_ASIN.search(parts.path)
+        if match:
+            return f"https://www.{hostname}/dp/{match.group(1).upper()}"
+
+    if _flipkart_host(hostname):
+        match = FLIPKART_ITEM.search(parts.path)
+        pid = dict(query).get("pid")
+        if match or pid:
+            path = f"/p/{match.group(1).lower()}" if match else "/p/"
+            return f"https://www.flipkart.com{path}" + (f"?pid={pid.upper()}" if pid else "")
+
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/") or "/"
+    query = sorted((name, value) for name, value in query
+                   if not _is_tracking(name, hostname))
+    return urlunsplit(("https", hostname, path, urlencode(query), ""))
+
+
+def url_hash(canonical):
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest() if canonical else None
@@ -0,0 +1,110 @@
+import os
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from DB.models import Product, ProductImage
+from monitoring.history import load_current_prices, price_changes, record_price_changes
+from monitoring.normalize import normalize_products
+from monitoring.state import save_scrape_states
+
+
+SCRAPE_WRITE_BATCH_SIZE = int(os.getenv("SCRAPE_WRITE_BATCH_SIZE", "100"))
+
+PRODUCT_FIELDS = ("name", "original_price", "price", "currency",
+                  "customer_rating", "product_tracking_url", "slug")
+
+_image_update = (
+    update(ProductImage.__table__)
+    .where(ProductImage.__table__.c.product_id == bindparam("b_product_id"))
+    .values(image=bindparam("b_image"))
+)
+
+
+class ProductBatchWriter:
+    """Collects scrape results and writes them in chunks.
+
+    Prices and ratings are normalized for the whole chunk at once (see
+    ``normalize_products``). Each flush issues one executemany UPDATE for
+    products, one for images and one for scrape state, appends the price
+    changes found against the stored prices to the price history, then
+    commits once. If the chunk fails it is rolled back and retried row by
+    row inside savepoints, so a bad row is recorded in ``failed`` and the
+    rest of the chunk still commits. For a failed row, ``failure_state()``
+    (if given) is stored as its scrape state instead.
+    """
+
+    def __init__(self, db: Session, batch_size=SCRAPE_WRITE_BATCH_SIZE,
+                 failure_state=None):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.failure_state = failure_state
+        self.pending = []
+        self.written = 0
+        self.failed = []
+
+    def add(self, product_id, product=None, state=None):
+        """Queue a product update; ``product=None`` only records ``state``."""
+        self.pending.append((product_id, product, state))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        try:
+            self._write(rows)
+            self.db.commit()
+            self.written += len(rows)
+            return
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            print(f"Batch write of {len(rows)} rows failed, retrying one by one: "
+                  f"{getattr(e, 'orig', None) or e}")
+
+        for row in rows:
+            try:
+                with self.db.begin_nested():
+                    self._write([row])
+                self.written += 1
+            except SQLAlchemyError as e:
+                error = str(getattr(e, 'orig', None) or e)
+                self.failed.append((row[0], error))
+                print(f"Error updating product_id {row[0]}: {error}")
+                if self.failure_state is not None:
+                    try:
+                        with self.db.begin_nested():
+                            self._write([(row[0], None, self.failure_state())])
+                    except SQLAlchemyError as e:
+                        print(f"Error saving scrape state for product_id {row[0]}: {e}")
+        self.db.commit()
+
+    def _write(self, rows):
+        scraped = [(product_id, product) for product_id, product, _ in rows if product]
+        normalized = normalize_products([product for _, product in scraped])
+        products = [
+            {"id": product_id,
+             **{field: product.get(field) for field in PRODUCT_FIELDS}}
+            for (product_id, _), product in zip(scraped, normalized)
+        ]
+        if products:
+            # Compare against the stored prices before they are overwritten
+            changes = price_changes(
+                load_current_prices(self.db, [row["id"] for row in products]),
+                {row["id"]: row for row in products})
+            self.db.execute(update(Product), products)
+            record_price_changes(self.db, changes)
+
+        images = [
+            {"b_product_id": product_id, "b_image": product.get("image")}
+            for product_id, product, _ in rows
+            if product and product.get("image")
+        ]
+        if images:
+            self.db.execute(_image_update, images)
+
+        states = {product_id: state for product_id, _, state in rows if state}
+        if states:
+            save_scrape_states(self.db, states)
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+
+from DB.database import SessionLocal
+from monitoring.jobqueue import run_worker
+import monitoring.tasks  # noqa: F401 - registers the job handlers
+
+
+async def main(queues, batch_size, poll_seconds, once=False):
+    print(f"Queue worker started on {', '.join(queues)}")
+    db = SessionLocal()
+    try:
+        await run_worker(db, queues, batch_size, poll_seconds, once)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run jobs from the database queue")
+    parser.add_argument("--queue", action="append", dest="queues",
+                        help="queue to work, in priority order (repeatable); "
+                             "names are prefixed with JOB_QUEUE_PREFIX")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--poll-seconds", type=float, default=3)
+    parser.add_argument("--once", action="store_true",
+                        help="exit when the queues are empty")
+    args = parser.parse_args()
+    asyncio.run(main(args.queues or ["scrape", "default"], args.batch_size,
+                     args.poll_seconds, args.once))
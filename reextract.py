@@ -0,0 +1,108 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+from BackgroundMonitoring import extract_product_data
+from DB.database import SessionLocal
+from DB.models import Product
+from monitoring.catalog import chunked
+from monitoring.extractors import find_extractor
+from monitoring.selector_cache import selector_cache
+from monitoring.snapshots import SnapshotStore, SNAPSHOT_DIR, read_blob
+from monitoring.writer import ProductBatchWriter
+
+
+def _extract(item):
+    # Runs in a pool process: read the snapshot and extract, no network
+    product_id, url, digest, selectors, root = item
+    try:
+        page_html = read_blob(root, digest)
+    except OSError as e:
+        return product_id, None, f"Missing snapshot {digest}: {e}"
+    try:
+        return product_id, extract_product_data(page_html, url, selectors), None
+    except Exception as e:
+        return product_id, None, str(e)
+
+
+def reextract(db, store, workers=None, batch_size=1000, hosts=None,
+              product_ids=None, dry_run=False):
+    """Re-run extraction over each product's latest snapshot and store the fields."""
+    summary = {"products": 0, "written": 0, "failed": 0,
+               "no_selectors": 0, "missing_products": 0}
+    started = time.perf_counter()
+    writer = ProductBatchWriter(db)
+    snapshots = list(store.latest(product_ids))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunked(snapshots, batch_size):
+            items = []
+            for product_id, url, digest in chunk:
+                hostname = urlparse(url).hostname
+                if hosts and hostname not in hosts:
+                    continue
+                selectors = None
+                if find_extractor(hostname) is None:
+                    # Only selectors already cached; re-extraction stays offline
+                    hit, selectors = selector_cache.lookup(hostname)
+                    if not selectors:
+                        summary["no_selectors"] += 1
+                        continue
+                items.append((product_id, url, digest, selectors, store.root))
+
+            existing = {
+                product_id for (product_id,) in db.query(Product.id)
+                .filter(Product.id.in_([item[0] for item in items]))
+            }
+            db.commit()
+            summary["missing_products"] += len(items) - len(existing)
+            items = [item for item in items if item[0] in existing]
+
+            chunksize = max(1, len(items) // ((workers or os.cpu_count() or 1) * 4))
+            for product_id, product, error in pool.map(_extract, items, chunksize=chunksize):
+                summary["products"] += 1
+                if not product:
+                    summary["failed"] += 1
+                    print(f"Error re-extracting product_id {product_id}: {error}")
+                    continue
+                if not dry_run:
+                    writer.add(product_id, product)
+    writer.flush()
+
+    summary["written"] = writer.written
+    summary["failed"] += len(writer.failed)
+    summary["elapsed"] = round(time.perf_counter() - started, 2)
+    print(f"Re-extraction finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-extract product fields from stored page snapshots")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="extraction processes (default: one per core)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--host", action="append", dest="hosts",
+                        help="only products on this hostname (repeatable)")
+    parser.add_argument("--product-id", type=int, action="append", dest="product_ids")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="extract but don't write to the database")
+    parser.add_argument("--prune", action="store_true",
+                        help="apply snapshot retention limits and exit")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.snapshot_dir)
+    if args.prune:
+        removed, blobs, freed = store.prune()
+        print(f"Pruned {removed} snapshots and {blobs} blobs ({freed} bytes)")
+    else:
+        db = SessionLocal()
+        try:
+            reextract(db, store, args.workers, args.batch_size, args.hosts,
+                      args.product_ids, args.dry_run)
+        finally:
+            db.close()
+    store.close()
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import timedelta
+
+from DB.database import SessionLocal
+from monitoring.claims import claim_due_products, new_owner, release_products, renew_leases
+from monitoring.pipeline import scrape_products
+from monitoring.planner import (
+    credit_cost, record_credits, remaining_credits, reserve_credits, window_allowance)
+
+# Workers pace the period's credits over windows of this length
+SCRAPE_WORKER_TICK_SECONDS = int(os.getenv("SCRAPE_WORKER_TICK_SECONDS", "60"))
+
+
+async def run_worker(batch_size, poll_seconds, once=False):
+    owner = new_owner()
+    print(f"Scrape worker {owner} started")
+    db = SessionLocal()
+    tick = timedelta(seconds=SCRAPE_WORKER_TICK_SECONDS)
+    window = None
+    try:
+        while True:
+            # Windows are aligned across workers, and all of them charge
+            # the credits they reserve against the window's one allowance;
+            # tick_budget spreads what is left over the windows after it
+            current = int(time.time() // SCRAPE_WORKER_TICK_SECONDS)
+            if current != window:
+                window = current
+                allowance, remaining_at_start = window_allowance(db, window, tick)
+            remaining = remaining_credits(db)
+            budget = min(remaining, allowance - (remaining_at_start - remaining))
+            batch = claim_due_products(db, owner, min(batch_size, budget)) if budget > 0 else []
+            # Reserve the batch's credits so other workers see them now; the
+            # pipeline records what was actually spent. Another worker may
+            # have taken the rest of the window since budget was read.
+            reserved = sum(credit_cost(product_url) for _, product_url in batch)
+            if batch and reserve_credits(db, reserved, remaining_at_start - allowance):
+                renew = asyncio.create_task(renew_leases(db, owner))
+                try:
+                    await scrape_products(db, [batch], budget=budget)
+                finally:
+                    renew.cancel()
+                    record_credits(db, -reserved)
+                    release_products(db, owner)
+                continue
+            if batch:
+                release_products(db, owner)
+            if once:
+                return
+            next_window = (window + 1) * SCRAPE_WORKER_TICK_SECONDS - time.time()
+            await asyncio.sleep(max(0.0, min(poll_seconds, next_window)))
+    finally:
+        release_products(db, owner)
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Claim and scrape due products")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--poll-seconds", type=float, default=30)
+    parser.add_argument("--once", action="store_true",
+                        help="exit when no due products are left")
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.batch_size, args.poll_seconds, args.once))
@@ -0,0 +1,19 @@
+import os
+import sys
+
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# DB.database builds its MySQL URL at import time; no connection is made
+for _name, _default in (("DB_CONNECTION", "mysql+pymysql"), ("DB_HOST", "localhost"),
+                        ("DB_PORT", "3306"), ("DB_DATABASE", "cocarting"),
+                        ("DB_USERNAME", "test"), ("DB_PASSWORD", "test")):
+    os.environ.setdefault(_name, _default)
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_bigint(type_, compiler, **kw):
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns
+    return "INTEGER"
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+import DB.models  # noqa: F401  registers the models on Base
+from DB.database import Base
+from DB.models import Cocart, CocartProduct, Notification, PriceHistory, Product, User
+from dedupe_products import dedupe_products
+
+# The Laravel tables dedupe has to carry over, as the PHP app creates them
+LARAVEL_TABLES = """
+CREATE TABLE product_favorites (
+    id INTEGER PRIMARY KEY, product_id BIGINT REFERENCES products(id) ON DELETE CASCADE,
+    user_id BIGINT, cocart_id BIGINT, deleted_at TIMESTAMP);
+CREATE TABLE product_reviews (
+    id INTEGER PRIMARY KEY, product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL, review VARCHAR(255));
+CREATE TABLE compare (
+    id INTEGER PRIMARY KEY, product_id BIGINT NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL, product_source BIGINT NOT NULL);
+CREATE TABLE cocart_messages (
+    id INTEGER PRIMARY KEY, product_id BIGINT REFERENCES products(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL, cocart_id BIGINT NOT NULL, message TEXT NOT NULL);
+CREATE TABLE cocart_product_upvotes (
+    id INTEGER PRIMARY KEY, cocart_id BIGINT,
+    cocart_product_id BIGINT REFERENCES cocart_products(id) ON DELETE CASCADE,
+    user_id BIGINT, product_id BIGINT REFERENCES products(id) ON DELETE CASCADE,
+    deleted_at TIMESTAMP);
+CREATE TABLE cocart_product_downvotes (
+    id INTEGER PRIMARY KEY, cocart_id BIGINT,
+    cocart_product_id BIGINT REFERENCES cocart_products(id) ON DELETE CASCADE,
+    user_id BIGINT, product_id BIGINT REFERENCES products(id) ON DELETE CASCADE,
+    deleted_at TIMESTAMP);
+"""
+
+URL = "https://www.amazon.in/dp/B000000001"
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, record):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        for statement in LARAVEL_TABLES.split(";"):
+            if statement.strip():
+                connection.exec_driver_sql(statement)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def rows(db, sql):
+    return sorted(tuple(row) for row in db.execute(text(sql)))
+
+
+def test_merge_keeps_every_row_that_references_a_duplicate(db):
+    t0, t1, t2 = datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 3)
+    db.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com"),
+                Cocart(id=1, user_id=1, name="one", slug="one"),
+                Cocart(id=2, user_id=2, name="two", slug="two")])
+    # Product 1 survives; 2 and 3 are the same item behind tracking links
+    db.add_all([Product(id=1, name="x", slug="p1", product_tracking_url=URL),
+                Product(id=2, name="x", slug="p2", product_tracking_url=URL + "?tag=aff-21"),
+                Product(id=3, name="x", slug="p3", product_tracking_url=URL + "/ref=sr_1_1")])
+    db.flush()
+    # Cart 1 holds both 1 and 2, so its two entries become one
+    db.add_all([CocartProduct(id=1, cocart_id=1, product_id=1, target_price=900),
+                CocartProduct(id=2, cocart_id=1, product_id=2, target_price=800,
+                              note="gift"),
+                CocartProduct(id=3, cocart_id=2, product_id=3)])
+    db.add_all([PriceHistory(product_id=1, ts=t0, price=1000),
+                PriceHistory(product_id=2, ts=t0, price=1000),
+                PriceHistory(product_id=2, ts=t1, price=950),
+                PriceHistory(product_id=3, ts=t2, price=990),
+                Notification(user_id=1, product_id=2, title="Price drop")])
+    db.flush()
+    db.execute(text("""
+        INSERT INTO cocart_product_upvotes (cocart_id, cocart_product_id, user_id, product_id)
+        VALUES (1, 1, 1, 1), (1, 2, 1, 2), (1, 2, 2, 2), (2, 3, 2, 3)"""))
+    db.execute(text("""
+        INSERT INTO cocart_product_downvotes (cocart_id, cocart_product_id, user_id, product_id)
+        VALUES (1, 2, 1, 2)"""))
+    db.execute(text("""
+        INSERT INTO product_favorites (product_id, user_id, cocart_id)
+        VALUES (1, 1, NULL), (2, 1, NULL), (3, 2, NULL)"""))
+    db.execute(text("INSERT INTO compare (product_id, user_id, product_source) VALUES (3, 2, 0)"))
+    db.execute(text("""
+        INSERT INTO product_reviews (product_id, user_id, review)
+        VALUES (1, 1, 'good'), (2, 2, 'fine')"""))
+    db.execute(text("""
+        INSERT INTO cocart_messages (product_id, user_id, cocart_id, message)
+        VALUES (3, 2, 2, 'look')"""))
+    db.commit()
+
+    canonical, duplicates = dedupe_products(db)
+
+    assert duplicates == {2: 1, 3: 1}
+    assert rows(db, "SELECT id FROM products") == [(1,)]
+    assert rows(db, "SELECT id, cocart_id, product_id, target_price, note FROM cocart_products") == [
+        (1, 1, 1, 800, "gift"), (3, 2, 1, None, None)]
+    assert rows(db, "SELECT cocart_product_id, user_id, product_id FROM cocart_product_upvotes") == [
+        (1, 1, 1), (1, 2, 1), (3, 2, 1)]
+    assert rows(db, "SELECT cocart_product_id, user_id, product_id FROM cocart_product_downvotes") == [
+        (1, 1, 1)]
+    assert rows(db, "SELECT product_id, user_id FROM product_favorites") == [(1, 1), (1, 2)]
+    assert rows(db, "SELECT product_id, user_id FROM compare") == [(1, 2)]
+    assert rows(db, "SELECT product_id, review FROM product_reviews") == [(1, "fine"), (1, "good")]
+    assert rows(db, "SELECT product_id, message FROM cocart_messages") == [(1, "look")]
+    assert rows(db, "SELECT product_id, title FROM notifications") == [(1, "Price drop")]
+    assert rows(db, "SELECT product_id, price FROM price_history") == [
+        (1, 950), (1, 990), (1, 1000)]